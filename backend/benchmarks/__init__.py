@@ -0,0 +1,7 @@
+import os
+
+# Benchmarks run fully offline against local stand-ins, so dummy credentials suffice
+os.environ.setdefault("RUNPOD_API_TOKEN", "benchmark-token")
+os.environ.setdefault("RUNPOD_ENDPOINT_ID", "benchmark-endpoint")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark.supabase.key")
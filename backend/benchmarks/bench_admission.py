@@ -0,0 +1,79 @@
+"""
+A burst of questions against a RunPod endpoint with few GPU workers, with and without admission control.
+
+Without a limit every job is submitted at once and queues on the endpoint; jobs that wait longer
+than POLL_DEADLINE fail for the user but still run on a GPU. With AdmissionController the burst
+queues in the app and each job's deadline only starts once it is admitted.
+
+    python -m benchmarks.bench_admission --requests 40 --gpu-workers 2 --generation-time 1 --deadline 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import benchmarks  # noqa: F401
+from benchmarks.harness import free_port, serve
+from benchmarks import fake_runpod, fake_supabase
+
+async def burst(requests: int, **limits):
+    from src.config.logging_config import setup_logging
+    from src.services.admission_service import AdmissionController, Overloaded
+    from src.services.http_client import close_async_client
+    from src.services.rag_service import RAGService
+    setup_logging()
+    rag = RAGService()
+    rag.admission = AdmissionController(**limits)
+
+    async def ask(index: int):
+        start = time.perf_counter()
+        try:
+            answer = await rag.ask_with_context(f"Question {index} about wallets")
+        except Overloaded:
+            return "rejected", time.perf_counter() - start
+        return ("failed" if answer.startswith("Desculpe") else "answered"), time.perf_counter() - start
+
+    results = await asyncio.gather(*(ask(i) for i in range(requests)))
+    await close_async_client()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--gpu-workers", type=int, default=2)
+    parser.add_argument("--generation-time", type=float, default=1.0)
+    parser.add_argument("--deadline", type=float, default=8.0, help="POLL_DEADLINE for each job (s)")
+    parser.add_argument("--max-queued", type=int, default=100)
+    args = parser.parse_args()
+
+    supabase_port, runpod_port = free_port(), free_port()
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{supabase_port}"
+    os.environ["RUNPOD_BASE_URL"] = f"http://127.0.0.1:{runpod_port}"
+    os.environ["POLL_DEADLINE"] = str(args.deadline)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+    print(f"{args.requests} questions at once, {args.gpu_workers} GPU workers, "
+          f"{args.generation_time}s per answer, {args.deadline}s job deadline")
+    modes = [
+        ("no admission control", {"max_concurrent": 0}),
+        (f"admission ({args.gpu_workers} slots)", {
+            "max_concurrent": args.gpu_workers, "max_queued": args.max_queued, "queue_timeout": 600
+        })
+    ]
+    with serve(fake_supabase.create_app(latency=0.005, documents=[{"content": "Wallets hold keys."}]), supabase_port):
+        for name, limits in modes:
+            runpod_app = fake_runpod.create_app(queue_delay=0.0, generation_time=args.generation_time, workers=args.gpu_workers)
+            with serve(runpod_app, runpod_port):
+                results = asyncio.run(burst(args.requests, **limits))
+            outcomes = [outcome for outcome, _ in results]
+            answered = [seconds for outcome, seconds in results if outcome == "answered"]
+            # Every submitted job runs to completion on the endpoint, read or not
+            wasted = (len(runpod_app.state.jobs) - len(answered)) * args.generation_time
+            print(f"  {name:24s} answered {len(answered):3d}  failed {outcomes.count('failed'):3d}  "
+                  f"rejected {outcomes.count('rejected'):3d}  "
+                  f"latency p50 {statistics.median(answered) if answered else 0:6.2f}s max {max(answered, default=0):6.2f}s  "
+                  f"GPU time on unread answers {wasted:5.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Billed jobs and throughput with and without the BatchDispatcher, against a fake RunPod
+with a fixed number of GPU workers.
+
+    python -m benchmarks.bench_batching --requests 40 --workers 2 --generation-time 1
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.harness import free_port, serve, quiet
+from benchmarks import fake_runpod
+
+async def run(n: int, batched: bool, window: float, max_batch: int):
+    from src.services.llm_service import AsyncLLMService
+    from src.services.batch_service import BatchDispatcher
+    from src.services.http_client import close_async_client
+    llm = AsyncLLMService()
+    dispatcher = BatchDispatcher(llm, window=window, max_batch=max_batch)
+
+    async def one(i: int):
+        if batched:
+            return await dispatcher.generate(f"question {i}")
+        job_id = await llm.run_job(f"question {i}")
+        return await llm.wait_for_result(job_id)
+
+    start = time.perf_counter()
+    try:
+        answers = await asyncio.gather(*(one(i) for i in range(n)))
+    finally:
+        await close_async_client()
+    assert all(answers), "every caller should get an answer"
+    return time.perf_counter() - start, dispatcher.metrics()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-delay", type=float, default=0.3, help="per-job queue/cold-start overhead (s)")
+    parser.add_argument("--generation-time", type=float, default=1.0)
+    parser.add_argument("--window", type=float, default=0.05)
+    parser.add_argument("--max-batch", type=int, default=8)
+    args = parser.parse_args()
+
+    # Settings are read once per process, so both runs reuse the same port with a fresh fake
+    port, results = free_port(), {}
+    for batched in (False, True):
+        app = fake_runpod.create_app(queue_delay=args.queue_delay, generation_time=args.generation_time, workers=args.workers)
+        with serve(app, port) as base_url:
+            os.environ["RUNPOD_BASE_URL"] = base_url
+            with quiet():
+                elapsed, metrics = asyncio.run(run(args.requests, batched, args.window, args.max_batch))
+            results[batched] = (elapsed, len(app.state.jobs), metrics)
+
+    print(f"{args.requests} concurrent questions, {args.workers} workers, {args.generation_time}s per job")
+    for batched, label in ((False, "one job per question"), (True, "BatchDispatcher     ")):
+        elapsed, jobs, metrics = results[batched]
+        line = f"  {label}: {jobs:4d} billed jobs, {elapsed:6.2f}s, {args.requests / elapsed:6.1f} req/s"
+        if batched:
+            line += f", batch fill {metrics['avg_batch_fill']:.0%}, added wait {metrics['avg_added_wait'] * 1000:.0f} ms"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Context tokens per request with and without the ContextPacker, on simulated retrieval results that
+mix near-duplicate passages, overlapping chunks of the same document and long documents.
+
+"joined" is the raw "\\n\\n".join of the retrieved passages; "template" is what the prompt template
+kept of it (cut at the context budget); "packed" is the ContextPacker output.
+
+    python -m benchmarks.bench_context_packing --requests 200 --k 3 --budget 1500
+"""
+import argparse
+import random
+import statistics
+import time
+import benchmarks  # noqa: F401
+from src.services.context_service import ContextPacker
+from src.services.prompt_service import PromptTemplate
+from src.services.tokenizer import chunk_by_tokens, count_tokens
+
+def make_passages(rng: random.Random, documents: int):
+    """Chunks of synthetic documents (overlapping by 64 tokens), some chunks duplicated with small edits."""
+    words = [f"word{i}" for i in range(2000)]
+    passages = []
+    for _ in range(documents):
+        sentences = [" ".join(rng.choices(words, k=rng.randint(8, 16))).capitalize() + "." for _ in range(rng.randint(10, 150))]
+        text = " ".join(sentences)
+        passages.extend(chunk_by_tokens(text, 512, 64))
+    for passage in list(passages[:len(passages) // 4]):
+        # Re-ingested copies with a changed sentence or trailing whitespace
+        passages.append(passage.replace(".", ";", 1) + "  ")
+    return passages
+
+def retrieval(rng: random.Random, passages, k: int):
+    # Neighbouring chunks and their copies tend to be retrieved together
+    start = rng.randrange(len(passages))
+    picked = [passages[(start + offset) % len(passages)] for offset in range(k - 2)]
+    picked += [passages[(start + len(passages) * 4 // 5) % len(passages)], picked[0] + " "]
+    return [{"id": i, "content": content, "similarity": 0.9 - i * 0.05} for i, content in enumerate(picked)]
+
+def redundancy(text: str) -> float:
+    """Share of the text's word 3-grams that repeat an earlier 3-gram in the same context."""
+    words = text.lower().replace(";", ".").split()
+    grams = [" ".join(words[i:i + 3]) for i in range(len(words) - 2)]
+    return 1 - len(set(grams)) / len(grams) if grams else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--prefill-rate", type=float, default=5000, help="prefill tokens per second on the GPU")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    passages = make_passages(rng, args.documents)
+    packer = ContextPacker(token_budget=args.budget)
+    template = PromptTemplate()
+    template.budgets["context"] = args.budget
+
+    joined_tokens, template_tokens, packed_tokens, timings = [], [], [], []
+    template_redundancy, packed_redundancy = [], []
+    for _ in range(args.requests):
+        documents = retrieval(rng, passages, args.k)
+        joined = "\n\n".join(document["content"] for document in documents)
+        joined_tokens.append(count_tokens(joined))
+        kept = template.assemble("question", joined).sections["context"]
+        template_tokens.append(count_tokens(kept))
+        template_redundancy.append(redundancy(kept))
+        start = time.perf_counter()
+        packed = packer.pack(documents)
+        timings.append(time.perf_counter() - start)
+        packed_tokens.append(packed.tokens)
+        packed_redundancy.append(redundancy(packed.text))
+
+    saved = statistics.mean(template_tokens) - statistics.mean(packed_tokens)
+    print(f"{args.requests} requests, top {args.k} passages, {args.budget}-token context budget")
+    print(f"  joined  : {statistics.mean(joined_tokens):7.0f} context tokens per request")
+    print(f"  template: {statistics.mean(template_tokens):7.0f} context tokens per request (cut mid-passage at the budget), "
+          f"{statistics.mean(template_redundancy):.0%} repeated text")
+    print(f"  packed  : {statistics.mean(packed_tokens):7.0f} context tokens per request, "
+          f"{statistics.mean(packed_redundancy):.0%} repeated text, {packer.stats['duplicates'] / args.requests:.2f} duplicates dropped, {packer.stats['truncated'] / args.requests:.2f} passages cut at a sentence")
+    print(f"  saved {packer.average_saved_tokens():.0f} tokens vs joined, {saved:.0f} vs template "
+          f"(~{saved / args.prefill_rate * 1000:.0f} ms prefill at {args.prefill_rate:.0f} tok/s), "
+          f"packing takes {statistics.mean(timings) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
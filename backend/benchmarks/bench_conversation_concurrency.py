@@ -0,0 +1,76 @@
+"""
+Concurrent add_message throughput of blocking PostgREST calls (what the supabase-py client did)
+vs the async data layer, against a fake PostgREST.
+
+    python -m benchmarks.bench_conversation_concurrency --messages 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+import requests
+from benchmarks.harness import serve, quiet
+from benchmarks import fake_supabase
+
+async def run_blocking(conversation_id: str, n: int) -> float:
+    """The original add_message: two synchronous PostgREST round trips inside an async def."""
+    from src.services.supabase_service import SupabaseService
+    supabase = SupabaseService()
+    session = requests.Session()
+
+    async def one(i: int):
+        session.post(f"{supabase.rest_url}/messages", headers=supabase.headers, json={
+            "conversation_id": conversation_id,
+            "role": "user",
+            "content": f"message {i}",
+            "created_at": datetime.now().isoformat()
+        }).raise_for_status()
+        session.patch(
+            f"{supabase.rest_url}/conversations",
+            headers=supabase.headers,
+            params={"id": f"eq.{conversation_id}"},
+            json={"updated_at": datetime.now().isoformat()}
+        ).raise_for_status()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(n)))
+    finally:
+        session.close()
+    return time.perf_counter() - start
+
+async def run_async(n: int):
+    from src.services.conversation_service import ConversationService
+    from src.services.http_client import close_async_client
+    service = ConversationService()
+    try:
+        conversation = await service.create_conversation("benchmark")
+        start = time.perf_counter()
+        await asyncio.gather(*(service.add_message(conversation["id"], "user", f"message {i}") for i in range(n)))
+        elapsed = time.perf_counter() - start
+        history = await service.get_conversation_history(conversation["id"])
+    finally:
+        await close_async_client()
+    assert len(history) == n, f"expected {n} stored messages, found {len(history)}"
+    return conversation["id"], elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated PostgREST round trip (s)")
+    args = parser.parse_args()
+
+    app = fake_supabase.create_app(latency=args.latency)
+    with serve(app) as base_url:
+        os.environ["SUPABASE_URL"] = base_url
+        with quiet():
+            conversation_id, non_blocking = asyncio.run(run_async(args.messages))
+            blocking = asyncio.run(run_blocking(conversation_id, args.messages))
+
+    print(f"{args.messages} concurrent add_message calls, {args.latency}s per PostgREST round trip")
+    print(f"  blocking PostgREST:     {blocking:6.2f}s  {args.messages / blocking:8.1f} msg/s")
+    print(f"  async data layer:       {non_blocking:6.2f}s  {args.messages / non_blocking:8.1f} msg/s")
+
+if __name__ == "__main__":
+    main()
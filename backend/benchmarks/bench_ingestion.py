@@ -0,0 +1,123 @@
+"""
+Documents per second for one-at-a-time store_document calls versus the bulk IngestionPipeline,
+against fake Supabase and fake RunPod embedding endpoints. Also interrupts a pipeline run partway
+and resumes it from the checkpoint, checking that no chunk is stored twice.
+
+    python -m benchmarks.bench_ingestion --documents 100 --latency 0.02 --embed-time 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.harness import free_port, serve, quiet
+from benchmarks import fake_runpod, fake_supabase
+
+def write_corpus(path: str, documents: int, duplicates: float, seed: int = 0) -> None:
+    """JSONL of multi-paragraph documents, a share of which repeat an earlier document verbatim."""
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(3000)]
+    written = []
+    with open(path, "w", encoding="utf-8") as corpus:
+        for i in range(documents):
+            if written and rng.random() < duplicates:
+                content = rng.choice(written)
+            else:
+                sentences = [" ".join(rng.choices(words, k=12)).capitalize() + "." for _ in range(rng.randint(20, 120))]
+                content = "\n\n".join(" ".join(sentences[j:j + 5]) for j in range(0, len(sentences), 5))
+                written.append(content)
+            corpus.write(json.dumps({"content": content, "metadata": {"doc": i}}) + "\n")
+
+async def sequential(path: str, chunk_tokens: int, overlap: int) -> float:
+    """One embedding call and one store_document insert per chunk, in order."""
+    from src.services.embedding_service import EmbeddingService
+    from src.services.ingestion_service import read_source
+    from src.services.supabase_service import SupabaseService
+    from src.services.tokenizer import chunk_by_tokens
+    from src.services.http_client import close_async_client
+    embedder, supabase = EmbeddingService(), SupabaseService()
+    start = time.perf_counter()
+    try:
+        for _, content, metadata in read_source(path):
+            for chunk in chunk_by_tokens(content, chunk_tokens, overlap):
+                await embedder.embed([chunk])
+                await supabase.store_document(chunk, metadata)
+    finally:
+        await close_async_client()
+    return time.perf_counter() - start
+
+async def pipelined(path: str, checkpoint: str, args, interrupt_after: float = None):
+    from src.services.embedding_service import EmbeddingService
+    from src.services.ingestion_service import IngestionPipeline
+    from src.services.http_client import close_async_client
+    pipeline = IngestionPipeline(
+        embedder=EmbeddingService(),
+        chunk_tokens=args.chunk_tokens,
+        overlap=args.overlap,
+        workers=args.workers,
+        checkpoint_path=checkpoint
+    )
+    try:
+        if interrupt_after is None:
+            return await pipeline.run(path)
+        try:
+            await asyncio.wait_for(pipeline.run(path), interrupt_after)
+        except asyncio.TimeoutError:
+            pass
+        return pipeline.stats
+    finally:
+        await close_async_client()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of documents that repeat an earlier one")
+    parser.add_argument("--latency", type=float, default=0.02, help="Supabase round trip (s)")
+    parser.add_argument("--embed-time", type=float, default=0.05, help="embedding job time per request (s)")
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    # Settings are read once per process, so every run reuses the same two ports
+    supabase_port, runpod_port = free_port(), free_port()
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{supabase_port}"
+    os.environ["RUNPOD_BASE_URL"] = f"http://127.0.0.1:{runpod_port}"
+    os.environ.setdefault("EMBEDDING_ENDPOINT_ID", "benchmark-embeddings")
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.jsonl")
+        write_corpus(corpus, args.documents, args.duplicates)
+        results = {}
+        for mode in ("sequential", "pipeline", "resumed"):
+            supabase_app = fake_supabase.create_app(latency=args.latency)
+            runpod_app = fake_runpod.create_app(generation_time=args.embed_time)
+            with serve(supabase_app, supabase_port), serve(runpod_app, runpod_port):
+                with quiet():
+                    if mode == "sequential":
+                        elapsed = asyncio.run(sequential(corpus, args.chunk_tokens, args.overlap))
+                        stats = None
+                    elif mode == "pipeline":
+                        stats = asyncio.run(pipelined(corpus, os.path.join(directory, "full.json"), args))
+                        elapsed = stats.elapsed
+                    else:
+                        # Stop a run partway through, then rerun it with the same checkpoint
+                        checkpoint = os.path.join(directory, "resumed.json")
+                        first = asyncio.run(pipelined(corpus, checkpoint, args, interrupt_after=results["pipeline"][0] / 2))
+                        stats = asyncio.run(pipelined(corpus, checkpoint, args))
+                        elapsed = first.elapsed + stats.elapsed
+            rows = supabase_app.state.tables["documents"]
+            hashes = [row["metadata"].get("content_hash") for row in rows]
+            results[mode] = (elapsed, len(rows), len(set(hashes)), runpod_app.state.embedded, stats)
+
+    print(f"{args.documents} documents ({args.duplicates:.0%} repeated), {args.latency * 1000:.0f} ms Supabase latency, {args.embed_time * 1000:.0f} ms per embedding job")
+    for mode, (elapsed, rows, unique, embedded, stats) in results.items():
+        line = f"  {mode:10s}: {elapsed:6.2f}s, {args.documents / elapsed:7.1f} docs/s, {rows:5d} rows stored, {embedded:5d} texts embedded"
+        if mode == "resumed":
+            line += f", {stats.resumed} documents resumed from checkpoint, {rows - unique} stored twice"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Concurrent throughput of the blocking LLMService vs AsyncLLMService against a fake RunPod.
+
+    python -m benchmarks.bench_llm_concurrency --requests 50 --generation-time 0.2
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.harness import serve, quiet
+from benchmarks import fake_runpod
+
+async def run_blocking(n: int, interval: float) -> float:
+    from src.services.llm_service import LLMService
+    llm = LLMService()
+
+    async def one():
+        job_id = llm.run_job("ping")
+        return llm.wait_for_result(job_id, interval=interval)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return time.perf_counter() - start
+
+async def run_async(n: int) -> float:
+    from src.services.llm_service import AsyncLLMService
+    from src.services.http_client import close_async_client
+    llm = AsyncLLMService()
+
+    async def one():
+        job_id = await llm.run_job("ping")
+        return await llm.wait_for_result(job_id)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one() for _ in range(n)))
+    finally:
+        await close_async_client()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--generation-time", type=float, default=0.2)
+    parser.add_argument("--interval", type=float, default=0.05, help="fixed poll interval of the blocking client")
+    args = parser.parse_args()
+
+    app = fake_runpod.create_app(generation_time=args.generation_time)
+    with serve(app) as base_url:
+        os.environ["RUNPOD_BASE_URL"] = base_url
+        with quiet():
+            blocking = asyncio.run(run_blocking(args.requests, args.interval))
+            non_blocking = asyncio.run(run_async(args.requests))
+
+    print(f"{args.requests} concurrent requests, {args.generation_time}s generation each")
+    print(f"  blocking LLMService:  {blocking:7.2f}s  {args.requests / blocking:8.1f} req/s")
+    print(f"  AsyncLLMService:      {non_blocking:7.2f}s  {args.requests / non_blocking:8.1f} req/s")
+
+if __name__ == "__main__":
+    main()
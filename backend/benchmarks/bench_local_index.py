@@ -0,0 +1,155 @@
+"""
+Recall and latency of the LocalHybridIndex against the match_documents RPC, on a synthetic
+corpus of topic-clustered documents with embeddings (requires numpy).
+
+Recall@k is measured against exact cosine search, which is what match_documents computes, so the
+hybrid and BM25 rows show how far fusing in keyword matches moves results away from the vector ranking.
+The RPC goes over HTTP to the fake Supabase, with --rpc-latency added per request for the network.
+
+    python -m benchmarks.bench_local_index --documents 100000 --dim 256 --queries 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import numpy as np
+from benchmarks.harness import free_port, serve, quiet
+from benchmarks import fake_supabase
+
+def build_corpus(n: int, dim: int, topics: int, seed: int = 0):
+    """Documents drawn from `topics` clusters: shared topic words and embeddings near a topic centroid."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(topics, dim)).astype(np.float32)
+    assignments = rng.integers(0, topics, size=n)
+    embeddings = centroids[assignments] + rng.normal(scale=1.5, size=(n, dim)).astype(np.float32)
+    filler = [f"word{i}" for i in range(5000)]
+    documents = []
+    for i, topic in enumerate(assignments):
+        words = [f"topic{topic}term{j}" for j in rng.integers(0, 20, size=4)]
+        words += [filler[j] for j in rng.integers(0, len(filler), size=30)]
+        documents.append({"id": str(i), "content": f"Document {i}. " + " ".join(words), "embedding": embeddings[i]})
+    return documents, centroids, assignments
+
+def build_queries(centroids: np.ndarray, count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    topics = rng.integers(0, len(centroids), size=count)
+    vectors = centroids[topics] + rng.normal(scale=1.5, size=(count, centroids.shape[1])).astype(np.float32)
+    texts = [" ".join(f"topic{topic}term{j}" for j in rng.integers(0, 20, size=2)) for topic in topics]
+    return vectors, texts
+
+def literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+async def rpc_latencies(queries, k: int):
+    from src.services.supabase_service import SupabaseService
+    from src.services.http_client import close_async_client
+    supabase = SupabaseService()
+    latencies, results = [], []
+    try:
+        for query in queries:
+            start = time.perf_counter()
+            results.append(await supabase.rpc("match_documents", {"query_text": query, "match_count": k}))
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await close_async_client()
+    return latencies, results
+
+async def check_sync(directory: str) -> int:
+    """Mirror a small table into a fresh index through the incremental Supabase sync."""
+    from src.services.supabase_service import SupabaseService
+    from src.services.index_service import LocalHybridIndex
+    from src.services.http_client import close_async_client
+    index = LocalHybridIndex(directory)
+    try:
+        first = await index.sync(SupabaseService(), page_size=100)
+        second = await index.sync(SupabaseService(), page_size=100)
+    finally:
+        await close_async_client()
+    assert second == 0, "a second sync should find nothing new"
+    return first
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rpc-latency", type=float, default=0.02, help="simulated network round trip per RPC (s)")
+    args = parser.parse_args()
+
+    # Settings are read once per process, so both fake Supabase servers reuse the same port
+    port = free_port()
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{port}"
+    from src.services.index_service import LocalHybridIndex
+    documents, centroids, _ = build_corpus(args.documents, args.dim, args.topics)
+    vectors, texts = build_queries(centroids, args.queries)
+    queries = [literal(vector) for vector in vectors]
+
+    # Exact cosine top-k, the ranking match_documents returns
+    matrix = np.stack([document["embedding"] for document in documents])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(matrix @ (v / np.linalg.norm(v))))[:args.k].astype(str)) for v in vectors]
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        index = LocalHybridIndex(os.path.join(directory, "index"))
+        index.add(documents)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reopened = LocalHybridIndex(os.path.join(directory, "index"))
+        reopen = time.perf_counter() - start
+        assert len(reopened) == len(index)
+
+        modes = {
+            "local vector       ": lambda i: index.search(queries[i], args.k),
+            "local hybrid       ": lambda i: index.search(texts[i], args.k, query_embedding=vectors[i]),
+            "local BM25         ": lambda i: index.search(texts[i], args.k),
+        }
+        results = {}
+        for label, search in modes.items():
+            latencies, recalls = [], []
+            for i in range(args.queries):
+                t = time.perf_counter()
+                rows = search(i)
+                latencies.append(time.perf_counter() - t)
+                recalls.append(len({row["id"] for row in rows} & truth[i]) / args.k)
+            results[label] = (latencies, recalls)
+
+        # Appending after the build must not require a rebuild
+        t = time.perf_counter()
+        index.add([{"id": "appended", "content": "freshly stored knowledge", "embedding": vectors[0]}])
+        append = time.perf_counter() - t
+        assert index.search(queries[0], 1)[0]["id"] == "appended"
+
+        sync_rows = [{**document, "embedding": document["embedding"].tolist()} for document in documents[:500]]
+        with serve(fake_supabase.create_app(documents=sync_rows), port) as base_url:
+            with quiet():
+                synced = asyncio.run(check_sync(os.path.join(directory, "synced")))
+
+    # The RPC runs the same exact search server-side, behind an HTTP round trip
+    rpc_app = fake_supabase.create_app(latency=args.rpc_latency, documents=documents)
+    with serve(rpc_app, port):
+        with quiet():
+            asyncio.run(rpc_latencies(queries[:1], args.k))  # warm up the server-side matrix
+            latencies, rows = asyncio.run(rpc_latencies(queries, args.k))
+    recalls = [len({row["id"] for row in result} & truth[i]) / args.k for i, result in enumerate(rows)]
+    results["match_documents RPC"] = (latencies, recalls)
+
+    print(f"{args.documents} documents, dim {args.dim}, {args.queries} queries, recall@{args.k} vs exact cosine")
+    print(f"  index build {build:.1f}s, reopen {reopen:.2f}s, single append {append * 1000:.2f} ms, synced {synced} rows incrementally")
+    for label, (latencies, recalls) in results.items():
+        print(
+            f"  {label}: recall {statistics.mean(recalls):5.1%}, "
+            f"p50 {percentile(latencies, 0.5) * 1000:7.2f} ms, p95 {percentile(latencies, 0.95) * 1000:7.2f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
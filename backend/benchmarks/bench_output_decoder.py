@@ -0,0 +1,152 @@
+"""
+Output processing cost on large generated answers: the original _process_output/_clean_text
+(json.loads + ~10 replace passes + split/join), the character-by-character TextCleaner that the
+streaming path used, and the single-pass OutputDecoder.
+
+Outputs are synthetic Markdown answers (headings, lists, code blocks) behind a <think> span, in the
+`choices[].tokens` shape RunPod returns, double-encoded (as a JSON string) or not. Streaming feeds
+the same tokens to the incremental decoders one by one.
+
+    python -m benchmarks.bench_output_decoder --sizes 2000 20000 200000
+"""
+import argparse
+import json
+import random
+import timeit
+import benchmarks  # noqa: F401
+from src.services.output_service import OutputDecoder, decode_output
+
+def legacy_clean_text(text: str) -> str:
+    text = text.replace('\\n', '\n').replace('\\t', '    ').replace('\\"', '"')
+    text = text.replace('[', '').replace(']', '').replace('{', '').replace('}', '')
+    text = text.replace("'", '').replace('"', '')
+    text = ' '.join(text.split())
+    return text.strip()
+
+def legacy_process_output(output) -> str:
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except json.JSONDecodeError:
+            return legacy_clean_text(output)
+    if isinstance(output, list):
+        for item in output:
+            if isinstance(item, dict):
+                for choice in item.get("choices", []):
+                    tokens = choice.get("tokens")
+                    if isinstance(tokens, list):
+                        return legacy_clean_text("".join(tokens))
+                    elif isinstance(tokens, str):
+                        return legacy_clean_text(tokens)
+    if isinstance(output, dict):
+        for key in ["text", "response", "output", "result"]:
+            if key in output:
+                return legacy_clean_text(str(output[key]))
+    return legacy_clean_text(str(output))
+
+class LegacyTextCleaner:
+    """The previous incremental cleaner (same output as legacy_clean_text, one character at a time)."""
+    ESCAPES = {"n": "\n", "t": "    ", '"': '"'}
+    DROPPED = frozenset("[]{}'\"")
+
+    def __init__(self):
+        self._carry = ""
+        self._pending_space = False
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        text = self._carry + chunk
+        self._carry = ""
+        if text.endswith("\\"):
+            text, self._carry = text[:-1], "\\"
+        out = []
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char == "\\" and i + 1 < len(text) and text[i + 1] in self.ESCAPES:
+                self._emit(self.ESCAPES[text[i + 1]], out)
+                i += 2
+            else:
+                self._emit(char, out)
+                i += 1
+        return "".join(out)
+
+    def flush(self) -> str:
+        out = []
+        self._emit(self._carry, out)
+        self._carry = ""
+        return "".join(out)
+
+    def _emit(self, text: str, out: list) -> None:
+        for char in text:
+            if char in self.DROPPED:
+                continue
+            if char.isspace():
+                self._pending_space = self._started
+                continue
+            if self._pending_space:
+                out.append(" ")
+                self._pending_space = False
+            out.append(char)
+            self._started = True
+
+def make_answer(rng: random.Random, size: int) -> str:
+    words = ["wallet", "agent", "payment", "the", "a", "onchain", "`create_wallet()`", "**note**", "x402", "API"]
+    parts = ["<think>\n" + " ".join(rng.choices(words, k=size // 40)) + "\n</think>\n\n"]
+    length = 0
+    while length < size:
+        block = rng.random()
+        if block < 0.2:
+            text = f"## {' '.join(rng.choices(words, k=4)).title()}\n\n"
+        elif block < 0.5:
+            text = "".join(f"- {' '.join(rng.choices(words, k=8))}\n" for _ in range(4)) + "\n"
+        elif block < 0.7:
+            text = '```python\nwallet = agent.create_wallet(network="base")\nprint(wallet["address"])\n```\n\n'
+        else:
+            text = " ".join(rng.choices(words, k=40)) + ". 🚀\n\n"
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)
+
+def tokens_of(text: str):
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+def per_call(function, iterations: int) -> float:
+    return timeit.timeit(function, number=iterations) / iterations
+
+def stream(decoder_class, tokens) -> str:
+    decoder = decoder_class()
+    return "".join(decoder.feed(token) for token in tokens) + decoder.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 200000], help="answer sizes in characters")
+    parser.add_argument("--iterations", type=int, default=0, help="runs per measurement (default: scaled to the size)")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    for size in args.sizes:
+        answer = make_answer(rng, size)
+        tokens = tokens_of(answer)
+        payload = [{"choices": [{"tokens": tokens}], "usage": {"output": len(tokens)}}]
+        # Double-encoded: the whole payload as a JSON string whose answer is itself a JSON string literal
+        encoded = json.dumps([{"choices": [{"tokens": [json.dumps(answer)]}]}])
+        iterations = args.iterations or max(3, 2000000 // size)
+
+        decoded = decode_output(payload)
+        assert decode_output(encoded) == decoded and stream(OutputDecoder, tokens) == decoded
+        print(f"{len(answer)}-character answer, {len(tokens)} tokens ({iterations} iterations)")
+        print(f"  {'':30s} {'tokens list':>12s} {'JSON string':>12s} {'streamed':>12s}   newlines kept")
+        print(f"  {'original _process_output':30s} {per_call(lambda: legacy_process_output(payload), iterations) * 1000:9.3f} ms "
+              f"{per_call(lambda: legacy_process_output(encoded), iterations) * 1000:9.3f} ms {'':>12s}   "
+              f"{legacy_process_output(payload).count(chr(10))}")
+        print(f"  {'TextCleaner':30s} {'':>12s} {'':>12s} "
+              f"{per_call(lambda: stream(LegacyTextCleaner, tokens), iterations) * 1000:9.3f} ms   "
+              f"{stream(LegacyTextCleaner, tokens).count(chr(10))}")
+        print(f"  {'OutputDecoder':30s} {per_call(lambda: decode_output(payload), iterations) * 1000:9.3f} ms "
+              f"{per_call(lambda: decode_output(encoded), iterations) * 1000:9.3f} ms "
+              f"{per_call(lambda: stream(OutputDecoder, tokens), iterations) * 1000:9.3f} ms   "
+              f"{decoded.count(chr(10))} of {answer.split('</think>')[1].strip().count(chr(10))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Status calls per job and wait-after-finish of the fixed 2 s poll vs PollingScheduler, against a fake RunPod.
+
+    python -m benchmarks.bench_polling --jobs 20 --waves 3 --generation-time 3 --spread 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.harness import serve, quiet
+from benchmarks import fake_runpod
+
+async def run_fixed(jobs: int, waves: int, interval: float):
+    """The original wait_for_result loop: one status call every `interval` seconds per job."""
+    from src.services.llm_service import AsyncLLMService
+    from src.services.http_client import close_async_client
+    llm = AsyncLLMService()
+    calls, waits = [], []
+
+    async def one():
+        submitted = time.monotonic()
+        job_id = await llm.run_job("ping")
+        count = 0
+        while True:
+            result = await llm.check_status(job_id)
+            count += 1
+            if result["status"] == "COMPLETED":
+                finished = submitted + (result["delayTime"] + result["executionTime"]) / 1000
+                calls.append(count)
+                waits.append(max(0.0, time.monotonic() - finished))
+                return
+            await asyncio.sleep(interval)
+
+    try:
+        for _ in range(waves):
+            await asyncio.gather(*(one() for _ in range(jobs)))
+    finally:
+        await close_async_client()
+    return sum(calls) / len(calls), sum(waits) / len(waits)
+
+async def run_adaptive(jobs: int, waves: int):
+    from src.services.llm_service import AsyncLLMService
+    from src.services.http_client import close_async_client
+    llm = AsyncLLMService()
+
+    async def one():
+        job_id = await llm.run_job("ping")
+        await llm.wait_for_result(job_id)
+
+    try:
+        for _ in range(waves):
+            await asyncio.gather(*(one() for _ in range(jobs)))
+    finally:
+        await close_async_client()
+    summary = llm.scheduler.summary()
+    return summary["avg_status_calls"], summary["avg_waited_after_finish"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=20, help="concurrent jobs per wave")
+    parser.add_argument("--waves", type=int, default=3)
+    parser.add_argument("--queue-delay", type=float, default=0.5)
+    parser.add_argument("--generation-time", type=float, default=3.0)
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--interval", type=float, default=2.0, help="fixed poll interval of the baseline")
+    args = parser.parse_args()
+
+    app = fake_runpod.create_app(queue_delay=args.queue_delay, generation_time=args.generation_time, spread=args.spread)
+    with serve(app) as base_url:
+        os.environ["RUNPOD_BASE_URL"] = base_url
+        with quiet():
+            fixed = asyncio.run(run_fixed(args.jobs, args.waves, args.interval))
+            adaptive = asyncio.run(run_adaptive(args.jobs, args.waves))
+
+    print(f"{args.waves} waves x {args.jobs} jobs, queue {args.queue_delay}s, generation {args.generation_time}s ±{args.spread:.0%}")
+    print(f"  fixed {args.interval}s poll:   {fixed[0]:5.1f} status calls/job, {fixed[1]:5.2f}s waited after finish")
+    print(f"  PollingScheduler: {adaptive[0]:5.1f} status calls/job, {adaptive[1]:5.2f}s waited after finish")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Prompt assembly cost and estimated serving-side prefix-cache hit rate.
+
+Assembly: the original f-string _format_prompt vs PromptTemplate.assemble.
+Prefix cache: a simulated multi-turn workload, measured on the prompt text actually sent. Reused
+tokens are the longest prefix a prompt shares with a cached prompt, rounded down to whole 16-token
+KV blocks as vLLM does; the cache holds either only the same conversation's previous turn (a
+small or busy cache) or every earlier prompt. The PromptTemplate layout (history before context)
+is compared with putting context before history.
+
+    python -m benchmarks.bench_prompt_assembly --conversations 20 --turns 10
+"""
+import argparse
+import os
+import random
+import timeit
+import benchmarks  # noqa: F401
+from src.config.settings import settings
+from src.services.memory_service import ConversationMemory
+from src.services.prompt_service import PromptTemplate
+from src.services.tokenizer import count_tokens
+
+BLOCK_TOKENS = 16
+
+def legacy_format(prompt: str, context: str = None) -> str:
+    if context:
+        return f"<think>\nPersonality: {settings.AGENT_PERSONALITY}\nContext: {context}\n\nQuestion: {prompt}\n</think>"
+    return f"<think>\nPersonality: {settings.AGENT_PERSONALITY}\n\nQuestion: {prompt}\n</think>"
+
+def context_first(template: PromptTemplate, question: str, context: str, history: str) -> str:
+    parts = [template.prefix, f"Context: {context}\n"]
+    if history:
+        parts.append(f"History:\n{history}\n")
+    parts.append(f"\nQuestion: {question}\n</think>")
+    return "".join(parts)
+
+def prefix_hit_rate(prompts, same_conversation: bool) -> float:
+    """Share of prompt tokens found in the prefix cache; `prompts` is a list of (conversation, text)."""
+    previous, seen, reused, total = {}, [], 0, 0
+    for conversation, prompt in prompts:
+        cached = [previous[conversation]] if conversation in previous else []
+        shared = max((len(os.path.commonprefix([prompt, other])) for other in (cached if same_conversation else seen)), default=0)
+        reused += count_tokens(prompt[:shared]) // BLOCK_TOKENS * BLOCK_TOKENS
+        total += count_tokens(prompt)
+        previous[conversation] = prompt
+        seen.append(prompt)
+    return reused / total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    random.seed(0)
+
+    template = PromptTemplate()
+    context = "AgentKit lets developers give agents a CDP wallet. " * 20
+    question = "How do I create an agent that pays with x402?"
+    history = "User: hi\nAssistant: Hey. What are we building today?"
+    legacy = timeit.timeit(lambda: legacy_format(question, context), number=args.iterations)
+    assembled = timeit.timeit(lambda: template.assemble(question, context, history), number=args.iterations)
+    print(f"assembly cost per prompt ({args.iterations} iterations)")
+    print(f"  legacy f-string _format_prompt:        {legacy / args.iterations * 1e6:8.1f} µs")
+    print(f"  PromptTemplate.assemble:              {assembled / args.iterations * 1e6:8.1f} µs  (token-counted budgets)")
+    print(f"  sections: {template.assemble(question, context, history).section_tokens}")
+
+    contexts = [f"Document {i}: " + "Vector search over the knowledge base returns relevant passages. " * 15 for i in range(30)]
+    questions = [f"Question {i} about agents, wallets and deployment?" for i in range(100)]
+    memory = ConversationMemory()
+    history_first, context_before = [], []
+    for turn in range(args.turns):
+        for conversation in range(args.conversations):
+            conversation_id = str(conversation)
+            if not memory.has(conversation_id):
+                memory.load(conversation_id, [])
+            history = memory.render(conversation_id)
+            question, context = random.choice(questions), random.choice(contexts)
+            history_first.append((conversation, template.assemble(question, context, history).text))
+            context_before.append((conversation, context_first(template, question, context, history)))
+            memory.append(conversation_id, "user", question)
+            memory.append(conversation_id, "assistant", f"Answer to {question} " * 10)
+
+    print(f"estimated prefix-cache hit rate ({args.conversations} conversations x {args.turns} turns)")
+    print(f"  {'':42s} {'previous turn':>14s} {'all prompts':>12s}")
+    for label, prompts in [("history before context (PromptTemplate):", history_first), ("context before history:", context_before)]:
+        print(f"  {label:42s} {prefix_hit_rate(prompts, True):14.1%} {prefix_hit_rate(prompts, False):12.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Time-to-first-token of /stream vs the full wait in wait_for_result, against a fake RunPod.
+
+    python -m benchmarks.bench_streaming_ttft --generation-time 2
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.harness import serve, quiet
+from benchmarks import fake_runpod
+
+# Like DeepSeek-R1: a short reasoning span, then the answer
+ANSWER = "<think> " + " ".join(f"thought{i}" for i in range(20)) + " </think> " + " ".join(f"token{i}" for i in range(180))
+
+async def measure(interval: float):
+    from src.services.llm_service import AsyncLLMService
+    from src.services.http_client import close_async_client
+    llm = AsyncLLMService()
+    try:
+        start = time.perf_counter()
+        job_id = await llm.run_job("ping")
+        full = await llm.wait_for_result(job_id)
+        blocking_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        job_id = await llm.run_job("ping")
+        first_token = None
+        chunks = []
+        async for chunk in llm.stream_result(job_id, interval=interval):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            chunks.append(chunk)
+        stream_total = time.perf_counter() - start
+    finally:
+        await close_async_client()
+    assert "".join(chunks) == full, "streamed answer differs from the polled answer"
+    return blocking_total, first_token, stream_total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queue-delay", type=float, default=0.2)
+    parser.add_argument("--generation-time", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    app = fake_runpod.create_app(queue_delay=args.queue_delay, generation_time=args.generation_time, output=ANSWER)
+    with serve(app) as base_url:
+        os.environ["RUNPOD_BASE_URL"] = base_url
+        with quiet():
+            blocking_total, first_token, stream_total = asyncio.run(measure(args.interval))
+
+    print(f"queue {args.queue_delay}s, generation {args.generation_time}s")
+    print(f"  wait_for_result: first text after {blocking_total:6.2f}s")
+    print(f"  stream_result:   first text after {first_token:6.2f}s (complete after {stream_total:.2f}s)")
+
+if __name__ == "__main__":
+    main()
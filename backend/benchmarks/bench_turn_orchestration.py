@@ -0,0 +1,152 @@
+"""
+Latency of one /message turn, and GPU time spent on answers nobody reads, against the fakes.
+
+Turn latency compares the previous /message handler (history, then retrieval and generation with the
+user-message write alongside), TurnOrchestrator.run (retrieval and history overlapped, the RunPod job
+submitted as soon as both are ready), and TurnOrchestrator.run after a prefetch of the partial
+question `--typing` seconds before it is sent. Every turn is a new conversation with a new question,
+so neither the history window nor the retrieval cache is warm.
+
+The disconnect test sends questions to the real app through /message and /message/stream and drops
+each connection before the answer is ready, then reports how many RunPod jobs were cancelled and
+how much generation time that saved.
+
+    python -m benchmarks.bench_turn_orchestration --turns 20 --db-latency 0.05 --search-latency 0.1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+import uuid
+import httpx
+import benchmarks  # noqa: F401
+from benchmarks.harness import free_port, serve
+from benchmarks import fake_runpod, fake_supabase
+
+TOPICS = ["wallets", "agents", "payments", "webhooks"]
+
+def question(index: int) -> str:
+    return f"How do {TOPICS[index % len(TOPICS)]} handle retries and idempotency in case {index}?"
+
+async def previous_turn(rag, conversations, conversation_id: str, message: str) -> str:
+    history = await conversations.get_context_window(conversation_id)
+    _, response = await asyncio.gather(
+        conversations.add_message(conversation_id, "user", message),
+        rag.ask_with_context(message, history)
+    )
+    await conversations.add_message(conversation_id, "assistant", response)
+    return response
+
+async def turn_latencies(turns: int, typing: float):
+    from src.config.logging_config import setup_logging
+    from src.services.conversation_service import ConversationService
+    from src.services.http_client import close_async_client
+    from src.services.rag_service import RAGService
+    from src.services.turn_service import TurnOrchestrator
+    setup_logging()
+    rag, conversations = RAGService(), ConversationService()
+    orchestrator = TurnOrchestrator(rag, conversations)
+
+    async def previous(index: int):
+        await previous_turn(rag, conversations, str(uuid.uuid4()), question(index))
+
+    async def orchestrated(index: int):
+        await orchestrator.run(str(uuid.uuid4()), question(index))
+
+    async def prefetched(index: int):
+        conversation_id, message = str(uuid.uuid4()), question(index)
+        # The frontend sends what has been typed so far; the last word arrives `typing` seconds later
+        orchestrator.prefetch(conversation_id, message.rsplit(" ", 1)[0])
+        await asyncio.sleep(typing)
+        start = time.perf_counter()
+        await orchestrator.run(conversation_id, message)
+        return time.perf_counter() - start
+
+    results = {}
+    for offset, (name, turn) in enumerate([
+        ("previous handler", previous),
+        ("orchestrated", orchestrated),
+        (f"orchestrated + prefetch {typing:.1f}s ahead", prefetched)
+    ]):
+        latencies = []
+        for index in range(turns):
+            start = time.perf_counter()
+            measured = await turn(offset * turns + index)
+            latencies.append(measured if measured is not None else time.perf_counter() - start)
+        results[name] = latencies
+    stats = dict(orchestrator.stats)
+    await orchestrator.close()
+    await conversations.close()
+    await rag.close()
+    await close_async_client()
+    return results, stats
+
+async def disconnects(app_url: str, count: int, wait: float):
+    # Tokens already on their way when a stream's client goes make asyncio warn about writes to the closed socket
+    logging.getLogger("asyncio").setLevel(logging.ERROR)
+
+    async def abandon_message(index: int):
+        async with httpx.AsyncClient(base_url=app_url, timeout=wait) as client:
+            try:
+                await client.post("/message", json={"conversation_id": str(uuid.uuid4()), "message": question(index)})
+            except httpx.TimeoutException:
+                pass
+
+    async def abandon_stream(index: int):
+        async with httpx.AsyncClient(base_url=app_url, timeout=30) as client:
+            payload = {"conversation_id": str(uuid.uuid4()), "message": question(index)}
+            async with client.stream("POST", "/message/stream", json=payload) as response:
+                async for _ in response.aiter_lines():
+                    break
+
+    await asyncio.gather(*(abandon_message(i) for i in range(count)))
+    await asyncio.gather(*(abandon_stream(count + i) for i in range(count)))
+    # Leave time for the app to notice the disconnects and send its cancellations
+    await asyncio.sleep(2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Supabase round trip (s)")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="extra time of match_documents (s)")
+    parser.add_argument("--queue-delay", type=float, default=0.2, help="RunPod queue time per job (s)")
+    parser.add_argument("--generation-time", type=float, default=0.5, help="RunPod generation time per job (s)")
+    parser.add_argument("--typing", type=float, default=0.3, help="time between the prefetch and the send (s)")
+    parser.add_argument("--abandoned", type=int, default=5, help="requests dropped per endpoint in the disconnect test")
+    args = parser.parse_args()
+
+    supabase_port, runpod_port = free_port(), free_port()
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{supabase_port}"
+    os.environ["RUNPOD_BASE_URL"] = f"http://127.0.0.1:{runpod_port}"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["WRITE_BEHIND_ENABLED"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+    documents = [{"content": f"{topic.capitalize()} retry and idempotency guide {i}."} for i in range(50) for topic in TOPICS]
+    supabase_app = fake_supabase.create_app(latency=args.db_latency, documents=documents, search_latency=args.search_latency)
+    runpod_app = fake_runpod.create_app(queue_delay=args.queue_delay, generation_time=args.generation_time)
+    with serve(supabase_app, supabase_port), serve(runpod_app, runpod_port):
+        results, stats = asyncio.run(turn_latencies(args.turns, args.typing))
+    print(f"{args.turns} turns each, {args.db_latency * 1000:.0f} ms Supabase round trip, "
+          f"{args.search_latency * 1000:.0f} ms search, RunPod {args.queue_delay}s queue + {args.generation_time}s generation")
+    for name, latencies in results.items():
+        print(f"  {name:34s} p50 {statistics.median(latencies) * 1000:7.1f} ms   mean {statistics.mean(latencies) * 1000:7.1f} ms")
+    print(f"  speculative retrieval: {stats['speculative_hits']} hits, {stats['speculative_misses']} misses")
+
+    # Long generations, so that every request is dropped while its job is still running
+    generation_time, wait = 5.0, 1.0
+    from src.services import http_service
+    runpod_app = fake_runpod.create_app(queue_delay=args.queue_delay, generation_time=generation_time, output="<think> " + "thought " * 20 + "</think> " + "word " * 180)
+    with serve(supabase_app, supabase_port), serve(runpod_app, runpod_port), serve(http_service.app) as app_url:
+        asyncio.run(disconnects(app_url, args.abandoned, wait))
+    jobs = runpod_app.state.jobs.values()
+    saved = sum(job["submitted"] + job["queue_delay"] + job["generation_time"] - job["cancelled_at"] for job in jobs if "cancelled_at" in job)
+    print(f"\n{2 * args.abandoned} requests dropped after ~{wait}s ({args.abandoned} /message, {args.abandoned} /message/stream), "
+          f"{generation_time}s generation each")
+    print(f"  RunPod jobs submitted {len(jobs)}, cancelled {runpod_app.state.cancelled}, "
+          f"GPU time saved {saved:.1f}s of {len(jobs) * generation_time:.1f}s")
+
+if __name__ == "__main__":
+    main()
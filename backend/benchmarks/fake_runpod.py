@@ -0,0 +1,126 @@
+import asyncio
+import random
+import time
+import uuid
+import zlib
+from typing import Any, Dict
+from fastapi import FastAPI, HTTPException
+
+def create_app(
+    queue_delay: float = 0.0,
+    generation_time: float = 0.5,
+    output: str = "Fake answer.",
+    spread: float = 0.0,
+    workers: int = 0,
+    embedding_dim: int = 8
+) -> FastAPI:
+    """
+    Build a local stand-in for the RunPod serverless API.
+    Jobs sit IN_QUEUE for `queue_delay` seconds, then IN_PROGRESS for `generation_time` seconds.
+    `spread` varies both delays per job by up to that fraction. With `workers` set, at most that
+    many jobs run at once and the rest wait in the queue for a free worker.
+    A batched input (`prompts` list) runs as one job and returns one output per prompt.
+    POST /cancel/{job_id} stops a job: it reports CANCELLED from then on and `cancelled_at` records
+    when, so callers can tell how much generation time was saved.
+    /runsync serves embedding jobs (`input.input` list of texts): it holds the request for the queue
+    and generation delays and returns one deterministic `embedding_dim`-sized vector per text.
+    """
+    app = FastAPI()
+    jobs: Dict[str, Dict[str, Any]] = {}
+    app.state.jobs = jobs
+    app.state.status_calls = 0
+    app.state.embedded = 0
+    app.state.cancelled = 0
+    worker_free_at = [0.0] * workers
+
+    def _vary(seconds: float) -> float:
+        return seconds * random.uniform(1 - spread, 1 + spread)
+
+    def _status(job: Dict[str, Any]) -> Dict[str, Any]:
+        elapsed = time.monotonic() - job["submitted"]
+        if "cancelled_at" in job:
+            return {"id": job["id"], "status": "CANCELLED"}
+        if elapsed < job["queue_delay"]:
+            return {"id": job["id"], "status": "IN_QUEUE"}
+        if elapsed < job["queue_delay"] + job["generation_time"]:
+            return {"id": job["id"], "status": "IN_PROGRESS", "delayTime": int(job["queue_delay"] * 1000)}
+        return {
+            "id": job["id"],
+            "status": "COMPLETED",
+            "delayTime": int(job["queue_delay"] * 1000),
+            "executionTime": int(job["generation_time"] * 1000),
+            "output": job["output"]
+        }
+
+    @app.post("/{endpoint_id}/run")
+    async def run(endpoint_id: str, body: Dict[str, Any]):
+        job_id = str(uuid.uuid4())
+        job_input = body.get("input", {})
+        submitted = time.monotonic()
+        delay, duration = _vary(queue_delay), _vary(generation_time)
+        if workers:
+            # The job starts on whichever simulated worker frees up first
+            worker = min(range(workers), key=lambda i: worker_free_at[i])
+            start = max(submitted + delay, worker_free_at[worker])
+            worker_free_at[worker] = start + duration
+            delay = start - submitted
+        single = [{"choices": [{"tokens": [output]}]}]
+        jobs[job_id] = {
+            "id": job_id,
+            "input": job_input,
+            "submitted": submitted,
+            "queue_delay": delay,
+            "generation_time": duration,
+            "output": [single for _ in job_input["prompts"]] if "prompts" in job_input else single
+        }
+        return {"id": job_id, "status": "IN_QUEUE"}
+
+    @app.post("/{endpoint_id}/runsync")
+    async def runsync(endpoint_id: str, body: Dict[str, Any]):
+        texts = body.get("input", {}).get("input", [])
+        await asyncio.sleep(_vary(queue_delay) + _vary(generation_time))
+        app.state.embedded += len(texts)
+        data = []
+        for index, text in enumerate(texts):
+            seed = random.Random(zlib.crc32(text.encode()))
+            data.append({"index": index, "embedding": [seed.uniform(-1, 1) for _ in range(embedding_dim)]})
+        return {"id": str(uuid.uuid4()), "status": "COMPLETED", "output": {"data": data}}
+
+    @app.get("/{endpoint_id}/stream/{job_id}")
+    async def stream(endpoint_id: str, job_id: str):
+        if job_id not in jobs:
+            raise HTTPException(status_code=404, detail="job not found")
+        job = jobs[job_id]
+        current = _status(job)
+        # Release the output word by word, in proportion to generation progress
+        words = output.split(" ")
+        tokens = [word + " " for word in words[:-1]] + words[-1:]
+        elapsed = time.monotonic() - job["submitted"] - job["queue_delay"]
+        if current["status"] == "COMPLETED" or not job["generation_time"]:
+            progress = 1.0
+        else:
+            progress = max(0.0, elapsed / job["generation_time"])
+        sent = job.get("streamed", 0)
+        available = sent if current["status"] == "CANCELLED" else min(len(tokens), int(len(tokens) * progress))
+        job["streamed"] = available
+        chunks = [{"output": {"choices": [{"tokens": [token]}]}} for token in tokens[sent:available]]
+        return {"id": job_id, "status": current["status"], "stream": chunks}
+
+    @app.post("/{endpoint_id}/cancel/{job_id}")
+    async def cancel(endpoint_id: str, job_id: str):
+        if job_id not in jobs:
+            raise HTTPException(status_code=404, detail="job not found")
+        job = jobs[job_id]
+        if "cancelled_at" not in job and _status(job)["status"] != "COMPLETED":
+            job["cancelled_at"] = time.monotonic()
+            app.state.cancelled += 1
+        return _status(job)
+
+    @app.get("/{endpoint_id}/status/{job_id}")
+    async def status(endpoint_id: str, job_id: str):
+        if job_id not in jobs:
+            raise HTTPException(status_code=404, detail="job not found")
+        app.state.status_calls += 1
+        return _status(jobs[job_id])
+
+    return app
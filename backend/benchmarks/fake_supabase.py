@@ -0,0 +1,172 @@
+import asyncio
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+def _tokens(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+def _is_uuid(value: Any) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+def _error(status_code: int, code: str, message: str) -> JSONResponse:
+    # Same body shape as PostgREST errors
+    return JSONResponse({"code": code, "message": message, "details": None, "hint": None}, status_code=status_code)
+
+def create_app(
+    latency: float = 0.0,
+    documents: List[Dict[str, Any]] = None,
+    search_latency: float = 0.0,
+    foreign_keys: bool = False
+) -> FastAPI:
+    """
+    Build a local stand-in for Supabase's PostgREST API.
+    Serves the `conversations`, `messages` and `documents` tables with eq/gte/in filters (including
+    `column->>key` JSON paths), column selection, order, limit and offset,
+    plus a `match_documents` RPC that ranks documents by word overlap with the query, or by exact
+    cosine similarity when the query is a vector literal and the documents carry embeddings.
+    Every request is delayed by `latency` seconds to mimic the network round trip, and
+    `match_documents` by a further `search_latency` seconds for the similarity search itself.
+    Like Postgres, `id` and `*_id` columns only accept UUIDs (400, code 22P02) and a multi-row insert
+    stores nothing if any row is rejected. Inserting an existing `id` is a conflict (409, code 23505)
+    unless the request asks for `on_conflict=id` with `resolution=ignore-duplicates`, in which case
+    the row is skipped. With `foreign_keys`, messages must belong to an existing
+    conversation (409, code 23503).
+    """
+    app = FastAPI()
+    tables: Dict[str, List[Dict[str, Any]]] = {"conversations": [], "messages": [], "documents": []}
+    for document in documents or []:
+        tables["documents"].append({"id": str(uuid.uuid4()), **document})
+    app.state.tables = tables
+    app.state.requests = 0
+
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _value(row: Dict[str, Any], column: str) -> Any:
+        # JSON paths like metadata->>content_hash read a key of a jsonb column
+        for part in column.split("->>"):
+            row = row.get(part) if isinstance(row, dict) else None
+        return row
+
+    def _filtered(table: str, params) -> List[Dict[str, Any]]:
+        rows = tables.setdefault(table, [])
+        for column, value in params.items():
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            if value.startswith("eq."):
+                rows = [row for row in rows if str(_value(row, column)) == value[3:]]
+            elif value.startswith("gte."):
+                rows = [row for row in rows if str(_value(row, column) or "") >= value[4:]]
+            elif value.startswith("in."):
+                values = {item.strip('"') for item in value[4:-1].split(",")}
+                rows = [row for row in rows if str(_value(row, column)) in values]
+        return rows
+
+    def _project(rows: List[Dict[str, Any]], select: str) -> List[Dict[str, Any]]:
+        if select == "*":
+            return rows
+        columns = [column.partition(":") for column in select.split(",")]
+        return [{alias: _value(row, path or alias) for alias, _, path in columns} for row in rows]
+
+    @app.middleware("http")
+    async def delay(request: Request, call_next):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    def _match_vector(query_text: str, count: int) -> List[Dict[str, Any]]:
+        import numpy as np
+        documents = tables["documents"]
+        if getattr(app.state, "matrix_rows", None) != len(documents):
+            matrix = np.asarray([document["embedding"] for document in documents], dtype=np.float32)
+            app.state.matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+            app.state.matrix_rows = len(documents)
+        query = np.asarray(json.loads(query_text), dtype=np.float32)
+        similarities = app.state.matrix @ (query / np.linalg.norm(query))
+        top = np.argsort(-similarities)[:count]
+        return [
+            {"id": documents[i]["id"], "content": documents[i]["content"], "similarity": float(similarities[i])}
+            for i in top
+        ]
+
+    @app.post("/rest/v1/rpc/match_documents")
+    async def match_documents(body: Dict[str, Any]):
+        if search_latency:
+            await asyncio.sleep(search_latency)
+        query_text = body.get("query_text", "")
+        if query_text.startswith("[") and tables["documents"] and "embedding" in tables["documents"][0]:
+            return _match_vector(query_text, body.get("match_count", 5))
+        query = _tokens(query_text)
+        scored = []
+        for document in tables["documents"]:
+            words = _tokens(document.get("content", ""))
+            similarity = len(query & words) / len(query | words) if query | words else 0.0
+            if similarity > 0:
+                scored.append({"id": document["id"], "content": document["content"], "similarity": similarity})
+        scored.sort(key=lambda row: row["similarity"], reverse=True)
+        return scored[:body.get("match_count", 5)]
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        params = request.query_params
+        rows = list(_filtered(table, params))
+        if "order" in params:
+            column, _, direction = params["order"].partition(".")
+            rows.sort(key=lambda row: str(row.get(column, "")), reverse=direction == "desc")
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        else:
+            rows = rows[offset:]
+        return _project(rows, params.get("select", "*"))
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        for row in rows:
+            for column, value in row.items():
+                if (column == "id" or column.endswith("_id")) and not _is_uuid(value):
+                    return _error(400, "22P02", f'invalid input syntax for type uuid: "{value}"')
+            if foreign_keys and table == "messages" and not any(
+                conversation["id"] == row.get("conversation_id") for conversation in tables["conversations"]
+            ):
+                return _error(409, "23503", 'insert or update on table "messages" violates foreign key constraint')
+        prefer = request.headers.get("prefer", "")
+        ignore_duplicates = request.query_params.get("on_conflict") == "id" and "resolution=ignore-duplicates" in prefer
+        existing = {stored["id"] for stored in tables.setdefault(table, [])}
+        if not ignore_duplicates and any(row.get("id") in existing for row in rows):
+            return _error(409, "23505", f'duplicate key value violates unique constraint "{table}_pkey"')
+        created = []
+        for row in rows:
+            if row.get("id") in existing:
+                continue
+            stored = {"id": str(uuid.uuid4()), "created_at": _now(), **row}
+            if table == "conversations":
+                stored.setdefault("updated_at", stored["created_at"])
+            tables.setdefault(table, []).append(stored)
+            existing.add(stored["id"])
+            created.append(stored)
+        if "return=minimal" in prefer:
+            return Response(status_code=201)
+        return JSONResponse(created, status_code=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        values = await request.json()
+        rows = _filtered(table, request.query_params)
+        for row in rows:
+            row.update(values)
+        return rows
+
+    return app
@@ -0,0 +1,38 @@
+import contextlib
+import logging
+import socket
+import threading
+import time
+import uvicorn
+
+def free_port() -> int:
+    """Ask the OS for an unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextlib.contextmanager
+def serve(app, port: int = None):
+    """Run an ASGI app on a background thread and yield its base URL."""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the services' logging (the `src` logger) while measuring."""
+    logger = logging.getLogger("src")
+    level = logger.level
+    logger.setLevel(logging.CRITICAL + 1)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
@@ -0,0 +1,155 @@
+"""
+End-to-end load test of POST /message, fully offline.
+
+Runs the real FastAPI app against the fake RunPod and fake Supabase servers, drives /message from
+`--concurrency` simulated users (one conversation each), and reports latency percentiles, requests
+per second, event-loop lag inside the app and the mean time per pipeline stage.
+
+Results can be saved as a baseline and compared on later runs:
+
+    python -m benchmarks.loadtest --requests 200 --concurrency 20 --save-baseline
+    python -m benchmarks.loadtest --requests 200 --concurrency 20        # compares with the baseline
+
+Baselines are only comparable on the same machine with the same options.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+import httpx
+from benchmarks.harness import free_port, serve
+from benchmarks import fake_runpod, fake_supabase
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+TOPICS = ["wallets", "agents", "payments", "onchain", "identity", "scheduling", "webhooks", "analytics"]
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def make_documents(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(500)]
+    return [
+        {"content": f"{rng.choice(TOPICS).capitalize()} guide {i}. " + " ".join(rng.choices(words + TOPICS, k=60)) + "."}
+        for i in range(count)
+    ]
+
+def make_question(rng: random.Random, index: int, repeat: float) -> str:
+    if rng.random() < repeat:
+        return f"How do {rng.choice(TOPICS)} work?"
+    return f"Question {index}: how do {rng.choice(TOPICS)} and {rng.choice(TOPICS)} fit together?"
+
+async def drive(base_url: str, args, monitor) -> dict:
+    rng = random.Random(1)
+    conversations = [str(uuid.uuid4()) for _ in range(args.concurrency)]
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        for i in range(args.warmup):
+            await client.post("/message", json={"conversation_id": conversations[0], "message": make_question(rng, -i, 0)})
+        monitor.samples.clear()
+
+        counter = iter(range(args.requests))
+
+        async def user(conversation_id: str):
+            nonlocal errors
+            for index in counter:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/message",
+                        json={"conversation_id": conversation_id, "message": make_question(rng, index, args.repeat)}
+                    )
+                    ok = response.status_code == 200 and not response.json()["response"].startswith("Desculpe")
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(conversation_id) for conversation_id in conversations))
+        elapsed = time.perf_counter() - start
+
+    lag = list(monitor.samples)
+    return {key: round(value, 6) for key, value in {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "loop_lag_p50": percentile(lag, 0.50),
+        "loop_lag_p99": percentile(lag, 0.99),
+        "loop_lag_max": max(lag, default=0.0)
+    }.items()}
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f"\n  vs baseline ({baseline['saved_at']}):")
+    for key in ("rps", "p50", "p95", "p99", "loop_lag_p99"):
+        before, after = baseline["results"][key], results[key]
+        change = (after - before) / before if before else 0.0
+        better = change > 0 if key == "rps" else change < 0
+        print(f"    {key:13s} {before:9.4f} -> {after:9.4f}  {change:+7.1%} {'better' if better else 'worse' if change else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--queue-delay", type=float, default=0.2, help="RunPod queue time per job (s)")
+    parser.add_argument("--generation-time", type=float, default=0.5, help="RunPod generation time per job (s)")
+    parser.add_argument("--spread", type=float, default=0.2, help="random variation of the RunPod delays")
+    parser.add_argument("--gpu-workers", type=int, default=0, help="limit concurrent RunPod jobs (0 = unlimited)")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="Supabase round trip (s)")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--repeat", type=float, default=0.0, help="share of questions repeated across users (cache hits)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # Settings are read once per process, so the fakes' addresses are fixed before the app is imported
+    supabase_port, runpod_port = free_port(), free_port()
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{supabase_port}"
+    os.environ["RUNPOD_BASE_URL"] = f"http://127.0.0.1:{runpod_port}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from src.services import http_service
+    from src.services.metrics_service import STAGE_SECONDS
+
+    supabase_app = fake_supabase.create_app(latency=args.db_latency, documents=make_documents(args.documents))
+    runpod_app = fake_runpod.create_app(
+        queue_delay=args.queue_delay,
+        generation_time=args.generation_time,
+        spread=args.spread,
+        workers=args.gpu_workers
+    )
+    with serve(supabase_app, supabase_port), serve(runpod_app, runpod_port), serve(http_service.app) as app_url:
+        results = asyncio.run(drive(app_url, args, http_service.loop_monitor))
+    stages = {name: round(values["mean"], 6) for name, values in sorted(STAGE_SECONDS.snapshot().items())}
+
+    print(f"{results['requests']} requests to /message at concurrency {args.concurrency}, "
+          f"RunPod {args.queue_delay}s queue + {args.generation_time}s generation, {args.db_latency * 1000:.0f} ms Supabase")
+    print(f"  {results['rps']:.1f} req/s, {results['errors']} errors")
+    print(f"  latency   p50 {results['p50'] * 1000:8.1f} ms   p95 {results['p95'] * 1000:8.1f} ms   p99 {results['p99'] * 1000:8.1f} ms")
+    print(f"  loop lag  p50 {results['loop_lag_p50'] * 1000:8.2f} ms   p99 {results['loop_lag_p99'] * 1000:8.2f} ms   max {results['loop_lag_max'] * 1000:8.2f} ms")
+    print("  mean time per stage (including warm-up):")
+    for name, seconds in stages.items():
+        print(f"    {name:26s} {seconds * 1000:9.2f} ms")
+
+    config = {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline")}
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump({"saved_at": time.strftime("%Y-%m-%d %H:%M"), "config": config, "results": results, "stages": stages}, baseline_file, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["config"] != config:
+            print("\n  (baseline was recorded with different options; comparison is indicative only)")
+        compare(results, baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from src.config.settings import settings
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+_listener = None
+
+def setup_logging() -> None:
+    """
+    Configure the application's `src.*` loggers from LOG_ENABLED, LOG_LEVEL and LOG_FORMAT ("text" or "json").
+    Records are handed to a background thread through a queue, so logging never blocks the event loop on stdout.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    logger = logging.getLogger("src")
+    logger.propagate = False
+    if not settings.LOG_ENABLED:
+        # Above CRITICAL: every call returns before formatting its message
+        logger.setLevel(logging.CRITICAL + 1)
+        logger.addHandler(logging.NullHandler())
+        _listener = False
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(records))
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    _listener = QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
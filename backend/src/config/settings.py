@@ -1,5 +1,6 @@
 import os
 from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
@@ -12,6 +13,7 @@ class Settings(BaseSettings):
     # RunPod settings
     RUNPOD_API_TOKEN: str
     RUNPOD_ENDPOINT_ID: str
+    RUNPOD_BASE_URL: str = "https://api.runpod.ai/v2"
 
     # Supabase settings
     SUPABASE_URL: str
@@ -22,6 +24,114 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = 2000
     TOP_P: float = 0.9
     STOP_SEQUENCE: str = "###"
+    # The model writes its reasoning before the answer, ending it with </think> (DeepSeek-R1 distills):
+    # text before a stray </think> is dropped, so streamed text is held back until the reasoning ends
+    REASONING_MODEL: bool = True
+
+    # Conversation memory (token counts use TOKENIZER_NAME when the `tokenizers` package is installed)
+    TOKENIZER_NAME: str = "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B"
+    HISTORY_TOKEN_BUDGET: int = 1024
+    HISTORY_SUMMARY_TOKEN_BUDGET: int = 256
+    HISTORY_MAX_CONVERSATIONS: int = 1000
+
+    # Prompt section budgets (tokens)
+    PROMPT_CONTEXT_TOKEN_BUDGET: int = 1500
+    PROMPT_QUESTION_TOKEN_BUDGET: int = 512
+
+    # Context packing: retrieved passages are deduplicated and packed into PROMPT_CONTEXT_TOKEN_BUDGET
+    CONTEXT_PACKING_ENABLED: bool = True
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.8
+
+    # Shared HTTP connection pool
+    HTTP_MAX_CONNECTIONS: int = 200
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    HTTP_TIMEOUT: float = 30.0
+
+    # RunPod status polling (seconds)
+    POLL_MIN_INTERVAL: float = 0.25
+    POLL_MAX_INTERVAL: float = 2.0
+    POLL_BACKOFF: float = 1.5
+    POLL_JITTER: float = 0.1
+    POLL_DEADLINE: float = 300.0
+
+    # Turn orchestration: retrieval started early from a partial question (POST /message/prefetch) is
+    # reused when the final question's words overlap it by at least SPECULATIVE_MATCH_THRESHOLD (Jaccard)
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = True
+    SPECULATIVE_RETRIEVAL_TTL: float = 30.0
+    SPECULATIVE_MIN_CHARS: int = 12
+    SPECULATIVE_MATCH_THRESHOLD: float = 0.8
+    # A prefetch only starts retrieval once the partial question has stayed the same this long (seconds)
+    SPECULATIVE_DEBOUNCE: float = 0.2
+    # How often /message checks whether the client is still connected (its RunPod job is cancelled if not)
+    DISCONNECT_POLL_INTERVAL: float = 0.25
+
+    # Micro-batching of concurrent questions into one RunPod job (needs a batch-aware worker handler)
+    BATCH_DISPATCH_ENABLED: bool = False
+    BATCH_WINDOW: float = 0.05
+    BATCH_MAX_SIZE: int = 8
+
+    # Logging, metrics and tracing
+    LOG_ENABLED: bool = True
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    METRICS_ENABLED: bool = True
+    TRACING_ENABLED: bool = False  # OpenTelemetry spans (requires opentelemetry-api)
+
+    # HTTP server (`python -m src.main --production` runs SERVER_WORKERS processes; 0 = one per CPU)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0
+
+    # Admission control in front of RunPod (0 = unlimited); the limit is split between server workers
+    RUNPOD_MAX_CONCURRENT_JOBS: int = 0
+    RUNPOD_MAX_QUEUED_JOBS: int = 100
+    RUNPOD_QUEUE_TIMEOUT: float = 60.0
+
+    # Per-client /message rate limit (0 = off)
+    RATE_LIMIT_PER_MINUTE: int = 0
+    # Per-client /message/prefetch limit, counted separately since typing sends several per question
+    # (unset = 10x RATE_LIMIT_PER_MINUTE)
+    PREFETCH_RATE_LIMIT_PER_MINUTE: Optional[int] = None
+
+    # State shared between server workers: rate-limit counters and conversation versions
+    # ("memory" keeps it per process; "sqlite" uses SHARED_STORE_PATH on the local disk)
+    SHARED_STATE_BACKEND: str = "memory"
+    SHARED_STORE_PATH: str = ".shared/store.sqlite3"
+
+    # Caching ("memory", "sqlite" or "redis" backends)
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_TTL: int = 3600
+    RESPONSE_CACHE_MAX_SIZE: int = 1000
+    RESPONSE_CACHE_NEAR_DUPLICATES: bool = False
+    RESPONSE_CACHE_SIMILARITY: float = 0.8
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_BACKEND: str = "memory"
+    RETRIEVAL_CACHE_TTL: int = 300
+    RETRIEVAL_CACHE_MAX_SIZE: int = 1000
+
+    # Local hybrid retrieval index (requires numpy)
+    LOCAL_INDEX_ENABLED: bool = False
+    LOCAL_INDEX_PATH: str = ".index"
+    LOCAL_INDEX_SYNC_INTERVAL: float = 300.0
+
+    # Bulk document ingestion (embeddings come from a RunPod embedding endpoint, if configured)
+    EMBEDDING_ENDPOINT_ID: Optional[str] = None
+    EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"
+    INGEST_CHUNK_TOKENS: int = 512
+    INGEST_CHUNK_OVERLAP: int = 64
+    INGEST_EMBED_BATCH_SIZE: int = 32
+    INGEST_EMBED_WORKERS: int = 4
+    INGEST_INSERT_BATCH_SIZE: int = 100
+
+    # Write-behind message persistence
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_QUEUE_SIZE: int = 1000
+    WRITE_BEHIND_BATCH_SIZE: int = 100
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.05
+    WRITE_BEHIND_MAX_RETRIES: int = 3
 
     # Agent personality - She should talk only or mainly about the products coinsbase offers in the hackton
     # Hi! Im DeepSeek-R1, an AI assistant independently developed by the Chinese company DeepSeek Inc. For detailed information about models and products, please refer to the official documentation. - Never say that you are an AI model.
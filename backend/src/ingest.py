@@ -0,0 +1,54 @@
+"""
+Bulk-load documents into the Supabase `documents` table.
+
+    python -m src.ingest docs/                         # every text file under docs/
+    python -m src.ingest knowledge.jsonl --checkpoint .ingest-checkpoint.json
+
+Rerunning with the same checkpoint after a crash skips the documents that were fully ingested.
+"""
+import argparse
+import asyncio
+from src.config.logging_config import setup_logging
+from src.config.settings import settings
+from src.services.ingestion_service import IngestionPipeline
+from src.services.http_client import close_async_client
+
+async def ingest(args: argparse.Namespace) -> None:
+    embedder = None
+    if settings.EMBEDDING_ENDPOINT_ID and not args.no_embed:
+        from src.services.embedding_service import EmbeddingService
+        embedder = EmbeddingService()
+    elif not args.no_embed:
+        print("⚠️ Warning: EMBEDDING_ENDPOINT_ID is not set, storing documents without embeddings")
+
+    pipeline = IngestionPipeline(
+        embedder=embedder,
+        chunk_tokens=args.chunk_tokens,
+        overlap=args.overlap,
+        embed_batch_size=args.embed_batch_size,
+        workers=args.workers,
+        insert_batch_size=args.insert_batch_size,
+        checkpoint_path=args.checkpoint
+    )
+    try:
+        stats = await pipeline.run(args.source)
+    finally:
+        await close_async_client()
+    print(f"✅ {stats.summary()}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of text files, a JSONL file, or a single text file")
+    parser.add_argument("--checkpoint", default=".ingest-checkpoint.json", help="resume file ('' to disable)")
+    parser.add_argument("--chunk-tokens", type=int, default=settings.INGEST_CHUNK_TOKENS)
+    parser.add_argument("--overlap", type=int, default=settings.INGEST_CHUNK_OVERLAP)
+    parser.add_argument("--embed-batch-size", type=int, default=settings.INGEST_EMBED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.INGEST_EMBED_WORKERS)
+    parser.add_argument("--insert-batch-size", type=int, default=settings.INGEST_INSERT_BATCH_SIZE)
+    parser.add_argument("--no-embed", action="store_true", help="store chunks without computing embeddings")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(ingest(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
+import argparse
 import asyncio
+import math
+import os
 import sys
-import uvicorn
-from src.services.rag_service import RAGService
-from src.services.conversation_service import ConversationService
+from typing import Optional
 
 async def main():
     """Main function to run the RAG chat application."""
+    # Imported here so that starting the server does not load the services in the supervisor process
+    from src.services.rag_service import RAGService
+    from src.services.conversation_service import ConversationService
     rag_service = RAGService()
     conversation_service = ConversationService()
     
@@ -39,11 +43,14 @@ async def main():
             if not user_input:
                 continue
             
+            # Recent conversation history, within the token budget
+            history = await conversation_service.get_context_window(conversation_id)
+            
             # Store user message
             await conversation_service.add_message(conversation_id, "user", user_input)
             
             # Get response from RAG service
-            response = await rag_service.ask_with_context(user_input)
+            response = await rag_service.ask_with_context(user_input, history)
             
             # Store assistant's response
             await conversation_service.add_message(conversation_id, "assistant", response)
@@ -58,5 +65,63 @@ async def main():
             print(f"\nErro: {str(e)}")
             continue
 
+def cgroup_cpu_quota(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """CPUs allowed by the container's cgroup CPU quota (e.g. `docker run --cpus=2`), or None without one."""
+    try:
+        # cgroup v2: "<quota> <period>", or "max <period>" without a quota
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: a quota of -1 means no quota
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def cpu_count() -> int:
+    """CPUs this process may use: its CPU set, capped by the cgroup CPU quota (which the CPU set ignores)."""
+    if hasattr(os, "sched_getaffinity"):
+        count = len(os.sched_getaffinity(0))
+    else:
+        count = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        count = min(count, max(1, math.ceil(quota)))
+    return count
+
+def serve(production: bool = False) -> None:
+    """Run the HTTP API: one auto-reloading process for development, or SERVER_WORKERS processes in production."""
+    import uvicorn
+    from src.config.settings import settings
+
+    if not production:
+        uvicorn.run("src.services.http_service:app", host=settings.SERVER_HOST, port=settings.SERVER_PORT, reload=True)
+        return
+
+    workers = settings.SERVER_WORKERS or cpu_count()
+    # Workers size their share of the RunPod admission limits from this
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if workers > 1:
+        # Unless configured otherwise, caches and rate-limit state are shared through the local store
+        for name in ("SHARED_STATE_BACKEND", "RESPONSE_CACHE_BACKEND", "RETRIEVAL_CACHE_BACKEND"):
+            os.environ.setdefault(name, "sqlite")
+    print(f"🚀 Starting {workers} worker(s) on {settings.SERVER_HOST}:{settings.SERVER_PORT}")
+    uvicorn.run(
+        "src.services.http_service:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        proxy_headers=True,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT
+    )
+
 if __name__ == "__main__":
-    uvicorn.run("src.services.http_service:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the Autonoma HTTP API.")
+    parser.add_argument("--production", action="store_true", help="multiple workers, no auto-reload")
+    serve(parser.parse_args().production)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+from src.config.settings import settings
+from src.services.cache_service import create_cache
+from src.services.metrics_service import observe
+
+logger = logging.getLogger(__name__)
+
+class Overloaded(Exception):
+    """A request was turned away because RunPod capacity is used up; retry after `retry_after` seconds."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class RateLimited(Overloaded):
+    """A client sent more requests than RATE_LIMIT_PER_MINUTE allows."""
+    status_code = 429
+
+def worker_count() -> int:
+    """Number of server processes sharing this host's limits (set by `src.main --production`)."""
+    return max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+class AdmissionController:
+    """
+    Caps how many RunPod jobs this process runs at once. Callers beyond the cap wait in a FIFO queue
+    instead of piling onto the endpoint and timing out there; when the queue is full, or a caller
+    waits longer than `queue_timeout`, Overloaded is raised so the client can back off.
+    The global limits in settings are split evenly between the server's worker processes. The job
+    cap is rounded down, so the workers together stay within it, except that every worker keeps at
+    least one slot: with more workers than RUNPOD_MAX_CONCURRENT_JOBS, up to one job per worker runs.
+    """
+
+    def __init__(self, max_concurrent: int = None, max_queued: int = None, queue_timeout: float = None):
+        workers = worker_count()
+        if max_concurrent is None:
+            max_concurrent = settings.RUNPOD_MAX_CONCURRENT_JOBS
+            if max_concurrent:
+                if max_concurrent < workers:
+                    logger.warning(
+                        "⚠️ RUNPOD_MAX_CONCURRENT_JOBS=%d is below the %d workers; up to %d jobs can run at once",
+                        max_concurrent, workers, workers
+                    )
+                max_concurrent = max(1, max_concurrent // workers)
+        if max_queued is None:
+            max_queued = math.ceil(settings.RUNPOD_MAX_QUEUED_JOBS / workers)
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout or settings.RUNPOD_QUEUE_TIMEOUT
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+        self.holds: Deque[float] = deque(maxlen=100)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one RunPod slot for the duration of the block, queueing while every slot is busy."""
+        if self._semaphore is None:
+            yield
+            return
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise Overloaded("RunPod admission queue is full", self._retry_after())
+            self.stats["queued"] += 1
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            raise Overloaded("Timed out waiting for a RunPod slot", self._retry_after()) from None
+        finally:
+            self.waiting -= 1
+        admitted = time.perf_counter()
+        observe("admission_wait", admitted - start)
+        self.active += 1
+        self.stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.holds.append(time.perf_counter() - admitted)
+            self._semaphore.release()
+
+    def _retry_after(self) -> float:
+        # Roughly how long the callers already queued will take to get through
+        hold = sum(self.holds) / len(self.holds) if self.holds else 1.0
+        return hold * (self.waiting / self.max_concurrent + 1)
+
+class RateLimiter:
+    """
+    Fixed one-minute window of /message requests per client. Counters live in SHARED_STATE_BACKEND,
+    so with the sqlite (or redis) backend every worker process enforces the same limit.
+    """
+
+    def __init__(self, per_minute: int = None, store=None, prefix: str = "ratelimit:"):
+        self.per_minute = settings.RATE_LIMIT_PER_MINUTE if per_minute is None else per_minute
+        self.store = store
+        if self.store is None and self.per_minute:
+            self.store = create_cache(settings.SHARED_STATE_BACKEND, max_size=100000, ttl=60, prefix=prefix)
+
+    async def check(self, client: str) -> None:
+        """Count one request from `client`, raising RateLimited once it is over the limit."""
+        if not self.per_minute:
+            return
+        window = int(time.time() // 60)
+        count = await self.store.incr(f"{client}:{window}", ttl=60)
+        if count > self.per_minute:
+            raise RateLimited("Too many requests", (window + 1) * 60 - time.time())
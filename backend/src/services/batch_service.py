@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from src.config.settings import settings
+from src.services.admission_service import AdmissionController
+from src.services.llm_service import AsyncLLMService
+
+class BatchDispatcher:
+    """
+    Groups questions that arrive within a short window into one batched RunPod job,
+    so a burst pays the queue and cold-start overhead once instead of per question.
+    A batch is sent when `max_batch` prompts are waiting or `window` seconds after its first prompt.
+    With an `admission` controller, each batch (one RunPod job) takes one slot, however many
+    questions it carries.
+    """
+
+    def __init__(
+        self,
+        llm: AsyncLLMService,
+        window: float = None,
+        max_batch: int = None,
+        admission: Optional[AdmissionController] = None
+    ):
+        self.llm = llm
+        self.admission = admission
+        self.window = window if window is not None else settings.BATCH_WINDOW
+        self.max_batch = max_batch or settings.BATCH_MAX_SIZE
+        self.stats = {"batches": 0, "prompts": 0, "added_wait": 0.0}
+        self._pending: List[Tuple[str, float, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatches = set()
+
+    async def generate(self, question: str, context: Optional[str] = None, history: Optional[str] = None) -> str:
+        """Queue a question for the next batch and wait for its answer."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self.llm._format_prompt(question, context, history), time.monotonic(), future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def metrics(self) -> Dict[str, float]:
+        """Average batch fill (share of max_batch) and average wait added per prompt, in seconds."""
+        batches, prompts = self.stats["batches"], self.stats["prompts"]
+        return {
+            **self.stats,
+            "avg_batch_fill": prompts / (batches * self.max_batch) if batches else 0.0,
+            "avg_added_wait": self.stats["added_wait"] / prompts if prompts else 0.0
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, float, asyncio.Future]]) -> None:
+        now = time.monotonic()
+        self.stats["batches"] += 1
+        self.stats["prompts"] += len(batch)
+        self.stats["added_wait"] += sum(now - queued_at for _, queued_at, _ in batch)
+        try:
+            prompts = [prompt for prompt, _, _ in batch]
+            if self.admission is not None:
+                async with self.admission.slot():
+                    outputs = await self._run(prompts)
+            else:
+                outputs = await self._run(prompts)
+            if len(batch) == 1:
+                outputs = [outputs]
+            elif not isinstance(outputs, list) or len(outputs) != len(batch):
+                raise Exception(f"Batch job returned {len(outputs) if isinstance(outputs, list) else 'no'} outputs for {len(batch)} prompts")
+            for (_, _, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(self.llm._process_output(output))
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _run(self, prompts: List[str]) -> Any:
+        job_id = await self.llm.run_batch_job(prompts)
+        return await self.llm.wait_for_output(job_id)
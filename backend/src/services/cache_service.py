@@ -0,0 +1,271 @@
+import hashlib
+import json
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.config.settings import settings
+from src.services.shared_store import get_shared_store
+
+class MemoryCache:
+    """In-process key/value cache with per-entry TTL and LRU eviction past `max_size` entries."""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Add one to a counter; a missing or expired counter starts again at 1 with a fresh TTL."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry[0] < now:
+            entry = (now + (ttl or self.ttl), 1)
+        else:
+            entry = (entry[0], entry[1] + 1)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry[1]
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisCache:
+    """
+    Cache backed by a local Redis-compatible store, shared between processes.
+    Size is bounded by the server's `maxmemory` with an LRU eviction policy.
+    """
+
+    def __init__(self, url: str, ttl: float = 3600, prefix: str = "autonoma:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise ImportError("The redis cache backend requires the 'redis' package (pip install redis)") from e
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl or self.ttl))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        value = await self.client.incr(self.prefix + key)
+        if value == 1:
+            await self.client.expire(self.prefix + key, int(ttl or self.ttl))
+        return value
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+class SQLiteCache:
+    """
+    Cache in the local SharedStore file, shared by the worker processes of one host without
+    running a separate server.
+    Every `max_size // 10` writes, entries past `max_size` are dropped, those closest to expiring first, so the cache
+    stays within roughly 10% of its bound across all workers.
+    """
+
+    def __init__(self, ttl: float = 3600, prefix: str = "autonoma:", store=None, max_size: int = 1000):
+        self.store = store or get_shared_store()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.max_size = max_size
+        self._trim_every = max(1, max_size // 10)
+        self._writes = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.store.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.store.set(self.prefix + key, json.dumps(value), ttl or self.ttl)
+        await self._trim()
+
+    async def delete(self, key: str) -> None:
+        await self.store.delete(self.prefix + key)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        value = await self.store.incr(self.prefix + key, ttl or self.ttl)
+        await self._trim()
+        return value
+
+    async def _trim(self) -> None:
+        self._writes += 1
+        if self._writes % self._trim_every == 0:
+            await self.store.trim_prefix(self.prefix, self.max_size)
+
+    async def clear(self) -> None:
+        await self.store.delete_prefix(self.prefix)
+
+def create_cache(backend: str, max_size: int, ttl: float, prefix: str):
+    """Build the configured cache backend ('memory', 'sqlite' or 'redis')."""
+    if backend == "sqlite":
+        return SQLiteCache(ttl=ttl, prefix=prefix, max_size=max_size)
+    if backend == "redis":
+        return RedisCache(settings.CACHE_REDIS_URL, ttl=ttl, prefix=prefix)
+    if backend == "memory":
+        return MemoryCache(max_size=max_size, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variations share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+class MinHashIndex:
+    """
+    Near-duplicate lookup over short texts using MinHash signatures of character shingles,
+    bucketed with LSH bands so a lookup only compares against likely matches.
+    """
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 4, max_size: int = 1000):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_size = max_size
+        seeds = [zlib.crc32(f"minhash-{i}".encode()) for i in range(2 * num_perm)]
+        self._params = list(zip(seeds[::2], seeds[1::2]))
+        self._signatures: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        k = self.shingle_size
+        shingles = {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+        hashes = [zlib.crc32(s.encode()) for s in shingles]
+        return tuple(min((a * h + b) % self._PRIME for h in hashes) for a, b in self._params)
+
+    def add(self, key: str, signature: Tuple[int, ...]) -> None:
+        if key in self._signatures:
+            self.remove(key)
+        self._signatures[key] = signature
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+        while len(self._signatures) > self.max_size:
+            self.remove(next(iter(self._signatures)))
+
+    def remove(self, key: str) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def query(self, signature: Tuple[int, ...], threshold: float) -> List[Tuple[str, float]]:
+        """Return stored keys at or above `threshold` estimated Jaccard similarity, most similar first."""
+        candidates = set()
+        for band in self._bands(signature):
+            candidates |= self._buckets.get(band, set())
+        matches = []
+        for key in candidates:
+            other = self._signatures[key]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.num_perm
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        if matches:
+            self._signatures.move_to_end(matches[0][0])
+        return matches
+
+    def _bands(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, Tuple[int, ...]]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+class ResponseCache:
+    """
+    Two-tier cache of final answers keyed on the question and the documents retrieved for it.
+    The exact tier matches the normalized question; the optional near-duplicate tier matches
+    reworded questions through MinHash similarity, as long as they retrieved the same documents.
+    """
+
+    def __init__(self, backend=None, near_duplicates: Optional[bool] = None, similarity: Optional[float] = None):
+        if backend is None:
+            backend = create_cache(
+                settings.RESPONSE_CACHE_BACKEND,
+                max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+                ttl=settings.RESPONSE_CACHE_TTL,
+                prefix="response:"
+            )
+        self.backend = backend
+        near_duplicates = settings.RESPONSE_CACHE_NEAR_DUPLICATES if near_duplicates is None else near_duplicates
+        self.similarity = settings.RESPONSE_CACHE_SIMILARITY if similarity is None else similarity
+        self.index = MinHashIndex(max_size=settings.RESPONSE_CACHE_MAX_SIZE) if near_duplicates else None
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0}
+
+    def _group(self, context_ids: List[Any]) -> str:
+        return ",".join(sorted(str(doc_id) for doc_id in context_ids))
+
+    def _key(self, normalized: str, context_ids: List[Any]) -> str:
+        return hashlib.sha256(f"{normalized}\x00{self._group(context_ids)}".encode()).hexdigest()
+
+    async def get(self, question: str, context_ids: List[Any]) -> Optional[str]:
+        """Return a cached answer for the question and retrieved documents, if any."""
+        normalized = normalize_question(question)
+        answer = await self.backend.get(self._key(normalized, context_ids))
+        if answer is not None:
+            self.stats["exact_hits"] += 1
+            return answer
+
+        if self.index is not None:
+            group = self._group(context_ids)
+            for near_key, _ in self.index.query(self.index.signature(normalized), self.similarity)[:3]:
+                cached = await self.backend.get(near_key)
+                if cached is not None and cached["group"] == group:
+                    self.stats["near_hits"] += 1
+                    return cached["answer"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, question: str, context_ids: List[Any], answer: str) -> None:
+        """Store a generated answer in both tiers."""
+        normalized = normalize_question(question)
+        key = self._key(normalized, context_ids)
+        await self.backend.set(key, answer)
+        if self.index is not None:
+            near_key = f"near:{key}"
+            await self.backend.set(near_key, {"group": self._group(context_ids), "answer": answer})
+            self.index.add(near_key, self.index.signature(normalized))
+
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["near_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
@@ -0,0 +1,127 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List
+from src.config.settings import settings
+from src.services.tokenizer import count_tokens, truncate_to_tokens
+
+_WORD = re.compile(r"\w+")
+SEPARATOR = "\n\n"
+
+@dataclass
+class PackedContext:
+    """Context text for one request, with what packing removed from it."""
+    text: str
+    ids: List[Any]
+    tokens: int
+    raw_tokens: int
+    duplicates: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.tokens
+
+@dataclass
+class _Passage:
+    document: Dict[str, Any]
+    content: str
+    shingles: frozenset
+    tokens: int
+
+class ContextPacker:
+    """
+    Turns retrieved documents into prompt context that fits a token budget.
+    Passages are taken in order of similarity score; a passage whose word shingles are mostly
+    contained in one already taken (a near-duplicate, or an overlapping chunk of the same text) is
+    dropped. The last passage that does not fit is cut at a sentence boundary.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = None,
+        duplicate_threshold: float = None,
+        shingle_size: int = 3,
+        min_passage_tokens: int = 32,
+        history: int = 1000
+    ):
+        self.token_budget = token_budget or settings.PROMPT_CONTEXT_TOKEN_BUDGET
+        self.duplicate_threshold = duplicate_threshold if duplicate_threshold is not None else settings.CONTEXT_DUPLICATE_THRESHOLD
+        self.shingle_size = shingle_size
+        self.min_passage_tokens = min_passage_tokens
+        self.separator_tokens = count_tokens(SEPARATOR)
+        self.stats = {"requests": 0, "raw_tokens": 0, "tokens": 0, "duplicates": 0, "truncated": 0, "dropped": 0}
+        self.saved: Deque[int] = deque(maxlen=history)
+
+    def pack(self, documents: List[Dict[str, Any]]) -> PackedContext:
+        """Deduplicate, rank and budget the documents into one context string."""
+        ranked = sorted(
+            (document for document in documents if (document.get("content") or "").strip()),
+            key=lambda document: document.get("similarity") or 0.0,
+            reverse=True
+        )
+        passages = []
+        for document in ranked:
+            content = document["content"].strip()
+            passages.append(_Passage(document, content, self._shingles(content), count_tokens(content)))
+        raw_tokens = sum(passage.tokens for passage in passages) + self.separator_tokens * max(0, len(passages) - 1)
+
+        kept: List[_Passage] = []
+        parts: List[str] = []
+        used = duplicates = truncated = dropped = 0
+        for passage in passages:
+            if any(self._contained(passage, other) for other in kept):
+                duplicates += 1
+                continue
+            separator = self.separator_tokens if parts else 0
+            remaining = self.token_budget - used - separator
+            if passage.tokens <= remaining:
+                parts.append(passage.content)
+                used += separator + passage.tokens
+            elif remaining >= self.min_passage_tokens:
+                cut = truncate_to_tokens(passage.content, remaining)
+                parts.append(cut)
+                used += separator + count_tokens(cut)
+                truncated += 1
+            else:
+                dropped += 1
+                continue
+            kept.append(passage)
+
+        packed = PackedContext(
+            text=SEPARATOR.join(parts),
+            ids=[passage.document.get("id") for passage in kept],
+            tokens=used,
+            raw_tokens=raw_tokens,
+            duplicates=duplicates,
+            truncated=truncated,
+            dropped=dropped
+        )
+        self._record(packed)
+        return packed
+
+    def average_saved_tokens(self) -> float:
+        return sum(self.saved) / len(self.saved) if self.saved else 0.0
+
+    def _shingles(self, text: str) -> frozenset:
+        words = _WORD.findall(text.lower())
+        k = self.shingle_size
+        if len(words) < k:
+            return frozenset([" ".join(words)]) if words else frozenset()
+        return frozenset(" ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+
+    def _contained(self, passage: _Passage, other: _Passage) -> bool:
+        # Share of this passage's shingles that the kept passage already covers
+        if not passage.shingles:
+            return True
+        return len(passage.shingles & other.shingles) / len(passage.shingles) >= self.duplicate_threshold
+
+    def _record(self, packed: PackedContext) -> None:
+        self.stats["requests"] += 1
+        self.stats["raw_tokens"] += packed.raw_tokens
+        self.stats["tokens"] += packed.tokens
+        self.stats["duplicates"] += packed.duplicates
+        self.stats["truncated"] += packed.truncated
+        self.stats["dropped"] += packed.dropped
+        self.saved.append(packed.saved_tokens)
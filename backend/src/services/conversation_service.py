@@ -1,12 +1,42 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import logging
+import uuid
+from typing import List, Dict, Any, Optional, Set
+from datetime import datetime, timezone
+from src.config.settings import settings
 from src.services.supabase_service import SupabaseService
+from src.services.cache_service import create_cache
+from src.services.persistence_service import MessageWriter
+from src.services.memory_service import ConversationMemory
+
+logger = logging.getLogger(__name__)
+
+VERSION_TTL = 7 * 24 * 3600
 
 class ConversationService:
     def __init__(self):
-        """Initialize conversation service with Supabase client."""
+        """Initialize conversation service with the async Supabase data layer."""
         self.supabase = SupabaseService()
         self.table_name = "conversations"
+        self.writer = MessageWriter(self.supabase)
+        self.memory = ConversationMemory()
+        self._warming: Set[str] = set()
+        # With several server workers, a shared per-conversation message counter tells a worker
+        # when another one has added messages that its in-memory window has not seen
+        self.versions = create_cache(
+            settings.SHARED_STATE_BACKEND,
+            max_size=settings.HISTORY_MAX_CONVERSATIONS,
+            ttl=VERSION_TTL,
+            prefix="conversation:"
+        ) if settings.SHARED_STATE_BACKEND != "memory" else None
+    
+    def start(self) -> None:
+        """Start write-behind message persistence, if enabled."""
+        if settings.WRITE_BEHIND_ENABLED:
+            self.writer.start()
+    
+    async def close(self) -> None:
+        """Flush queued messages and stop write-behind persistence."""
+        await self.writer.close()
     
     async def create_conversation(self, title: str = None) -> Dict[str, Any]:
         """
@@ -17,34 +47,46 @@ class ConversationService:
                 "title": title or f"Conversation {datetime.now().strftime('%Y-%m-%d %H:%M')}"
                 # "metadata": {}  # descomente se quiser usar metadata
             }
-            response = self.supabase.client.table(self.table_name).insert(conversation).execute()
-            return response.data[0] if response.data else {}
+            rows = await self.supabase.insert(self.table_name, conversation)
+            return rows[0] if rows else {}
         except Exception as e:
-            print(f"Error creating conversation: {str(e)}")
+            logger.error("Error creating conversation: %s", e)
             return {}
     
     async def add_message(self, conversation_id: str, role: str, content: str) -> Dict[str, Any]:
         """
         Add a message to a conversation.
+        With write-behind running, the message is queued and written in the next batch.
         """
         try:
+            # A malformed id would be rejected by Postgres; refuse it before it joins a write-behind batch
+            uuid.UUID(conversation_id)
             message = {
+                # Generated here, so the window can recognise the message when another worker reads it back
+                "id": str(uuid.uuid4()),
                 "conversation_id": conversation_id,
                 "role": role,  # 'user' or 'assistant'
                 "content": content,
-                "created_at": datetime.now().isoformat()
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
+            self.memory.append(conversation_id, role, content, message["id"], message["created_at"])
+            if self.versions is not None:
+                await self.versions.incr(conversation_id, ttl=VERSION_TTL)
+            
+            if self.writer.running:
+                await self.writer.enqueue(message)
+                return message
             
-            response = self.supabase.client.table("messages").insert(message).execute()
+            rows = await self.supabase.insert("messages", message)
             
             # Update conversation's updated_at timestamp
-            self.supabase.client.table(self.table_name).update({
+            await self.supabase.update(self.table_name, {
                 "updated_at": datetime.now().isoformat()
-            }).eq("id", conversation_id).execute()
+            }, eq={"id": conversation_id})
             
-            return response.data[0] if response.data else {}
+            return rows[0] if rows else {}
         except Exception as e:
-            print(f"Error adding message: {str(e)}")
+            logger.error("Error adding message: %s", e)
             return {}
     
     async def get_conversation_history(self, conversation_id: str) -> List[Dict[str, Any]]:
@@ -52,29 +94,86 @@ class ConversationService:
         Get all messages from a conversation.
         """
         try:
-            response = self.supabase.client.table("messages")\
-                .select("*")\
-                .eq("conversation_id", conversation_id)\
-                .order("created_at")\
-                .execute()
-            
-            return response.data if response.data else []
+            return await self._fetch_history(conversation_id)
         except Exception as e:
-            print(f"Error getting conversation history: {str(e)}")
+            logger.error("Error getting conversation history: %s", e)
             return []
     
+    async def _fetch_history(self, conversation_id: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Make sure this conversation's queued messages are visible before reading them back
+        await self.writer.flush(conversation_id)
+        return await self.supabase.select(
+            "messages",
+            eq={"conversation_id": conversation_id},
+            gte={"created_at": since} if since else None,
+            order="created_at"
+        )
+    
+    async def get_context_window(self, conversation_id: str) -> str:
+        """
+        Get the token-budgeted history of a conversation for the prompt.
+        Loaded from the database once, then kept up to date by add_message (and by the messages
+        other server workers have added since, see `_catch_up`).
+        If the history cannot be read, the turn goes on without it and the next turn tries again.
+        """
+        if not self.memory.has(conversation_id):
+            try:
+                messages = await self._fetch_history(conversation_id)
+            except Exception as e:
+                # Not loaded into memory, so an empty window is never mistaken for the real history
+                logger.error("Error loading conversation history: %s", e)
+                return ""
+            self.memory.load(conversation_id, messages)
+        elif self.versions is not None:
+            await self._catch_up(conversation_id)
+        return self.memory.render(conversation_id)
+    
+    async def _catch_up(self, conversation_id: str) -> None:
+        """
+        Add the messages other workers have stored since the window's newest one.
+        The shared count includes messages still in another worker's write-behind queue; until they
+        are written the window stays behind the count, so the next turn looks again.
+        """
+        total = await self.versions.get(conversation_id) or 0
+        if total == self.memory.version(conversation_id):
+            return
+        try:
+            messages = await self._fetch_history(conversation_id, since=self.memory.newest(conversation_id))
+        except Exception as e:
+            logger.error("Error loading new conversation messages: %s", e)
+            return
+        self.memory.extend(conversation_id, messages)
+        if total < self.memory.version(conversation_id):
+            # The shared count expired and started again; follow it from here
+            self.memory.set_version(conversation_id, total)
+    
+    async def warm(self, conversation_id: str) -> None:
+        """
+        Load the history window of an existing conversation ahead of its next turn.
+        IDs that match no conversation are ignored, so they never take a place in memory.
+        """
+        if self.memory.has(conversation_id) or conversation_id in self._warming:
+            return
+        self._warming.add(conversation_id)
+        try:
+            if await self.supabase.select(self.table_name, columns="id", eq={"id": conversation_id}, limit=1):
+                await self.get_context_window(conversation_id)
+        except Exception as e:
+            logger.warning("⚠️ Could not warm conversation %s: %s", conversation_id, e)
+        finally:
+            self._warming.discard(conversation_id)
+    
     async def get_recent_conversations(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get recent conversations.
         """
         try:
-            response = self.supabase.client.table(self.table_name)\
-                .select("*")\
-                .order("updated_at", desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            return response.data if response.data else []
+            return await self.supabase.select(
+                self.table_name,
+                order="updated_at",
+                desc=True,
+                limit=limit
+            )
         except Exception as e:
-            print(f"Error getting recent conversations: {str(e)}")
+            logger.error("Error getting recent conversations: %s", e)
             return [] 
\ No newline at end of file
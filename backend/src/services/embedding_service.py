@@ -0,0 +1,65 @@
+import time
+import httpx
+from typing import Any, Dict, List, Optional
+from src.config.settings import settings
+from src.services.http_client import get_async_client
+from src.services.polling_service import PollingScheduler
+
+class EmbeddingService:
+    """
+    Client for a RunPod embedding endpoint (OpenAI-compatible input, e.g. the infinity worker).
+    Texts are sent through /runsync; jobs that outlive the synchronous window are polled to completion.
+    """
+
+    def __init__(self, endpoint_id: Optional[str] = None, model: Optional[str] = None, client: Optional[httpx.AsyncClient] = None):
+        self.endpoint_id = endpoint_id or settings.EMBEDDING_ENDPOINT_ID
+        if not self.endpoint_id:
+            raise ValueError("EMBEDDING_ENDPOINT_ID is not configured")
+        self.model = model or settings.EMBEDDING_MODEL
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {settings.RUNPOD_API_TOKEN}"
+        }
+        self.base_url = f"{settings.RUNPOD_BASE_URL}/{self.endpoint_id}"
+        self._client = client
+        self.scheduler = PollingScheduler(self.check_status)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one job, returning one vector per text, in order."""
+        submitted_at = time.monotonic()
+        response = await self.client.post(
+            f"{self.base_url}/runsync",
+            headers=self.headers,
+            json={"input": {"model": self.model, "input": texts}}
+        )
+        response.raise_for_status()
+        result = response.json()
+        if result.get("status") in ("IN_QUEUE", "IN_PROGRESS"):
+            result = await self.scheduler.wait(result["id"], submitted_at)
+        if result.get("status") != "COMPLETED":
+            raise Exception(f"Embedding job {str(result.get('status')).lower()}: {result.get('error', '')}")
+
+        vectors = self._extract_vectors(result.get("output"))
+        if len(vectors) != len(texts):
+            raise Exception(f"Embedding job returned {len(vectors)} vectors for {len(texts)} texts")
+        return vectors
+
+    async def check_status(self, job_id: str) -> Dict[str, Any]:
+        response = await self.client.get(f"{self.base_url}/status/{job_id}", headers=self.headers)
+        response.raise_for_status()
+        return response.json()
+
+    def _extract_vectors(self, output: Any) -> List[List[float]]:
+        """Read vectors from an OpenAI-style `data` list, an `embeddings` list, or a bare list of vectors."""
+        if isinstance(output, list) and len(output) == 1 and isinstance(output[0], dict):
+            output = output[0]
+        if isinstance(output, dict):
+            if "data" in output:
+                rows = sorted(output["data"], key=lambda row: row.get("index", 0))
+                return [row["embedding"] for row in rows]
+            output = output.get("embeddings", [])
+        return list(output or [])
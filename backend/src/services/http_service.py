@@ -1,24 +1,154 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, field_validator
+from src.config.logging_config import setup_logging
+from src.config.settings import settings
 from src.services.rag_service import RAGService
 from src.services.conversation_service import ConversationService
+from src.services.admission_service import Overloaded, RateLimiter, worker_count
+from src.services.http_client import close_async_client, get_async_client
+from src.services.metrics_service import LoopLagMonitor, MetricsPublisher, get_tracer, register_stats, render_metrics, unregister_stats
+from src.services.shared_store import close_shared_store, get_shared_store
+from src.services.tokenizer import load_tokenizer
+from src.services.turn_service import TurnOrchestrator, cancel_on_disconnect, first_chunk
 import asyncio
+import json
+import uuid
 
-app = FastAPI()
-rag_service = RAGService()
-conversation_service = ConversationService()
+setup_logging()
+loop_monitor = LoopLagMonitor()
 
-class MessageInput(BaseModel):
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Falha na inicialização (e não na primeira requisição) se o tracing estiver mal configurado
+    get_tracer()
+    # Clientes e pools são criados no event loop de cada worker
+    get_async_client()
+    # Carrega (e baixa, se preciso) o tokenizer fora do event loop, antes da primeira requisição
+    await asyncio.get_running_loop().run_in_executor(None, load_tokenizer)
+    app.state.rag_service = RAGService()
+    app.state.conversation_service = ConversationService()
+    app.state.rate_limiter = RateLimiter()
+    app.state.prefetch_limiter = RateLimiter(prefetch_rate_limit(), prefix="ratelimit:prefetch:")
+    # Executa cada turno com busca, histórico, gravação e geração em paralelo
+    app.state.turns = TurnOrchestrator(app.state.rag_service, app.state.conversation_service)
+    # Inicia a persistência de mensagens em segundo plano (write-behind)
+    app.state.conversation_service.start()
+    # Sincroniza o índice local de documentos, se habilitado
+    app.state.rag_service.start()
+    # Mede o atraso do event loop (exposto em /metrics)
+    loop_monitor.start()
+    register_service_stats(app.state.rag_service)
+    # Com vários workers, cada um publica suas métricas no SharedStore e /metrics soma todas
+    app.state.metrics_publisher = None
+    if worker_count() > 1 and settings.SHARED_STATE_BACKEND == "sqlite":
+        app.state.metrics_publisher = MetricsPublisher(get_shared_store())
+        app.state.metrics_publisher.start()
+    yield
+    # Grava as mensagens pendentes antes de fechar o pool de conexões HTTP compartilhado
+    await loop_monitor.close()
+    unregister_stats()
+    if app.state.metrics_publisher is not None:
+        await app.state.metrics_publisher.close()
+    await app.state.turns.close()
+    await app.state.rag_service.close()
+    await app.state.conversation_service.close()
+    await close_async_client()
+    await close_shared_store()
+
+app = FastAPI(lifespan=lifespan)
+
+def register_service_stats(rag_service: RAGService) -> None:
+    # Contadores do cache de busca, do cache de respostas e do micro-batching, também expostos em /metrics
+    supabase = rag_service.supabase
+    register_stats("autonoma_retrieval_cache", lambda: supabase.retrieval_stats, supabase.retrieval_metrics)
+    if rag_service.cache is not None:
+        cache = rag_service.cache
+        register_stats("autonoma_response_cache", lambda: cache.stats, lambda: {"hit_rate": cache.hit_rate()})
+    if rag_service.dispatcher is not None:
+        dispatcher = rag_service.dispatcher
+        register_stats("autonoma_batch", lambda: dispatcher.stats, dispatcher.metrics)
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, error: Overloaded):
+    # Sem capacidade no RunPod (503) ou limite de requisições do cliente (429): o cliente tenta de novo depois
+    return JSONResponse(
+        {"detail": str(error)},
+        status_code=error.status_code,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def prefetch_rate_limit() -> int:
+    if settings.PREFETCH_RATE_LIMIT_PER_MINUTE is not None:
+        return settings.PREFETCH_RATE_LIMIT_PER_MINUTE
+    return 10 * settings.RATE_LIMIT_PER_MINUTE
+
+class ConversationInput(BaseModel):
     conversation_id: str
+
+    @field_validator("conversation_id")
+    @classmethod
+    def conversation_uuid(cls, value: str) -> str:
+        # IDs de conversa são UUIDs no Postgres; IDs inválidos são recusados aqui (422)
+        return str(uuid.UUID(value))
+
+class MessageInput(ConversationInput):
     message: str
 
+class PrefetchInput(ConversationInput):
+    partial: str
+
+@app.post("/message/prefetch", status_code=202)
+async def prefetch_message(input: PrefetchInput, request: Request):
+    await request.app.state.prefetch_limiter.check(client_address(request))
+    # O frontend envia a pergunta ainda sendo digitada; a busca de contexto começa quando a digitação pausa
+    return {"prefetching": request.app.state.turns.prefetch(input.conversation_id, input.partial)}
+
 @app.post("/message")
-async def send_message(input: MessageInput):
-    # Armazena a mensagem do usuário
-    await conversation_service.add_message(input.conversation_id, "user", input.message)
-    # Obtém resposta do agente
-    response = await rag_service.ask_with_context(input.message)
-    # Armazena resposta do agente
-    await conversation_service.add_message(input.conversation_id, "assistant", response)
+async def send_message(input: MessageInput, request: Request):
+    await request.app.state.rate_limiter.check(client_address(request))
+    # Busca de contexto, histórico, gravação da mensagem do usuário e geração correm em paralelo;
+    # se o cliente desconectar antes da resposta, o job no RunPod é cancelado
+    response = await cancel_on_disconnect(
+        request.app.state.turns.run(input.conversation_id, input.message),
+        request.is_disconnected
+    )
+    if response is None:
+        # Ninguém vai ler a resposta (499: o cliente fechou a conexão)
+        return Response(status_code=499)
     # Retorna resposta para o frontend
-    return {"response": response} 
\ No newline at end of file
+    return {"response": response}
+
+@app.post("/message/stream")
+async def stream_message(input: MessageInput, request: Request):
+    await request.app.state.rate_limiter.check(client_address(request))
+    chunks = request.app.state.turns.stream(input.conversation_id, input.message)
+    # A resposta só começa com o primeiro token: sem capacidade no RunPod, o cliente recebe 503 com
+    # Retry-After (e não um stream com a mensagem de erro)
+    first = await cancel_on_disconnect(first_chunk(chunks), request.is_disconnected)
+    if first is None:
+        return Response(status_code=499)
+
+    async def events():
+        # Repassa os tokens ao frontend conforme chegam (Server-Sent Events);
+        # se o cliente desconectar, o stream é interrompido e o job no RunPod é cancelado
+        response = [first] if first else []
+        if first:
+            yield f"data: {json.dumps({'token': first})}\n\n"
+        async for chunk in chunks:
+            response.append(chunk)
+            yield f"data: {json.dumps({'token': chunk})}\n\n"
+        yield f"event: done\ndata: {json.dumps({'response': ''.join(response)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    # Histogramas de latência por etapa, no formato de texto do Prometheus (somados entre os workers)
+    publisher = getattr(request.app.state, "metrics_publisher", None)
+    text = await publisher.render() if publisher is not None else render_metrics()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import numpy as np
+from src.config.settings import settings
+
+_TOKEN = re.compile(r"\w+")
+
+T = TypeVar("T")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def parse_vector(value: Any) -> Optional[np.ndarray]:
+    """Read a pgvector value (list or '[0.1,0.2,...]' literal) as a float32 array."""
+    if isinstance(value, str):
+        value = value.strip()
+        if not value.startswith("["):
+            return None
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    if isinstance(value, (list, tuple, np.ndarray)) and len(value):
+        return np.asarray(value, dtype=np.float32)
+    return None
+
+class LocalHybridIndex:
+    """
+    In-process copy of the `documents` table for retrieval without a network round trip.
+    Embeddings live in a memory-mapped float32 matrix (normalized, one row per document) and
+    `content` in a BM25 inverted index. Vector-literal queries are ranked by cosine similarity,
+    text queries by BM25, and both rankings are merged with reciprocal-rank fusion when a query
+    carries both. New rows are appended in place, without rebuilding.
+    From async code, searches and appends go through `run`, on the index's own thread: they never
+    overlap each other and never block the event loop.
+    """
+
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75, rrf_k: int = 60):
+        self.path = path or settings.LOCAL_INDEX_PATH
+        self.k1, self.b, self.rrf_k = k1, b, rrf_k
+        self.ids: List[str] = []
+        self.contents: List[str] = []
+        self.synced_at: Optional[str] = None
+        self.dim: Optional[int] = None
+        self._positions: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._capacity = 0
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._posting_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths: List[int] = []
+        self._lengths_array: Optional[np.ndarray] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-index")
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    async def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run an index method (e.g. `search` or `add`) on the index thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def add(self, rows: List[Dict[str, Any]]) -> int:
+        """Append new document rows (id, content, optional embedding); returns how many were added."""
+        rows = [row for row in rows if str(row.get("id")) not in self._positions]
+        if not rows:
+            return 0
+        with open(self._file("documents.jsonl"), "a", encoding="utf-8") as meta:
+            for row in rows:
+                doc_id, content = str(row["id"]), row.get("content") or ""
+                meta.write(json.dumps({"id": doc_id, "content": content}) + "\n")
+                self._append(doc_id, content, parse_vector(row.get("embedding")))
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._save_state()
+        return len(rows)
+
+    def search(self, query: str, k: int = 5, query_embedding: Any = None) -> List[Dict[str, Any]]:
+        """Top-k documents for the query, shaped like match_documents rows."""
+        if not self.ids:
+            return []
+        depth = max(k * 10, 50)
+        rankings = []
+        vector = parse_vector(query_embedding) if query_embedding is not None else parse_vector(query)
+        if vector is not None and self._matrix is not None and len(vector) == self.dim:
+            rankings.append(self._vector_ranking(vector, depth))
+        if vector is None or query_embedding is not None:
+            ranking = self._bm25_ranking(query, depth)
+            if ranking:
+                rankings.append(ranking)
+        if not rankings:
+            return []
+
+        if len(rankings) == 1:
+            fused = rankings[0]
+        else:
+            scores: Dict[int, float] = {}
+            for ranking in rankings:
+                for rank, (position, _) in enumerate(ranking):
+                    scores[position] = scores.get(position, 0.0) + 1 / (self.rrf_k + rank + 1)
+            fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [
+            {"id": self.ids[position], "content": self.contents[position], "similarity": float(score)}
+            for position, score in fused[:k]
+        ]
+
+    async def sync(self, supabase, page_size: int = 1000) -> int:
+        """Pull rows added to Supabase since the last sync; returns how many were added."""
+        added, offset, newest = 0, 0, self.synced_at
+        while True:
+            rows = await supabase.select(
+                "documents",
+                columns="id,content,embedding,created_at",
+                gte={"created_at": self.synced_at} if self.synced_at else None,
+                order="created_at",
+                limit=page_size,
+                offset=offset
+            )
+            added += await self.run(self.add, rows)
+            for row in rows:
+                if row.get("created_at") and (newest is None or row["created_at"] > newest):
+                    newest = row["created_at"]
+            if len(rows) < page_size:
+                break
+            offset += len(rows)
+        self.synced_at = newest
+        await self.run(self._save_state)
+        return added
+
+    def _vector_ranking(self, vector: np.ndarray, depth: int) -> List[Tuple[int, float]]:
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return []
+        similarities = self._matrix[:len(self.ids)] @ (vector / norm)
+        return self._top(similarities, depth)
+
+    def _bm25_ranking(self, query: str, depth: int) -> List[Tuple[int, float]]:
+        terms = [term for term in set(tokenize(query)) if term in self._postings]
+        if not terms:
+            return []
+        if self._lengths_array is None:
+            self._lengths_array = np.asarray(self._lengths, dtype=np.float32)
+        lengths = self._lengths_array
+        average = float(lengths.mean()) or 1.0
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            docs, tfs = self._term_arrays(term)
+            idf = math.log(1 + (len(self.ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = tfs + self.k1 * (1 - self.b + self.b * lengths[docs] / average)
+            scores[docs] += idf * tfs * (self.k1 + 1) / norm
+        ranking = self._top(scores, depth)
+        return [(position, score) for position, score in ranking if score > 0]
+
+    def _top(self, scores: np.ndarray, depth: int) -> List[Tuple[int, float]]:
+        depth = min(depth, len(scores))
+        top = np.argpartition(-scores, depth - 1)[:depth]
+        top = top[np.argsort(-scores[top])]
+        return [(int(position), float(scores[position])) for position in top]
+
+    def _term_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            docs, tfs = self._postings[term]
+            arrays = (np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            self._posting_arrays[term] = arrays
+        return arrays
+
+    def _append(self, doc_id: str, content: str, vector: Optional[np.ndarray]) -> None:
+        position = len(self.ids)
+        self.ids.append(doc_id)
+        self.contents.append(content)
+        self._positions[doc_id] = position
+
+        terms = tokenize(content)
+        self._lengths.append(len(terms))
+        self._lengths_array = None
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            docs, tfs = self._postings.setdefault(term, ([], []))
+            docs.append(position)
+            tfs.append(count)
+            self._posting_arrays.pop(term, None)
+
+        if vector is not None and self.dim is None:
+            self.dim = len(vector)
+        if self.dim is not None:
+            self._ensure_capacity(position + 1)
+            if vector is not None and len(vector) == self.dim:
+                norm = np.linalg.norm(vector)
+                self._matrix[position] = vector / norm if norm else vector
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if self._matrix is not None and rows <= self._capacity:
+            return
+        row_bytes = self.dim * 4
+        path = self._file("embeddings.f32")
+        existing = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+        capacity = max(1024, self._capacity * 2, rows, existing)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        # Only ever grow the file: existing rows stay in place (and other open maps stay valid)
+        if capacity > existing:
+            with open(path, "ab") as matrix_file:
+                matrix_file.truncate(capacity * row_bytes)
+        self._matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _load(self) -> None:
+        if not os.path.exists(self._file("state.json")):
+            return
+        with open(self._file("state.json"), encoding="utf-8") as state_file:
+            state = json.load(state_file)
+        self.dim, self.synced_at = state.get("dim"), state.get("synced_at")
+        if self.dim:
+            self._ensure_capacity(max(state.get("count", 0), 1))
+        with open(self._file("documents.jsonl"), encoding="utf-8") as meta:
+            for line in meta:
+                row = json.loads(line)
+                # Embeddings are already in the memory-mapped matrix; only the text index is rebuilt
+                self._append(row["id"], row["content"], None)
+
+    def _save_state(self) -> None:
+        with open(self._file("state.json"), "w", encoding="utf-8") as state_file:
+            json.dump({"dim": self.dim, "count": len(self.ids), "synced_at": self.synced_at}, state_file)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from src.config.settings import settings
+from src.services.supabase_service import SupabaseService
+from src.services.tokenizer import chunk_by_tokens
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown", ".rst", ".html", ".csv", ".json")
+
+def read_source(path: str) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Yield (key, content, metadata) for every document under `path`: each text file of a directory,
+    each line of a JSONL file (`content` or `text`, plus optional `metadata`), or a single text file.
+    The key identifies the document in the checkpoint.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.lower().endswith(TEXT_EXTENSIONS):
+                    continue
+                file_path = os.path.join(root, name)
+                relative = os.path.relpath(file_path, path)
+                with open(file_path, encoding="utf-8", errors="replace") as source_file:
+                    yield relative, source_file.read(), {"source": relative}
+    elif path.endswith(".jsonl"):
+        name = os.path.basename(path)
+        with open(path, encoding="utf-8") as source_file:
+            for line_number, line in enumerate(source_file, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                metadata = dict(row.get("metadata") or {})
+                metadata.setdefault("source", f"{name}:{line_number}")
+                yield f"{name}:{line_number}", row.get("content") or row.get("text") or "", metadata
+    else:
+        name = os.path.basename(path)
+        with open(path, encoding="utf-8", errors="replace") as source_file:
+            yield name, source_file.read(), {"source": name}
+
+def content_hash(text: str) -> str:
+    """Hash of the whitespace-normalized text, used to skip chunks that are already stored."""
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+class Checkpoint:
+    """Keys of fully ingested documents, saved atomically so an interrupted run can resume."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.done: Set[str] = set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint_file:
+                self.done = set(json.load(checkpoint_file).get("done", []))
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as checkpoint_file:
+            json.dump({"done": sorted(self.done)}, checkpoint_file)
+        os.replace(temporary, self.path)
+
+@dataclass
+class IngestionStats:
+    """Counters for one ingestion run."""
+    documents: int = 0
+    resumed: int = 0
+    chunks: int = 0
+    duplicates: int = 0
+    existing: int = 0
+    inserted: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.documents} documents ({self.resumed} already done) -> {self.chunks} chunks, "
+            f"{self.duplicates} duplicates, {self.existing} already stored, {self.inserted} inserted "
+            f"in {self.elapsed:.1f}s ({self.documents_per_second:.1f} docs/s)"
+        )
+
+class IngestionPipeline:
+    """
+    Streaming bulk loader for the `documents` table.
+    Documents are read and split into overlapping token chunks, chunks are deduplicated by content hash,
+    batches are embedded by a pool of concurrent workers, and rows are written with multi-row inserts.
+    Chunks whose hash is already stored are skipped, and a document is checkpointed once all of its
+    chunks are written, so a rerun after a crash picks up where the last one stopped.
+    """
+
+    def __init__(
+        self,
+        supabase: Optional[SupabaseService] = None,
+        embedder=None,
+        chunk_tokens: int = None,
+        overlap: int = None,
+        embed_batch_size: int = None,
+        workers: int = None,
+        insert_batch_size: int = None,
+        checkpoint_path: Optional[str] = None,
+        table: str = "documents",
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        report_interval: float = 5.0
+    ):
+        self.supabase = supabase or SupabaseService()
+        self.embedder = embedder
+        self.chunk_tokens = chunk_tokens or settings.INGEST_CHUNK_TOKENS
+        self.overlap = overlap if overlap is not None else settings.INGEST_CHUNK_OVERLAP
+        self.embed_batch_size = embed_batch_size or settings.INGEST_EMBED_BATCH_SIZE
+        self.workers = workers or settings.INGEST_EMBED_WORKERS
+        self.insert_batch_size = insert_batch_size or settings.INGEST_INSERT_BATCH_SIZE
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.table = table
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.report_interval = report_interval
+        self.stats = IngestionStats()
+        self._pending: Dict[str, int] = {}
+
+    async def run(self, source: str) -> IngestionStats:
+        """Ingest every document under `source` and return the run's counters."""
+        self.stats, self._pending = IngestionStats(), {}
+        start = last_report = time.perf_counter()
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        insert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self._embed_worker(embed_queue, insert_queue)) for _ in range(self.workers)]
+        writer = asyncio.create_task(self._insert_worker(insert_queue))
+        tasks = workers + [writer]
+        seen: Set[str] = set()
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        try:
+            for key, content, metadata in read_source(source):
+                if key in self.checkpoint.done:
+                    self.stats.resumed += 1
+                    continue
+                self.stats.documents += 1
+                chunks = []
+                for index, chunk in enumerate(chunk_by_tokens(content, self.chunk_tokens, self.overlap)):
+                    digest = content_hash(chunk)
+                    if digest in seen:
+                        self.stats.duplicates += 1
+                        continue
+                    seen.add(digest)
+                    chunks.append((key, {"content": chunk, "metadata": {**metadata, "chunk": index, "content_hash": digest}}))
+                if not chunks:
+                    self.checkpoint.done.add(key)
+                    continue
+                self._pending[key] = len(chunks)
+                self.stats.chunks += len(chunks)
+                batch.extend(chunks)
+                while len(batch) >= self.embed_batch_size:
+                    await self._put(embed_queue, batch[:self.embed_batch_size], tasks)
+                    batch = batch[self.embed_batch_size:]
+
+                if time.perf_counter() - last_report >= self.report_interval:
+                    last_report = time.perf_counter()
+                    self.stats.elapsed = last_report - start
+                    logger.info("📥 %s", self.stats.summary())
+
+            if batch:
+                await self._put(embed_queue, batch, tasks)
+            for _ in workers:
+                await self._put(embed_queue, None, tasks)
+            await asyncio.gather(*workers)
+            await insert_queue.put(None)
+            await writer
+            if self.stats.inserted and self.table == "documents":
+                await self.supabase.invalidate_retrieval_cache()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.checkpoint.save()
+            self.stats.elapsed = time.perf_counter() - start
+        return self.stats
+
+    async def _put(self, queue: asyncio.Queue, item: Any, tasks: List[asyncio.Task]) -> None:
+        """Queue an item, failing fast if a worker died instead of waiting on a queue nobody drains."""
+        put = asyncio.ensure_future(queue.put(item))
+        done, _ = await asyncio.wait([put, *tasks], return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+        for task in done:
+            if task is not put:
+                task.result()
+                raise RuntimeError("Ingestion worker stopped unexpectedly")
+
+    async def _embed_worker(self, embed_queue: asyncio.Queue, insert_queue: asyncio.Queue) -> None:
+        while True:
+            batch = await embed_queue.get()
+            if batch is None:
+                return
+            # Skip chunks a previous (interrupted) run already stored before paying for their embeddings
+            hashes = [row["metadata"]["content_hash"] for _, row in batch]
+            stored = await self._retry("existing hashes", lambda: self.supabase.select(
+                self.table,
+                columns="content_hash:metadata->>content_hash",
+                in_={"metadata->>content_hash": hashes}
+            ))
+            existing = {row["content_hash"] for row in stored}
+            self.stats.existing += len(existing)
+            rows = [row for _, row in batch if row["metadata"]["content_hash"] not in existing]
+            if rows and self.embedder is not None:
+                vectors = await self._retry("embeddings", lambda: self.embedder.embed([row["content"] for row in rows]))
+                for row, vector in zip(rows, vectors):
+                    row["embedding"] = vector
+            await insert_queue.put(([key for key, _ in batch], rows))
+
+    async def _insert_worker(self, insert_queue: asyncio.Queue) -> None:
+        keys: List[str] = []
+        rows: List[Dict[str, Any]] = []
+        last_save = time.perf_counter()
+        while True:
+            item = await insert_queue.get()
+            if item is not None:
+                keys.extend(item[0])
+                rows.extend(item[1])
+                if len(rows) < self.insert_batch_size:
+                    continue
+            for offset in range(0, len(rows), self.insert_batch_size):
+                chunk = rows[offset:offset + self.insert_batch_size]
+                await self._retry(self.table, lambda: self.supabase.insert(self.table, chunk, returning=False))
+                self.stats.inserted += len(chunk)
+            # A document is done once the last of its chunks has been written
+            for key in keys:
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key]
+                    self.checkpoint.done.add(key)
+            if time.perf_counter() - last_save >= 1.0:
+                self.checkpoint.save()
+                last_save = time.perf_counter()
+            keys, rows = [], []
+            if item is None:
+                return
+
+    async def _retry(self, target: str, operation: Callable[[], Awaitable[Any]]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await operation()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error("❌ Error ingesting %s: %s", target, e)
+                    raise
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
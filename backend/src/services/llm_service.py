@@ -1,8 +1,17 @@
+import asyncio
+import logging
 import requests
 import time
-import json
-from typing import Dict, Any, Optional
+import httpx
+from typing import AsyncIterator, Dict, Any, List, Optional, Set
 from src.config.settings import settings
+from src.services.http_client import get_async_client
+from src.services.metrics_service import observe, observe_prompt, stage
+from src.services.output_service import OutputDecoder, decode_output, extract_text
+from src.services.polling_service import PollingScheduler
+from src.services.prompt_service import get_prompt_template
+
+logger = logging.getLogger(__name__)
 
 class LLMService:
     def __init__(self):
@@ -11,103 +20,240 @@ class LLMService:
             "Authorization": f"Bearer {settings.RUNPOD_API_TOKEN}"
         }
         self.endpoint_id = settings.RUNPOD_ENDPOINT_ID
+        self.base_url = f"{settings.RUNPOD_BASE_URL}/{self.endpoint_id}"
+        self.template = get_prompt_template()
+    
+    def _format_prompt(self, prompt: str, context: Optional[str] = None, history: Optional[str] = None) -> str:
+        """Format the prompt with agent personality, optional conversation history and optional context."""
+        with stage("prompt_assembly"):
+            assembled = self.template.assemble(prompt, context, history)
+        observe_prompt(assembled.section_tokens)
+        logger.debug("Prompt tokens per section: %s", assembled.section_tokens, extra={"section_tokens": assembled.section_tokens})
+        return assembled.text
     
-    def _format_prompt(self, prompt: str, context: Optional[str] = None) -> str:
-        """Format the prompt with agent personality and optional context."""
-        if context:
-            return f"<think>\nPersonality: {settings.AGENT_PERSONALITY}\nContext: {context}\n\nQuestion: {prompt}\n</think>"
-        return f"<think>\nPersonality: {settings.AGENT_PERSONALITY}\n\nQuestion: {prompt}\n</think>"
+    def _build_payload(self, prompt: str, context: Optional[str] = None, history: Optional[str] = None) -> Dict[str, Any]:
+        """Build the RunPod job payload for a prompt."""
+        return {"input": {"prompt": self._format_prompt(prompt, context, history), **self._sampling_params()}}
     
-    def run_job(self, prompt: str, context: Optional[str] = None) -> str:
+    def _sampling_params(self) -> Dict[str, Any]:
+        return {
+            "temperature": settings.TEMPERATURE,
+            "max_tokens": settings.MAX_TOKENS,
+            "top_p": settings.TOP_P
+        }
+    
+    def run_job(self, prompt: str, context: Optional[str] = None, history: Optional[str] = None) -> str:
         """Run a job on RunPod."""
         try:
-            formatted_prompt = self._format_prompt(prompt, context)
-            payload = {
-                "input": {
-                    "prompt": formatted_prompt,
-                    "temperature": settings.TEMPERATURE,
-                    "max_tokens": settings.MAX_TOKENS,
-                    "top_p": settings.TOP_P,
-                    "stop": ["</think>"]
-                }
-            }
-            url = f"https://api.runpod.ai/v2/{self.endpoint_id}/run"
+            payload = self._build_payload(prompt, context, history)
+            url = f"{self.base_url}/run"
             response = requests.post(url, headers=self.headers, json=payload)
             response.raise_for_status()
             return response.json()["id"]
         except Exception as e:
-            print(f"❌ Error starting job: {str(e)}")
+            logger.error("❌ Error starting job: %s", e)
             raise
     
     def check_status(self, job_id: str) -> Dict[str, Any]:
         """Check the status of a job."""
         try:
-            url = f"https://api.runpod.ai/v2/{self.endpoint_id}/status/{job_id}"
+            url = f"{self.base_url}/status/{job_id}"
             response = requests.get(url, headers=self.headers)
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            print(f"❌ Error checking status: {str(e)}")
+            logger.error("❌ Error checking status: %s", e)
             raise
     
     def wait_for_result(self, job_id: str, interval: int = 2) -> str:
         """Wait for job completion and return the result."""
-        print("🔄 Waiting for processing...")
+        logger.debug("🔄 Waiting for processing...")
         while True:
             result = self.check_status(job_id)
             status = result["status"]
             
             if status == "COMPLETED":
-                print("✅ Processing complete!")
+                logger.debug("✅ Processing complete!")
                 return self._process_output(result.get("output", {}))
             elif status == "FAILED":
-                print("❌ Job failed!")
+                logger.error("❌ Job failed!")
                 if "error" in result:
-                    print(f"Error: {result['error']}")
+                    logger.error("Error: %s", result["error"])
                 raise Exception("Job failed")
             elif status == "IN_QUEUE":
-                print("⏳ In queue...")
+                logger.debug("⏳ In queue...")
             elif status == "IN_PROGRESS":
-                print("⚙️ Processing...")
+                logger.debug("⚙️ Processing...")
             
             time.sleep(interval)
         
     def _process_output(self, output: Any) -> str:
-        """Extract and return clean plain-text response from the LLM output."""
-        try:
-            if isinstance(output, str):
-                try:
-                    output = json.loads(output)
-                except json.JSONDecodeError:
-                    return self._clean_text(output)
-
-            if isinstance(output, list):
-                for item in output:
-                    if isinstance(item, dict):
-                        choices = item.get("choices", [])
-                        for choice in choices:
-                            tokens = choice.get("tokens")
-                            if isinstance(tokens, list):
-                                joined = "".join(tokens)
-                                return self._clean_text(joined)
-                            elif isinstance(tokens, str):
-                                return self._clean_text(tokens)
+        """Extract and return the answer from the LLM output, with reasoning removed and Markdown kept."""
+        with stage("output_processing"):
+            try:
+                return decode_output(output)
+            except Exception as e:
+                logger.warning("⚠️ Failed to process output: %s", e)
+                return decode_output(str(output))
 
-            if isinstance(output, dict):
-                for key in ["text", "response", "output", "result"]:
-                    if key in output:
-                        return self._clean_text(str(output[key]))
 
-            return self._clean_text(str(output))
+class AsyncLLMService(LLMService):
+    """Non-blocking RunPod client backed by the shared keep-alive connection pool."""
 
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        super().__init__()
+        self._client = client
+        self.scheduler = PollingScheduler(self.check_status)
+        self._submitted: Dict[str, float] = {}
+        self._cancels: Set[asyncio.Task] = set()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+    
+    async def run_job(self, prompt: str, context: Optional[str] = None, history: Optional[str] = None) -> str:
+        """Run a job on RunPod without blocking the event loop."""
+        try:
+            return await self._submit(self._build_payload(prompt, context, history))
+        except Exception as e:
+            logger.error("❌ Error starting job: %s", e)
+            raise
+    
+    async def run_batch_job(self, prompts: List[str]) -> str:
+        """
+        Run several already-formatted prompts as one RunPod job.
+        The endpoint's handler must accept `input.prompts` and return one output per prompt, in order.
+        A single prompt is sent as a regular job.
+        """
+        try:
+            if len(prompts) == 1:
+                return await self._submit({"input": {"prompt": prompts[0], **self._sampling_params()}})
+            return await self._submit({"input": {"prompts": prompts, **self._sampling_params()}})
+        except Exception as e:
+            logger.error("❌ Error starting batch job: %s", e)
+            raise
+    
+    async def _submit(self, payload: Dict[str, Any]) -> str:
+        submitted_at = time.monotonic()
+        response = await self.client.post(f"{self.base_url}/run", headers=self.headers, json=payload)
+        response.raise_for_status()
+        job_id = response.json()["id"]
+        # Entries are in submission order; jobs nobody waited on (the turn was cancelled in between)
+        # are forgotten once they are older than the polling deadline
+        while self._submitted:
+            oldest = next(iter(self._submitted))
+            if submitted_at - self._submitted[oldest] <= settings.POLL_DEADLINE:
+                break
+            del self._submitted[oldest]
+        self._submitted[job_id] = submitted_at
+        return job_id
+    
+    async def check_status(self, job_id: str) -> Dict[str, Any]:
+        """Check the status of a job without blocking the event loop."""
+        try:
+            response = await self.client.get(f"{self.base_url}/status/{job_id}", headers=self.headers)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
-            print(f"⚠️ Warning: Failed to process output: {str(e)}")
-            return self._clean_text(str(output))
-    
-    def _clean_text(self, text: str) -> str:
-        """Remove noise from the model's response for clean output."""
-        text = text.replace('\\n', '\n').replace('\\t', '    ').replace('\\"', '"')
-        text = text.replace('[', '').replace(']', '').replace('{', '').replace('}', '')
-        text = text.replace("'", '').replace('"', '')
-        text = ' '.join(text.split())  # remove múltiplos espaços e quebras
-        return text.strip()
+            logger.error("❌ Error checking status: %s", e)
+            raise
+    
+    async def wait_for_output(self, job_id: str, deadline: Optional[float] = None) -> Any:
+        """Wait for job completion through the shared adaptive polling loop and return the raw output."""
+        logger.debug("🔄 Waiting for processing...")
+        try:
+            result = await self.scheduler.wait(job_id, self._submitted.pop(job_id, None), deadline)
+        except (asyncio.CancelledError, TimeoutError):
+            # Nobody will read this answer (the caller went away or gave up), so stop spending GPU time on it
+            self.cancel_in_background(job_id)
+            raise
+        status = result["status"]
+        
+        # RunPod reports how long the job queued and ran, in milliseconds
+        if result.get("delayTime") is not None:
+            observe("runpod_queue", result["delayTime"] / 1000)
+        if result.get("executionTime") is not None:
+            observe("runpod_execution", result["executionTime"] / 1000)
+        
+        if status == "COMPLETED":
+            logger.debug("✅ Processing complete!")
+            return result.get("output", {})
+        
+        logger.error("❌ Job %s!", status.lower())
+        if "error" in result:
+            logger.error("Error: %s", result["error"])
+        raise Exception("Job failed")
+    
+    async def cancel_job(self, job_id: str) -> None:
+        """Cancel a queued or running job through RunPod's /cancel endpoint."""
+        try:
+            response = await self.client.post(f"{self.base_url}/cancel/{job_id}", headers=self.headers)
+            response.raise_for_status()
+            logger.info("🛑 Cancelled job %s", job_id)
+        except Exception as e:
+            logger.warning("⚠️ Error cancelling job %s: %s", job_id, e)
+    
+    def cancel_in_background(self, job_id: str) -> None:
+        """Cancel a job without waiting, e.g. from a task that is itself being cancelled."""
+        task = asyncio.ensure_future(self.cancel_job(job_id))
+        self._cancels.add(task)
+        task.add_done_callback(self._cancels.discard)
+    
+    async def close(self) -> None:
+        """Wait for cancellations still being sent."""
+        if self._cancels:
+            await asyncio.gather(*self._cancels, return_exceptions=True)
+    
+    async def wait_for_result(self, job_id: str, deadline: Optional[float] = None) -> str:
+        """Wait for job completion and return the cleaned answer."""
+        return self._process_output(await self.wait_for_output(job_id, deadline))
+    
+    async def stream_result(self, job_id: str, interval: float = 0.5, deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield decoded text chunks from RunPod's /stream endpoint as they are generated.
+        If the consumer stops early (e.g. the client disconnected) or the job is still not done after
+        `deadline` seconds (POLL_DEADLINE), the job is cancelled; the latter raises TimeoutError.
+        """
+        # Only the polling loop needs the submission time
+        self._submitted.pop(job_id, None)
+        decoder = OutputDecoder()
+        finished = False
+        expires_at = time.monotonic() + (deadline if deadline is not None else settings.POLL_DEADLINE)
+        try:
+            while True:
+                try:
+                    response = await self.client.get(f"{self.base_url}/stream/{job_id}", headers=self.headers)
+                    response.raise_for_status()
+                    result = response.json()
+                except Exception as e:
+                    logger.error("❌ Error streaming job: %s", e)
+                    raise
+                
+                chunks = result.get("stream", [])
+                for item in chunks:
+                    text = decoder.feed(extract_text(item.get("output", "")))
+                    if text:
+                        yield text
+                
+                status = result.get("status")
+                if status == "COMPLETED":
+                    finished = True
+                    tail = decoder.flush()
+                    if tail:
+                        yield tail
+                    return
+                elif status in ("FAILED", "CANCELLED", "TIMED_OUT"):
+                    finished = True
+                    logger.error("❌ Job %s!", status.lower())
+                    if "error" in result:
+                        logger.error("Error: %s", result["error"])
+                    raise Exception("Job failed")
+                
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Job {job_id} did not finish before the polling deadline")
+                if not chunks:
+                    await asyncio.sleep(min(interval, remaining))
+        finally:
+            if not finished:
+                self.cancel_in_background(job_id)
@@ -0,0 +1,144 @@
+import re
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+from src.config.settings import settings
+from src.services.tokenizer import count_tokens, truncate_to_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+@dataclass
+class _Turn:
+    role: str
+    content: str
+    tokens: int
+
+@dataclass
+class _Window:
+    turns: Deque[_Turn] = field(default_factory=deque)
+    tokens: int = 0
+    summary: Deque[_Turn] = field(default_factory=deque)
+    summary_tokens: int = 0
+    rendered: Optional[str] = None
+    version: int = 0
+    # Newest message seen and the IDs of the last few, to add only what is new on a reload
+    newest: Optional[str] = None
+    recent_ids: Deque[str] = field(default_factory=lambda: deque(maxlen=64))
+
+class ConversationMemory:
+    """
+    Per-conversation rolling window of recent turns, kept within a token budget.
+    The window is updated as messages are added, so assembling the history costs the same on
+    turn 200 as on turn 2. Turns pushed out of the budget are folded into a short extractive
+    summary with its own budget.
+    Each window counts the messages it has seen (its version), so a multi-worker server can tell
+    when another worker has added to the conversation and `extend` the window with just those.
+    """
+
+    def __init__(self, token_budget: int = None, summary_budget: int = None, max_conversations: int = None):
+        self.token_budget = token_budget or settings.HISTORY_TOKEN_BUDGET
+        self.summary_budget = summary_budget or settings.HISTORY_SUMMARY_TOKEN_BUDGET
+        self.max_conversations = max_conversations or settings.HISTORY_MAX_CONVERSATIONS
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+
+    def has(self, conversation_id: str) -> bool:
+        return conversation_id in self._windows
+
+    def load(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Build the window from stored messages (oldest first), e.g. after a restart."""
+        self._windows[conversation_id] = _Window()
+        self._evict_conversations()
+        self.extend(conversation_id, messages)
+
+    def extend(self, conversation_id: str, messages: List[Dict[str, Any]]) -> int:
+        """Append stored messages (oldest first) that the window has not seen yet; returns how many were new."""
+        window = self._windows.get(conversation_id)
+        if window is None:
+            return 0
+        added = 0
+        for message in messages:
+            if message.get("id") is not None and message["id"] in window.recent_ids:
+                continue
+            self.append(conversation_id, message["role"], message["content"], message.get("id"), message.get("created_at"))
+            added += 1
+        return added
+
+    def append(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        message_id: Optional[str] = None,
+        created_at: Optional[str] = None
+    ) -> None:
+        """Add a turn to a loaded window and trim it back to the token budget."""
+        window = self._windows.get(conversation_id)
+        if window is None:
+            return
+        self._windows.move_to_end(conversation_id)
+        window.version += 1
+        if message_id is not None:
+            window.recent_ids.append(message_id)
+        if created_at is not None and (window.newest is None or created_at > window.newest):
+            window.newest = created_at
+        turn = _Turn(role, content, count_tokens(content))
+        window.turns.append(turn)
+        window.tokens += turn.tokens
+        while window.tokens > self.token_budget and len(window.turns) > 1:
+            oldest = window.turns.popleft()
+            window.tokens -= oldest.tokens
+            self._summarize(window, oldest)
+        if window.tokens > self.token_budget:
+            # A single turn larger than the whole budget is cut down to fit
+            turn.content = truncate_to_tokens(turn.content, self.token_budget)
+            turn.tokens = count_tokens(turn.content)
+            window.tokens = turn.tokens
+        window.rendered = None
+
+    def version(self, conversation_id: str) -> Optional[int]:
+        """Number of messages the window has seen, to compare with the shared count on multi-worker servers."""
+        window = self._windows.get(conversation_id)
+        return window.version if window is not None else None
+
+    def newest(self, conversation_id: str) -> Optional[str]:
+        """`created_at` of the newest message in the window."""
+        window = self._windows.get(conversation_id)
+        return window.newest if window is not None else None
+
+    def set_version(self, conversation_id: str, version: int) -> None:
+        window = self._windows.get(conversation_id)
+        if window is not None:
+            window.version = version
+
+    def render(self, conversation_id: str) -> str:
+        """Return the summary and recent turns as prompt-ready text."""
+        window = self._windows.get(conversation_id)
+        if window is None:
+            return ""
+        self._windows.move_to_end(conversation_id)
+        if window.rendered is None:
+            parts = []
+            if window.summary:
+                parts.append("Earlier in this conversation:\n" + "\n".join(self._line(turn) for turn in window.summary))
+            if window.turns:
+                parts.append("\n".join(self._line(turn) for turn in window.turns))
+            window.rendered = "\n\n".join(parts)
+        return window.rendered
+
+    def _summarize(self, window: _Window, turn: _Turn) -> None:
+        # Keep the first sentence of the evicted turn, dropping the oldest summary lines past the budget
+        gist = _SENTENCE_END.split(turn.content.strip(), maxsplit=1)[0]
+        if len(gist) > 200:
+            gist = gist[:200].rsplit(" ", 1)[0] + "…"
+        line = _Turn(turn.role, gist, count_tokens(gist))
+        window.summary.append(line)
+        window.summary_tokens += line.tokens
+        while window.summary_tokens > self.summary_budget and len(window.summary) > 1:
+            window.summary_tokens -= window.summary.popleft().tokens
+
+    def _line(self, turn: _Turn) -> str:
+        return f"{'User' if turn.role == 'user' else 'Assistant'}: {turn.content}"
+
+    def _evict_conversations(self) -> None:
+        while len(self._windows) > self.max_conversations:
+            self._windows.popitem(last=False)
@@ -0,0 +1,274 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+    """Prometheus-style histogram with cumulative buckets, one series per label value (if it has a label)."""
+
+    def __init__(self, name: str, documentation: str, label: Optional[str] = None, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, label_value: str = "") -> None:
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total) in sorted(self._series.items()):
+            label = f'{self.label}="{label_value}"' if self.label else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label + "," if label else ""}le="{le}"}} {cumulative}')
+            suffix = f"{{{label}}}" if label else ""
+            lines.append(f"{self.name}_sum{suffix} {total[0]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+    def state(self) -> Dict[str, Tuple[List[int], float]]:
+        """Bucket counts and sum per label value, JSON-serialisable, to share with other processes."""
+        return {label_value: (list(counts), total[0]) for label_value, (counts, total) in self._series.items()}
+
+    def merge(self, state: Dict[str, Tuple[List[int], float]]) -> None:
+        """Add another histogram's `state()` to this one."""
+        for label_value, (counts, total) in state.items():
+            series = self._series.setdefault(label_value, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, count in enumerate(counts):
+                series[0][i] += count
+            series[1][0] += total
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.label, self.buckets)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Count and mean per label value, for benchmarks and debugging."""
+        return {
+            label_value: {"count": sum(counts), "mean": total[0] / sum(counts)}
+            for label_value, (counts, total) in self._series.items() if sum(counts)
+        }
+
+STAGE_SECONDS = Histogram(
+    "autonoma_stage_seconds",
+    "Time spent in each stage of a chat turn, in seconds.",
+    label="stage"
+)
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "autonoma_event_loop_lag_seconds",
+    "How late the event loop ran a periodic timer, in seconds.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+PROMPT_TOKENS = Histogram(
+    "autonoma_prompt_tokens",
+    "Tokens in each section of an assembled prompt (prefix, history, context, question).",
+    label="section",
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+
+HISTOGRAMS = (STAGE_SECONDS, PROMPT_TOKENS, EVENT_LOOP_LAG_SECONDS)
+
+_stats_sources: Dict[str, Tuple[Callable[[], Dict[str, float]], Callable[[], Dict[str, float]]]] = {}
+
+def register_stats(prefix: str, counters: Callable[[], Dict[str, float]], gauges: Callable[[], Dict[str, float]]) -> None:
+    """
+    Export a service's own statistics on /metrics, read each time the metrics are rendered:
+    `counters()` as `<prefix>_<name>_total` counters, and the rest of `gauges()` (rates, averages)
+    as `<prefix>_<name>` gauges.
+    """
+    _stats_sources[prefix] = (counters, gauges)
+
+def unregister_stats() -> None:
+    _stats_sources.clear()
+
+def collect_stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    stats = {}
+    for prefix, (counters, gauges) in _stats_sources.items():
+        counted = dict(counters())
+        stats[prefix] = {
+            "counters": counted,
+            "gauges": {name: value for name, value in gauges().items() if name not in counted}
+        }
+    return stats
+
+def _render_stats(workers: List[Tuple[Optional[str], Dict[str, Dict[str, Dict[str, float]]]]]) -> List[str]:
+    # One series per worker (labelled when there are several): rates and averages cannot be summed
+    series: Dict[str, Tuple[str, List[str]]] = {}
+    for worker, stats in workers:
+        label = f'{{worker="{worker}"}}' if worker else ""
+        for prefix, values in sorted(stats.items()):
+            for kind, suffix, metric_type in (("counters", "_total", "counter"), ("gauges", "", "gauge")):
+                for name, value in sorted(values[kind].items()):
+                    metric = f"{prefix}_{name}{suffix}"
+                    series.setdefault(metric, (metric_type, []))[1].append(f"{metric}{label} {float(value)}")
+    lines = []
+    for metric, (metric_type, samples) in series.items():
+        lines += [f"# TYPE {metric} {metric_type}", *samples]
+    return lines
+
+class LoopLagMonitor:
+    """
+    Samples event-loop lag: a timer asks to wake up every `interval` seconds and records how late it ran.
+    Lag means something is holding the loop (blocking I/O, CPU-heavy work) and every request waits behind it.
+    """
+
+    def __init__(self, interval: float = 0.05, history: int = 10000):
+        self.interval = interval
+        self.samples: Deque[float] = deque(maxlen=history)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            if settings.METRICS_ENABLED:
+                EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+@lru_cache()
+def get_tracer():
+    """OpenTelemetry tracer when TRACING_ENABLED is set; exporters are configured through the SDK as usual."""
+    if not settings.TRACING_ENABLED:
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError as e:
+        raise ImportError("Tracing requires the 'opentelemetry-api' package (pip install opentelemetry-api opentelemetry-sdk)") from e
+    return trace.get_tracer("autonoma")
+
+def observe(stage_name: str, seconds: float) -> None:
+    """Record a duration measured elsewhere (e.g. RunPod's delayTime) and attach it to the current span."""
+    if settings.METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage_name)
+    if get_tracer() is not None:
+        from opentelemetry import trace
+        trace.get_current_span().set_attribute(f"{stage_name}.seconds", seconds)
+
+@contextmanager
+def stage(stage_name: str) -> Iterator[None]:
+    """Time a block as one pipeline stage: a histogram observation, plus a span when tracing is on."""
+    tracer = get_tracer()
+    start = time.perf_counter()
+    with tracer.start_as_current_span(stage_name) if tracer is not None else nullcontext():
+        try:
+            yield
+        finally:
+            if settings.METRICS_ENABLED:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage_name)
+
+async def timed(stage_name: str, awaitable: Awaitable[T]) -> T:
+    """Await something as one pipeline stage (for stages that run inside asyncio.gather)."""
+    with stage(stage_name):
+        return await awaitable
+
+def observe_prompt(section_tokens: Dict[str, int]) -> None:
+    """Record the token count of each section of one prompt, to see which section fills the budget."""
+    if settings.METRICS_ENABLED:
+        for section, tokens in section_tokens.items():
+            PROMPT_TOKENS.observe(tokens, section)
+
+def render_metrics(snapshots: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    All metrics in the Prometheus text exposition format: this process's, or those of several
+    workers' `snapshots`, with the histograms summed and the service statistics labelled by worker.
+    """
+    if snapshots is None:
+        histograms, stats = HISTOGRAMS, [(None, collect_stats())]
+    else:
+        histograms = []
+        for histogram in HISTOGRAMS:
+            merged = histogram.empty()
+            for snapshot in snapshots:
+                merged.merge(snapshot["histograms"].get(histogram.name, {}))
+            histograms.append(merged)
+        stats = sorted((snapshot["worker"], snapshot["stats"]) for snapshot in snapshots)
+    lines = [line for histogram in histograms for line in histogram.render()]
+    return "\n".join(lines + _render_stats(stats)) + "\n"
+
+class MetricsPublisher:
+    """
+    Shares this worker's histograms with the other worker processes through the SharedStore, so a
+    /metrics scrape answered by any worker reports the sum over all of them (and every worker's
+    service statistics, labelled by its pid).
+    Each worker writes its snapshot every `interval` seconds; a snapshot expires after three missed
+    intervals, so the series of a worker that has exited stop counting.
+    """
+    PREFIX = "metrics:"
+
+    def __init__(self, store, interval: float = 5.0):
+        self.store = store
+        self.interval = interval
+        self.key = f"{self.PREFIX}{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self) -> None:
+        snapshot = {
+            "worker": self.key[len(self.PREFIX):],
+            "histograms": {histogram.name: histogram.state() for histogram in HISTOGRAMS},
+            "stats": collect_stats()
+        }
+        await self.store.set(self.key, json.dumps(snapshot), self.interval * 3)
+
+    async def render(self) -> str:
+        """Every live worker's metrics, summed, with this worker's own brought up to date first."""
+        await self.publish()
+        return render_metrics([json.loads(value) for value in await self.store.values_prefix(self.PREFIX)])
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.warning("⚠️ Could not share metrics with the other workers: %s", e)
@@ -0,0 +1,182 @@
+import json
+import re
+from typing import Any, List, Optional
+from src.config.settings import settings
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+_TAG = re.compile(r"</?think>")
+
+def extract_text(output: Any) -> str:
+    """Pull the raw generated text out of a RunPod output payload (`choices[].tokens`, `choices[].text` or `text`)."""
+    if isinstance(output, str):
+        # Only JSON-looking payloads are parsed; plain generated text is returned as is
+        if output[:1] not in ("[", "{") and output.lstrip()[:1] not in ("[", "{"):
+            return output
+        try:
+            output = json.loads(output)
+        except ValueError:
+            return output
+
+    if isinstance(output, dict) and "choices" in output:
+        output = [output]
+
+    if isinstance(output, list):
+        for item in output:
+            if isinstance(item, dict):
+                for choice in item.get("choices") or []:
+                    tokens = choice.get("tokens")
+                    if tokens is None:
+                        tokens = choice.get("text")
+                    if isinstance(tokens, list):
+                        return "".join(tokens)
+                    elif isinstance(tokens, str):
+                        return tokens
+
+    if isinstance(output, dict):
+        for key in ["text", "response", "output", "result"]:
+            if key in output:
+                return str(output[key])
+
+    return str(output)
+
+def decode_string_literal(text: str) -> str:
+    """
+    Decode text that was encoded twice and arrives as a JSON string literal ("...\\n...").
+    Anything else is returned untouched, so backslashes in code and paths are kept as written.
+    """
+    stripped = text.strip()
+    if len(stripped) < 2 or stripped[0] != '"' or stripped[-1] != '"':
+        return text
+    try:
+        decoded = json.loads(stripped)
+    except ValueError:
+        return text
+    return decoded if isinstance(decoded, str) else text
+
+def decode_output(output: Any) -> str:
+    """Extract and decode a complete RunPod output in one pass."""
+    decoder = OutputDecoder()
+    return decoder.feed(decode_string_literal(extract_text(output))) + decoder.flush()
+
+class OutputDecoder:
+    """
+    Turns generated text into the answer shown to the user, chunk by chunk.
+    `<think>...</think>` reasoning spans are dropped and leading/trailing whitespace is trimmed;
+    newlines, indentation, quotes, brackets and backslashes are kept, so Markdown survives.
+    With `reasoning_first` (REASONING_MODEL), the model may also write its reasoning without the
+    opening tag: text is held back until the first tag shows which it was, and text before a stray
+    `</think>` is dropped. An answer that is all reasoning (cut off before `</think>`) falls back to
+    the reasoning text rather than coming out empty.
+    Feeding chunks one by one yields the same text as decoding their concatenation.
+    """
+
+    def __init__(self, reasoning_first: Optional[bool] = None):
+        if reasoning_first is None:
+            reasoning_first = settings.REASONING_MODEL
+        self._carry = ""
+        self._space = ""
+        self._started = False
+        self._thinking = False
+        self._pending: Optional[List[str]] = [] if reasoning_first else None
+        self._reasoning: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Decode the next chunk, holding back a tag that the chunk boundary cut in two."""
+        text = self._carry + chunk
+        hold = self._incomplete_suffix(text)
+        self._carry = text[len(text) - hold:] if hold else ""
+        return self._decode(text[:len(text) - hold] if hold else text)
+
+    def flush(self) -> str:
+        """Emit anything still held back at the end of the stream; trailing whitespace is dropped."""
+        carry, self._carry = self._carry, ""
+        if self._thinking:
+            self._keep_reasoning(carry)
+            carry = ""
+        if self._pending is not None:
+            carry = "".join(self._pending) + carry
+            self._pending = None
+        text = carry.rstrip()
+        if not text and not self._started:
+            text = "".join(self._reasoning).strip()
+        space, self._space, self._reasoning = self._space, "", []
+        if not text:
+            return ""
+        if not self._started:
+            self._started = True
+            return text.lstrip()
+        return space + text
+
+    def _decode(self, text: str) -> str:
+        if "<" not in text:
+            if self._thinking:
+                self._keep_reasoning(text)
+                return ""
+            if self._pending is not None:
+                self._pending.append(text)
+                return ""
+            return self._trim(text)
+        parts: List[str] = []
+        position = 0
+        while position < len(text):
+            if self._thinking:
+                end = text.find(THINK_CLOSE, position)
+                self._keep_reasoning(text[position:end if end >= 0 else len(text)])
+                if end < 0:
+                    break
+                self._thinking = False
+                position = end + len(THINK_CLOSE)
+                continue
+            tag = _TAG.search(text, position)
+            visible = text[position:tag.start() if tag else len(text)]
+            if self._pending is not None:
+                if tag is None:
+                    self._pending.append(visible)
+                    break
+                # The first tag tells what the held text was: reasoning if the span is being closed
+                visible = "".join(self._pending) + visible
+                self._pending = None
+                if tag.group() == THINK_CLOSE:
+                    self._keep_reasoning(visible)
+                    visible = ""
+            parts.append(visible)
+            if tag is None:
+                break
+            # A later stray closing tag is dropped on its own
+            self._thinking = tag.group() == THINK_OPEN
+            position = tag.end()
+        return self._trim("".join(parts))
+
+    def _keep_reasoning(self, text: str) -> None:
+        # Only needed for the fallback, i.e. while no answer text has been emitted
+        if not self._started:
+            self._reasoning.append(text)
+
+    def _trim(self, text: str) -> str:
+        # Whitespace at the start is dropped; whitespace at the end waits until more text follows it
+        if not text:
+            return ""
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+            self._reasoning = []
+        body = text.rstrip()
+        if not body:
+            self._space += text
+            return ""
+        out = self._space + body
+        self._space = text[len(body):]
+        return out
+
+    def _incomplete_suffix(self, text: str) -> int:
+        """Length of the tail of `text` that may be the start of a tag continued in the next chunk."""
+        opening = text.find("<", max(0, len(text) - len(THINK_CLOSE) + 1))
+        while opening >= 0:
+            tail = text[opening:]
+            if (THINK_OPEN.startswith(tail) and tail != THINK_OPEN) or THINK_CLOSE.startswith(tail):
+                return len(tail)
+            opening = text.find("<", opening + 1)
+        return 0
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import uuid
+import httpx
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from src.config.settings import settings
+from src.services.supabase_service import SupabaseService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def is_transient(error: Exception) -> bool:
+    """
+    Network errors and 5xx/408/429 responses may succeed on a retry; other 4xx responses never will.
+    A timeout may hide a write that did land, so only idempotent writes should be retried on it.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in (408, 429)
+    return isinstance(error, httpx.TransportError)
+
+class MessageWriter:
+    """
+    Write-behind persistence for conversation messages.
+    Messages go onto a bounded queue and a background task writes them in batches:
+    one multi-row insert into `messages` and one `updated_at` update per conversation per flush.
+    When the queue is full, enqueue waits, so bursts slow producers down instead of growing memory.
+    Queued messages are counted per conversation, so a reader can wait for one conversation's
+    messages without waiting for the whole queue.
+    Every message carries an `id` generated before it is queued and rows are inserted with
+    `on_conflict=id`, so retrying a batch whose first attempt timed out after being stored does not
+    duplicate messages.
+    Only transient errors are retried. A batch that PostgREST rejects (4xx) is split in halves until
+    the offending rows are isolated, so one bad row does not drop the other users' messages.
+    """
+
+    def __init__(
+        self,
+        supabase: SupabaseService,
+        max_queue: int = None,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_retries: int = None,
+        retry_backoff: float = 0.5
+    ):
+        self.supabase = supabase
+        self.max_queue = max_queue or settings.WRITE_BEHIND_QUEUE_SIZE
+        self.batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.WRITE_BEHIND_FLUSH_INTERVAL
+        self.max_retries = max_retries if max_retries is not None else settings.WRITE_BEHIND_MAX_RETRIES
+        self.retry_backoff = retry_backoff
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "retries": 0, "failed": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, int] = {}
+        self._drained: Dict[str, asyncio.Event] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop."""
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def enqueue(self, message: Dict[str, Any]) -> None:
+        """Queue a message row for the next batch, waiting if the queue is full."""
+        message.setdefault("id", str(uuid.uuid4()))
+        conversation_id = message["conversation_id"]
+        self._pending[conversation_id] = self._pending.get(conversation_id, 0) + 1
+        self._drained.setdefault(conversation_id, asyncio.Event())
+        try:
+            await self._queue.put(message)
+        except BaseException:
+            self._done(conversation_id)
+            raise
+        self.stats["enqueued"] += 1
+
+    async def flush(self, conversation_id: Optional[str] = None) -> None:
+        """Wait until every queued message (or every message of one conversation) has been written or given up on."""
+        if not self.running:
+            return
+        if conversation_id is None:
+            await self._queue.join()
+            return
+        drained = self._drained.get(conversation_id)
+        if drained is not None:
+            await drained.wait()
+
+    async def close(self) -> None:
+        """Flush everything still queued, then stop the background task."""
+        if not self.running:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                for message in batch:
+                    self._done(message["conversation_id"])
+                    self._queue.task_done()
+
+    def _done(self, conversation_id: str) -> None:
+        self._pending[conversation_id] -= 1
+        if not self._pending[conversation_id]:
+            del self._pending[conversation_id]
+            self._drained.pop(conversation_id).set()
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        written = await self._insert(batch)
+        if not written:
+            return
+        self.stats["batches"] += 1
+
+        # One updated_at per conversation, set to its newest message in the batch
+        latest: Dict[str, str] = {}
+        for message in written:
+            conversation_id = message["conversation_id"]
+            latest[conversation_id] = max(latest.get(conversation_id, ""), message["created_at"])
+        await asyncio.gather(*(
+            self._touch(conversation_id, updated_at) for conversation_id, updated_at in latest.items()
+        ))
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows and return the ones stored, splitting the batch when PostgREST rejects it."""
+        try:
+            await self._retry(lambda: self.supabase.insert("messages", rows, on_conflict="id"))
+        except Exception as e:
+            if len(rows) > 1 and not is_transient(e):
+                middle = len(rows) // 2
+                return await self._insert(rows[:middle]) + await self._insert(rows[middle:])
+            logger.error("Error persisting %d message(s): %s", len(rows), e)
+            self.stats["failed"] += len(rows)
+            return []
+        self.stats["written"] += len(rows)
+        return rows
+
+    async def _touch(self, conversation_id: str, updated_at: str) -> None:
+        try:
+            await self._retry(lambda: self.supabase.update(
+                "conversations", {"updated_at": updated_at}, eq={"id": conversation_id}
+            ))
+        except Exception as e:
+            logger.error("Error persisting conversation %s: %s", conversation_id, e)
+
+    async def _retry(self, operation: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await operation()
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
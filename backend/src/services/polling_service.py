@@ -0,0 +1,204 @@
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from src.config.settings import settings
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT")
+
+@dataclass
+class PollStats:
+    """Polling cost of one finished job."""
+    job_id: str
+    status: str
+    status_calls: int
+    total_wait: float
+    waited_after_finish: Optional[float] = None
+
+@dataclass
+class _PolledJob:
+    job_id: str
+    future: asyncio.Future
+    submitted_at: float
+    deadline: float
+    next_poll: float
+    interval: float
+    started_at: Optional[float] = None
+    status_calls: int = 0
+    overdue_polls: int = 0
+    in_flight: bool = field(default=False, repr=False)
+
+class PollingScheduler:
+    """
+    Waits on many RunPod jobs from a single polling loop.
+    Each job starts with a short interval that backs off with jitter while it is queued,
+    and is re-checked close to the expected finish time once it is running. The expected queue and
+    execution times are moving averages over recent jobs; no interval ever exceeds `max_interval`,
+    so a short job that follows long ones is still noticed within that time.
+    """
+
+    def __init__(
+        self,
+        check_status: Callable[[str], Awaitable[Dict[str, Any]]],
+        min_interval: float = None,
+        max_interval: float = None,
+        backoff: float = None,
+        jitter: float = None,
+        deadline: float = None,
+        history: int = 1000
+    ):
+        self.check_status = check_status
+        self.min_interval = min_interval if min_interval is not None else settings.POLL_MIN_INTERVAL
+        self.max_interval = max_interval if max_interval is not None else settings.POLL_MAX_INTERVAL
+        self.backoff = backoff if backoff is not None else settings.POLL_BACKOFF
+        self.jitter = jitter if jitter is not None else settings.POLL_JITTER
+        self.deadline = deadline if deadline is not None else settings.POLL_DEADLINE
+        self.expected_delay: Optional[float] = None
+        self.expected_execution: Optional[float] = None
+        self.stats: Deque[PollStats] = deque(maxlen=history)
+        self._jobs: Dict[str, _PolledJob] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._polls = set()
+
+    async def wait(self, job_id: str, submitted_at: Optional[float] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Wait until the job reaches a terminal status and return its last status payload."""
+        self._ensure_loop()
+        now = time.monotonic()
+        submitted_at = submitted_at or now
+        job = _PolledJob(
+            job_id=job_id,
+            future=asyncio.get_running_loop().create_future(),
+            submitted_at=submitted_at,
+            deadline=now + (deadline if deadline is not None else self.deadline),
+            next_poll=max(now, submitted_at + self._first_interval()),
+            interval=self.min_interval
+        )
+        self._jobs[job_id] = job
+        self._wakeup.set()
+        try:
+            return await job.future
+        finally:
+            self._jobs.pop(job_id, None)
+
+    def summary(self) -> Dict[str, float]:
+        """Average status calls and post-finish wait over the recently completed jobs."""
+        completed = [s for s in self.stats if s.status == "COMPLETED"]
+        if not completed:
+            return {"jobs": 0, "avg_status_calls": 0.0, "avg_waited_after_finish": 0.0}
+        waits = [s.waited_after_finish for s in completed if s.waited_after_finish is not None]
+        return {
+            "jobs": len(completed),
+            "avg_status_calls": sum(s.status_calls for s in completed) / len(completed),
+            "avg_waited_after_finish": sum(waits) / len(waits) if waits else 0.0
+        }
+
+    def _ensure_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            due = [job for job in self._jobs.values() if not job.in_flight and job.next_poll <= now]
+            for job in due:
+                job.in_flight = True
+                task = asyncio.create_task(self._poll(job))
+                self._polls.add(task)
+                task.add_done_callback(self._polls.discard)
+
+            self._wakeup.clear()
+            pending = [job.next_poll for job in self._jobs.values() if not job.in_flight]
+            timeout = max(0.0, min(pending) - time.monotonic()) if pending else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, job: _PolledJob) -> None:
+        try:
+            if job.future.done():
+                return
+            if time.monotonic() >= job.deadline:
+                self._finish(job, "TIMED_OUT", time.monotonic())
+                if not job.future.done():
+                    job.future.set_exception(TimeoutError(f"Job {job.job_id} did not finish before the polling deadline"))
+                return
+
+            job.status_calls += 1
+            try:
+                result = await self.check_status(job.job_id)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                return
+            now = time.monotonic()
+            status = result.get("status")
+
+            if status in TERMINAL_STATUSES:
+                self._finish(job, status, now, result)
+                if not job.future.done():
+                    job.future.set_result(result)
+                return
+
+            job.interval = self._next_interval(job, result, now)
+            job.next_poll = min(now + job.interval, job.deadline)
+        finally:
+            job.in_flight = False
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _next_interval(self, job: _PolledJob, result: Dict[str, Any], now: float) -> float:
+        """Pick the next poll interval from the job status and RunPod's timing fields."""
+        if result.get("status") == "IN_PROGRESS":
+            if job.started_at is None:
+                delay = result.get("delayTime")
+                job.started_at = job.submitted_at + delay / 1000 if delay is not None else now
+            if self.expected_execution is not None:
+                # Check again at the typical finish time (at most max_interval away), then back off
+                # from a small fraction of the typical execution time while the job runs over
+                remaining = self.expected_execution - (now - job.started_at)
+                if remaining > self.min_interval:
+                    return min(remaining, self.max_interval)
+                job.interval = max(self.min_interval, 0.25 * self.expected_execution) * self.backoff ** job.overdue_polls
+                job.overdue_polls += 1
+                return self._jittered(job.interval)
+
+        return self._jittered(job.interval * self.backoff)
+
+    def _first_interval(self) -> float:
+        # No point asking before a typical job could have finished
+        if self.expected_delay is None or self.expected_execution is None:
+            return self.min_interval
+        return max(self.min_interval, min(self.max_interval, self.expected_delay + self.expected_execution))
+
+    def _jittered(self, interval: float) -> float:
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _finish(self, job: _PolledJob, status: str, now: float, result: Optional[Dict[str, Any]] = None) -> None:
+        waited_after_finish = None
+        if result is not None:
+            delay, execution = result.get("delayTime"), result.get("executionTime")
+            if delay is not None:
+                self.expected_delay = self._average(self.expected_delay, delay / 1000)
+            if execution is not None:
+                self.expected_execution = self._average(self.expected_execution, execution / 1000)
+                if delay is not None:
+                    finished_at = job.submitted_at + (delay + execution) / 1000
+                    waited_after_finish = max(0.0, now - finished_at)
+
+        self.stats.append(PollStats(
+            job_id=job.job_id,
+            status=status,
+            status_calls=job.status_calls,
+            total_wait=now - job.submitted_at,
+            waited_after_finish=waited_after_finish
+        ))
+
+    def _average(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else 0.8 * current + 0.2 * sample
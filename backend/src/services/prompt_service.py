@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from src.config.settings import settings
+from src.services.tokenizer import count_tokens, truncate_to_tokens
+
+class AssembledPrompt:
+    """A prompt plus its sections and their token counts."""
+
+    def __init__(self, text: str, sections: Dict[str, str], section_tokens: Dict[str, int]):
+        self.text = text
+        self.sections = sections
+        self.section_tokens = section_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.section_tokens.values())
+
+class PromptTemplate:
+    """
+    Prompt layout built for the serving side's KV prefix cache.
+    The persona prefix is compiled once and stays byte-identical across requests; the
+    per-request sections always follow it in the same order (history, context, question),
+    each cut to its own token budget. History goes first so consecutive turns of one
+    conversation share the longest possible prefix.
+    """
+
+    def __init__(
+        self,
+        personality: str = None,
+        history_budget: int = None,
+        context_budget: int = None,
+        question_budget: int = None
+    ):
+        self.prefix = f"<think>\nPersonality: {personality or settings.AGENT_PERSONALITY}\n"
+        self.prefix_tokens = count_tokens(self.prefix)
+        self.budgets = {
+            "history": history_budget or settings.HISTORY_TOKEN_BUDGET + settings.HISTORY_SUMMARY_TOKEN_BUDGET,
+            "context": context_budget or settings.PROMPT_CONTEXT_TOKEN_BUDGET,
+            "question": question_budget or settings.PROMPT_QUESTION_TOKEN_BUDGET
+        }
+
+    def assemble(self, question: str, context: Optional[str] = None, history: Optional[str] = None) -> AssembledPrompt:
+        """Build the prompt for one request, cutting each section to its token budget."""
+        sections, tokens = {}, {"prefix": self.prefix_tokens}
+        if history:
+            sections["history"], tokens["history"] = self._bounded(history, "history")
+        if context:
+            sections["context"], tokens["context"] = self._bounded(context, "context")
+        sections["question"], tokens["question"] = self._bounded(question, "question")
+
+        parts = [self.prefix]
+        if "history" in sections:
+            parts.append(f"History:\n{sections['history']}\n")
+        if "context" in sections:
+            parts.append(f"Context: {sections['context']}\n")
+        parts.append(f"\nQuestion: {sections['question']}\n</think>")
+        return AssembledPrompt("".join(parts), sections, tokens)
+
+    def _bounded(self, text: str, section: str) -> Tuple[str, int]:
+        # Counted with the tokenizer: a character can be several tokens (CJK, emoji), so length alone is no bound
+        budget, tokens = self.budgets[section], count_tokens(text)
+        if tokens <= budget:
+            return text, tokens
+        text = truncate_to_tokens(text, budget)
+        return text, count_tokens(text)
+
+@lru_cache()
+def get_prompt_template() -> PromptTemplate:
+    """Return the process-wide prompt template, compiled on first use."""
+    return PromptTemplate()
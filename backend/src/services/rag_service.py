@@ -1,46 +1,205 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+from src.config.settings import settings
 from src.services.supabase_service import SupabaseService
-from src.services.llm_service import LLMService
+from src.services.llm_service import AsyncLLMService
+from src.services.cache_service import ResponseCache
+from src.services.batch_service import BatchDispatcher
+from src.services.context_service import ContextPacker
+from src.services.metrics_service import observe, stage
+from src.services.admission_service import AdmissionController, Overloaded
+
+logger = logging.getLogger(__name__)
 
 class RAGService:
     def __init__(self):
         """Initialize services for RAG functionality."""
         self.supabase = SupabaseService()
-        self.llm = LLMService()
+        self.llm = AsyncLLMService()
+        self.cache = ResponseCache() if settings.RESPONSE_CACHE_ENABLED else None
+        self.packer = ContextPacker() if settings.CONTEXT_PACKING_ENABLED else None
+        self.admission = AdmissionController()
+        self.dispatcher = BatchDispatcher(self.llm, admission=self.admission) if settings.BATCH_DISPATCH_ENABLED else None
+        self.index = None
+        self.embedder = None
+        self._sync_task: Optional[asyncio.Task] = None
+        if settings.LOCAL_INDEX_ENABLED and not settings.EMBEDDING_ENDPOINT_ID:
+            logger.warning("⚠️ LOCAL_INDEX_ENABLED needs EMBEDDING_ENDPOINT_ID to embed queries; retrieval stays on match_documents")
+        elif settings.LOCAL_INDEX_ENABLED:
+            # numpy is only needed when the local index is turned on
+            from src.services.index_service import LocalHybridIndex
+            from src.services.embedding_service import EmbeddingService
+            self.index = LocalHybridIndex()
+            self.embedder = EmbeddingService()
+    
+    def start(self) -> None:
+        """Start keeping the local retrieval index in sync with Supabase, if enabled."""
+        if self.index is not None and self._sync_task is None:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_index())
+    
+    async def close(self) -> None:
+        """Stop background index syncing and finish cancelling abandoned RunPod jobs."""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self.index is not None:
+            self.index.close()
+        await self.llm.close()
+    
+    async def _sync_index(self) -> None:
+        while True:
+            try:
+                added = await self.index.sync(self.supabase)
+                if added:
+                    logger.info("Local index synced %d new documents (%d total).", added, len(self.index))
+            except Exception as e:
+                logger.error("Error syncing local index: %s", e)
+            await asyncio.sleep(settings.LOCAL_INDEX_SYNC_INTERVAL)
     
     async def get_relevant_context(self, query: str, limit: int = 3) -> str:
         """
         Retrieve relevant context from existing Supabase documents.
         """
-        documents = await self.supabase.search_documents(query, limit)
+        context, _ = await self.retrieve(query, limit)
+        return context
+    
+    async def retrieve(self, query: str, limit: int = 3) -> Tuple[str, List[Any]]:
+        """Retrieve the joined context and the IDs of the documents it came from."""
+        with stage("retrieval"):
+            documents = None
+            if self.index is not None and len(self.index):
+                # Answer from the in-process index instead of a match_documents round trip
+                documents = await self._search_index(query, limit)
+            if documents is None:
+                documents = await self.supabase.search_documents(query, limit)
         if not documents:
-            return ""
+            return "", []
+        
+        if self.packer is not None:
+            # Drop near-duplicate passages and fit the rest into the context token budget
+            with stage("context_packing"):
+                packed = self.packer.pack(documents)
+            if packed.saved_tokens:
+                logger.info(
+                    "📦 Context packed to %d tokens (%d saved, %d duplicates dropped)",
+                    packed.tokens, packed.saved_tokens, packed.duplicates,
+                    extra={"tokens_saved": packed.saved_tokens}
+                )
+            return packed.text, packed.ids
             
         # Combine document contents into context
         context = "\n\n".join([doc.get('content', '') for doc in documents])
-        return context
+        return context, [doc.get('id') for doc in documents]
     
-    async def ask_with_context(self, question: str) -> str:
+    async def _search_index(self, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Hybrid search of the local index (query embedding fused with BM25); None if the query could not be embedded."""
+        try:
+            with stage("query_embedding"):
+                embedding = (await self.embedder.embed([query]))[0]
+        except Exception as e:
+            logger.warning("⚠️ Query embedding failed, falling back to match_documents: %s", e)
+            return None
+        return await self.index.run(self.index.search, query, limit, embedding)
+    
+    async def ask_with_context(
+        self,
+        question: str,
+        history: Optional[str] = None,
+        retrieved: Optional[Tuple[str, List[Any]]] = None
+    ) -> str:
         """
         Ask a question using RAG approach with existing knowledge base.
+        `history` is the trimmed conversation window from ConversationService.get_context_window;
+        `retrieved` is the result of `retrieve`, when the caller already started it.
         """
         try:
             # Get relevant context from existing documents
-            context = await self.get_relevant_context(question)
+            context, context_ids = retrieved if retrieved is not None else await self.retrieve(question)
+            
+            # Repeated questions over the same documents are answered from the cache,
+            # unless earlier turns could change what the question means
+            use_cache = self.cache is not None and not history
+            if use_cache:
+                cached = await self.cache.get(question, context_ids)
+                if cached is not None:
+                    return cached
             
             if not context:
-                print("No relevant context found. Proceeding with direct question.")
-                job_id = self.llm.run_job(question)
-                return self.llm.wait_for_result(job_id)
+                logger.info("No relevant context found. Proceeding with direct question.")
             
-            # Run LLM with context
-            job_id = self.llm.run_job(question, context)
-            return self.llm.wait_for_result(job_id)
+            if self.dispatcher:
+                # Concurrent questions share one batched RunPod job, which takes one admission slot
+                with stage("generation"):
+                    answer = await self.dispatcher.generate(question, context or None, history)
+            else:
+                # Bursts wait here for a free RunPod slot instead of timing out in the endpoint's queue
+                async with self.admission.slot():
+                    with stage("generation"):
+                        # Run LLM with context
+                        job_id = await self.llm.run_job(question, context or None, history)
+                        answer = await self.llm.wait_for_result(job_id)
             
+            if use_cache:
+                await self.cache.set(question, context_ids, answer)
+            return answer
+            
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error in RAG process: {str(e)}")
+            logger.error("Error in RAG process: %s", e)
             return "Desculpe, ocorreu um erro ao processar sua pergunta."
     
+    async def stream_with_context(
+        self,
+        question: str,
+        history: Optional[str] = None,
+        retrieved: Optional[Tuple[str, List[Any]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Same as ask_with_context, but yields the answer in chunks as RunPod generates it.
+        Overloaded is raised before the first chunk, so callers can still answer 503.
+        """
+        try:
+            context, context_ids = retrieved if retrieved is not None else await self.retrieve(question)
+            use_cache = self.cache is not None and not history
+            if use_cache:
+                cached = await self.cache.get(question, context_ids)
+                if cached is not None:
+                    yield cached
+                    return
+            
+            if not context:
+                logger.info("No relevant context found. Proceeding with direct question.")
+            
+            chunks = []
+            async with self.admission.slot():
+                start = time.perf_counter()
+                job_id = await self.llm.run_job(question, context or None, history)
+                async for chunk in self.llm.stream_result(job_id):
+                    if not chunks:
+                        observe("time_to_first_token", time.perf_counter() - start)
+                    chunks.append(chunk)
+                    yield chunk
+                observe("generation", time.perf_counter() - start)
+            
+            if use_cache:
+                await self.cache.set(question, context_ids, "".join(chunks))
+                
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error("Error in RAG process: %s", e)
+            yield "Desculpe, ocorreu um erro ao processar sua pergunta."
+    
     async def store_knowledge(self, content: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Store new knowledge in the vector database."""
-        return await self.supabase.store_document(content, metadata) 
\ No newline at end of file
+        document = await self.supabase.store_document(content, metadata)
+        if self.index is not None and document:
+            await self.index.run(self.index.add, [document])
+        return document 
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, TypeVar
+from src.config.settings import settings
+
+T = TypeVar("T")
+
+class SharedStore:
+    """
+    Key/value store with per-entry expiry in a local SQLite file, shared by every worker process
+    on the host (caches, rate-limit counters, conversation versions).
+    Each process talks to the file from one background thread, so the event loop never waits on
+    the file lock; WAL mode lets readers and a writer work at the same time.
+    """
+
+    def __init__(self, path: str = None, purge_every: int = 1000):
+        self.path = path or settings.SHARED_STORE_PATH
+        self.purge_every = purge_every
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-store")
+        self._connection: Optional[sqlite3.Connection] = None
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._run(self._set, key, value, ttl)
+
+    async def values_prefix(self, prefix: str) -> List[str]:
+        """Values of every unexpired entry whose key starts with `prefix`."""
+        return await self._run(self._values_prefix, prefix)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self._execute, "DELETE FROM entries WHERE key = ?", (key,))
+
+    async def delete_prefix(self, prefix: str) -> None:
+        await self._run(self._execute, "DELETE FROM entries WHERE key >= ? AND key < ?", _prefix_range(prefix))
+
+    async def trim_prefix(self, prefix: str, max_entries: int) -> None:
+        """Keep at most `max_entries` entries under `prefix`, dropping the ones that expire first."""
+        await self._run(
+            self._execute,
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries WHERE key >= ? AND key < ? "
+            "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (*_prefix_range(prefix), max_entries)
+        )
+
+    async def incr(self, key: str, ttl: float) -> int:
+        """Add one to a counter and return the new value; a missing or expired counter starts again at 1."""
+        return await self._run(self._incr, key, ttl)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        self._connect().execute(sql, params)
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _values_prefix(self, prefix: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT value FROM entries WHERE key >= ? AND key < ? AND expires_at >= ?", (*_prefix_range(prefix), time.time())
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _set(self, key: str, value: str, ttl: float) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + ttl)
+        )
+        self._purge()
+
+    def _incr(self, key: str, ttl: float) -> int:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                value, expires_at = 1, now + ttl
+            else:
+                value, expires_at = int(row[0]) + 1, row[1]
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, str(value), expires_at)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._purge()
+        return value
+
+    def _purge(self) -> None:
+        # Expired rows are only skipped by reads; every `purge_every` writes they are deleted
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._connect().execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+
+def _prefix_range(prefix: str) -> tuple:
+    # Keys starting with `prefix` sort between it and the prefix with its last character bumped,
+    # so the primary-key index serves prefix lookups
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+_store: Optional[SharedStore] = None
+
+def get_shared_store() -> SharedStore:
+    """Return the process-wide shared store, creating it on first use."""
+    global _store
+    if _store is None:
+        _store = SharedStore()
+    return _store
+
+async def close_shared_store() -> None:
+    """Close the shared store's connection and background thread."""
+    global _store
+    if _store is not None:
+        await _store.close()
+    _store = None
@@ -1,44 +1,184 @@
-from supabase import create_client, Client
+import asyncio
+import logging
+import time
+import httpx
+from collections import deque
 from src.config.settings import settings
-from typing import List, Dict, Any
+from src.services.cache_service import create_cache
+from src.services.http_client import get_async_client
+from typing import List, Dict, Any, Optional, Union
+
+logger = logging.getLogger(__name__)
 
 class SupabaseService:
-    def __init__(self):
-        """Initialize Supabase client with existing configuration."""
-        self.client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        """Initialize Supabase access with existing configuration."""
+        self.rest_url = f"{settings.SUPABASE_URL}/rest/v1"
+        self.headers = {
+            "apikey": settings.SUPABASE_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_KEY}",
+            "Content-Type": "application/json"
+        }
+        self._http = http_client
+        self.retrieval_cache = create_cache(
+            settings.RETRIEVAL_CACHE_BACKEND,
+            max_size=settings.RETRIEVAL_CACHE_MAX_SIZE,
+            ttl=settings.RETRIEVAL_CACHE_TTL,
+            prefix="retrieval:"
+        ) if settings.RETRIEVAL_CACHE_ENABLED else None
+        self.retrieval_stats = {"hits": 0, "misses": 0, "coalesced": 0}
+        self.retrieval_latencies = {"hit": deque(maxlen=1000), "miss": deque(maxlen=1000)}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._cache_generation = 0
+    
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or get_async_client()
+    
+    async def select(
+        self,
+        table: str,
+        eq: Optional[Dict[str, Any]] = None,
+        order: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        columns: str = "*",
+        gte: Optional[Dict[str, Any]] = None,
+        offset: Optional[int] = None,
+        in_: Optional[Dict[str, List[Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Select rows through PostgREST without blocking the event loop."""
+        params = {"select": columns}
+        for column, value in (eq or {}).items():
+            params[column] = f"eq.{value}"
+        for column, value in (gte or {}).items():
+            params[column] = f"gte.{value}"
+        for column, values in (in_ or {}).items():
+            params[column] = "in.(" + ",".join(f'"{value}"' for value in values) + ")"
+        if order:
+            params["order"] = f"{order}.{'desc' if desc else 'asc'}"
+        if limit is not None:
+            params["limit"] = str(limit)
+        if offset:
+            params["offset"] = str(offset)
+        response = await self.http.get(f"{self.rest_url}/{table}", headers=self.headers, params=params)
+        response.raise_for_status()
+        return response.json()
+    
+    async def insert(
+        self,
+        table: str,
+        rows: Union[Dict[str, Any], List[Dict[str, Any]]],
+        returning: bool = True,
+        on_conflict: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert one row or many rows in a single request and return them as stored (unless `returning` is off).
+        With `on_conflict`, rows whose value in that unique column already exists are skipped instead
+        of failing the request, which makes retrying the same rows safe.
+        """
+        prefer = ["return=representation" if returning else "return=minimal"]
+        params = {}
+        if on_conflict:
+            prefer.append("resolution=ignore-duplicates")
+            params["on_conflict"] = on_conflict
+        headers = {**self.headers, "Prefer": ",".join(prefer)}
+        response = await self.http.post(f"{self.rest_url}/{table}", headers=headers, params=params, json=rows)
+        response.raise_for_status()
+        return response.json() if returning else []
+    
+    async def update(self, table: str, values: Dict[str, Any], eq: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Update the rows matching every `eq` filter."""
+        headers = {**self.headers, "Prefer": "return=representation"}
+        params = {column: f"eq.{value}" for column, value in eq.items()}
+        response = await self.http.patch(f"{self.rest_url}/{table}", headers=headers, params=params, json=values)
+        response.raise_for_status()
+        return response.json()
+    
+    async def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        """Call a Postgres function exposed by PostgREST."""
+        response = await self.http.post(f"{self.rest_url}/rpc/{function}", headers=self.headers, json=params)
+        response.raise_for_status()
+        return response.json()
     
     async def search_documents(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Search for relevant documents in the existing Supabase table.
         Uses the existing match_documents function for vector similarity search.
+        Results are cached per (query, limit), and concurrent identical searches share one RPC.
         """
+        start = time.perf_counter()
+        key = f"{limit}:{query}"
         try:
-            response = self.client.rpc(
-                'match_documents',
-                {
-                    'query_text': query,
-                    'match_count': limit
-                }
-            ).execute()
+            if self.retrieval_cache is not None:
+                cached = await self.retrieval_cache.get(key)
+                if cached is not None:
+                    self._record_lookup("hit", start)
+                    return cached
+            
+            task = self._in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._search_and_cache(key, query, limit))
+                self._in_flight[key] = task
+                task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            else:
+                self.retrieval_stats["coalesced"] += 1
+            documents = await asyncio.shield(task)
+            self._record_lookup("miss", start)
             
-            if not response.data:
-                print("No relevant documents found.")
+            if not documents:
+                logger.info("No relevant documents found.")
                 return []
                 
-            return response.data
+            return documents
         except Exception as e:
-            print(f"Error searching documents: {str(e)}")
+            logger.error("Error searching documents: %s", e)
             return []
     
+    async def _search_and_cache(self, key: str, query: str, limit: int) -> List[Dict[str, Any]]:
+        generation = self._cache_generation
+        documents = await self.rpc(
+            'match_documents',
+            {
+                'query_text': query,
+                'match_count': limit
+            }
+        ) or []
+        # Skip caching if new knowledge was stored while the search was running
+        if self.retrieval_cache is not None and generation == self._cache_generation:
+            await self.retrieval_cache.set(key, documents)
+        return documents
+    
+    def _record_lookup(self, outcome: str, start: float) -> None:
+        self.retrieval_stats["hits" if outcome == "hit" else "misses"] += 1
+        self.retrieval_latencies[outcome].append(time.perf_counter() - start)
+    
+    def retrieval_metrics(self) -> Dict[str, float]:
+        """Hit rate and mean lookup latency (seconds) of the retrieval cache."""
+        hits, misses = self.retrieval_stats["hits"], self.retrieval_stats["misses"]
+        hit_latency, miss_latency = self.retrieval_latencies["hit"], self.retrieval_latencies["miss"]
+        return {
+            **self.retrieval_stats,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "avg_hit_latency": sum(hit_latency) / len(hit_latency) if hit_latency else 0.0,
+            "avg_miss_latency": sum(miss_latency) / len(miss_latency) if miss_latency else 0.0
+        }
+    
+    async def invalidate_retrieval_cache(self) -> None:
+        """Drop cached search results, e.g. after new knowledge is stored."""
+        self._cache_generation += 1
+        if self.retrieval_cache is not None:
+            await self.retrieval_cache.clear()
+    
     async def get_document_by_id(self, doc_id: str) -> Dict[str, Any]:
         """
         Retrieve a specific document by its ID from the existing table.
         """
         try:
-            response = self.client.table('documents').select("*").eq("id", doc_id).execute()
-            return response.data[0] if response.data else {}
+            rows = await self.select('documents', eq={"id": doc_id})
+            return rows[0] if rows else {}
         except Exception as e:
-            print(f"Error retrieving document: {str(e)}")
+            logger.error("Error retrieving document: %s", e)
             return {}
     
     async def store_document(self, content: str, metadata: Dict[str, Any], table: str = "documents") -> Dict[str, Any]:
@@ -50,8 +190,10 @@ class SupabaseService:
                 "content": content,
                 "metadata": metadata
             }
-            response = self.client.table(table).insert(data).execute()
-            return response.data[0] if response.data else {}
+            rows = await self.insert(table, data)
+            if table == "documents":
+                await self.invalidate_retrieval_cache()
+            return rows[0] if rows else {}
         except Exception as e:
-            print(f"Error storing document: {str(e)}")
+            logger.error("Error storing document: %s", e)
             return {} 
\ No newline at end of file
@@ -0,0 +1,88 @@
+import logging
+import re
+from typing import List
+from functools import lru_cache
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+@lru_cache()
+def _load_tokenizer():
+    """
+    Load the model's tokenizer (downloaded from the Hugging Face Hub on first use).
+    Without the `tokenizers` package, or when the download fails, token counts are estimated for
+    the rest of the process; the estimate is deliberately generous, so budgets stay on the safe side.
+    """
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        logger.warning("⚠️ tokenizers is not installed, estimating token counts")
+        return None
+    try:
+        return Tokenizer.from_pretrained(settings.TOKENIZER_NAME)
+    except Exception as e:
+        logger.warning("⚠️ Could not load tokenizer %s, estimating token counts: %s", settings.TOKENIZER_NAME, e)
+        return None
+
+def load_tokenizer() -> bool:
+    """Load the tokenizer now (e.g. at startup, in a thread) rather than on the first count; False if estimating."""
+    return _load_tokenizer() is not None
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the model's tokenizer, or estimate them (~1 token per 5 word characters) without it."""
+    if not text:
+        return 0
+    tokenizer = _load_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return sum(1 + len(piece) // 5 for piece in _PIECES.findall(text))
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut text down to at most `budget` tokens, preferring to end at a sentence or word boundary."""
+    if count_tokens(text) <= budget:
+        return text
+    tokenizer = _load_tokenizer()
+    if tokenizer is not None:
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        cut = text[:offsets[budget - 1][1]] if budget > 0 else ""
+    else:
+        cut = text
+        while cut and count_tokens(cut) > budget:
+            cut = cut[:int(len(cut) * budget / count_tokens(cut))]
+    for boundary in (". ", "\n", " "):
+        index = cut.rfind(boundary)
+        if index > len(cut) // 2:
+            return cut[:index + 1].rstrip()
+    return cut
+
+def chunk_by_tokens(text: str, size: int, overlap: int = 0) -> List[str]:
+    """Split text into windows of at most `size` tokens, each repeating the last `overlap` tokens of the previous one."""
+    tokenizer = _load_tokenizer()
+    if tokenizer is not None:
+        spans = tokenizer.encode(text, add_special_tokens=False).offsets
+        weights = [1] * len(spans)
+    else:
+        matches = list(_PIECES.finditer(text))
+        spans = [match.span() for match in matches]
+        weights = [1 + len(match.group()) // 5 for match in matches]
+    if not spans:
+        return []
+
+    chunks, start = [], 0
+    while True:
+        # Grow the window piece by piece until it would exceed the token budget
+        end, tokens = start, 0
+        while end < len(spans) and (tokens + weights[end] <= size or end == start):
+            tokens += weights[end]
+            end += 1
+        chunks.append(text[spans[start][0]:spans[end - 1][1]])
+        if end == len(spans):
+            return chunks
+        # Step back `overlap` tokens from the end of this window, always moving forward
+        back, carried = end, 0
+        while back > start + 1 and carried + weights[back - 1] <= overlap:
+            back -= 1
+            carried += weights[back]
+        start = back
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple, TypeVar
+from src.config.settings import settings
+from src.services.cache_service import normalize_question
+from src.services.conversation_service import ConversationService
+from src.services.metrics_service import stage, timed
+from src.services.rag_service import RAGService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Retrieved = Tuple[str, List[Any]]
+
+@dataclass
+class _Speculation:
+    words: frozenset
+    expires_at: float
+    task: Optional[asyncio.Task] = None
+    started: bool = False
+
+class TurnOrchestrator:
+    """
+    Runs a chat turn with its independent steps overlapped.
+    Retrieval starts first (or was already started by `prefetch` while the user was typing) and the
+    history window loads alongside it. The user message is written once the history has been taken,
+    while retrieval and generation go on, and the RunPod job is submitted as soon as history and
+    context are ready. A turn cancelled midway (the client disconnected) cancels its RunPod job.
+    A prefetch starts retrieval only once the partial question has not changed for `debounce`
+    seconds; a newer partial question replaces (and cancels) the previous speculation.
+    """
+
+    def __init__(
+        self,
+        rag: RAGService,
+        conversations: ConversationService,
+        ttl: float = None,
+        match_threshold: float = None,
+        min_chars: int = None,
+        max_speculations: int = None,
+        debounce: float = None
+    ):
+        self.rag = rag
+        self.conversations = conversations
+        self.ttl = ttl or settings.SPECULATIVE_RETRIEVAL_TTL
+        self.match_threshold = match_threshold if match_threshold is not None else settings.SPECULATIVE_MATCH_THRESHOLD
+        self.min_chars = settings.SPECULATIVE_MIN_CHARS if min_chars is None else min_chars
+        self.max_speculations = max_speculations or settings.HISTORY_MAX_CONVERSATIONS
+        self.debounce = settings.SPECULATIVE_DEBOUNCE if debounce is None else debounce
+        self.stats = {"prefetches": 0, "speculative_retrievals": 0, "speculative_hits": 0, "speculative_misses": 0}
+        self._speculations: "OrderedDict[str, _Speculation]" = OrderedDict()
+        self._background: Set[asyncio.Task] = set()
+
+    def prefetch(self, conversation_id: str, partial: str) -> bool:
+        """Start retrieval (and the history load) for a question that is still being typed."""
+        if not settings.SPECULATIVE_RETRIEVAL_ENABLED or len(partial.strip()) < self.min_chars:
+            return False
+        words = self._words(partial)
+        now = time.monotonic()
+        current = self._speculations.get(conversation_id)
+        if current is None or current.words != words or current.expires_at < now:
+            if current is not None:
+                current.task.cancel()
+            current = _Speculation(words, now + self.ttl)
+            current.task = self._spawn(self._speculate(current, partial))
+            self._speculations[conversation_id] = current
+            self.stats["prefetches"] += 1
+        current.expires_at = now + self.ttl
+        self._speculations.move_to_end(conversation_id)
+        while len(self._speculations) > self.max_speculations:
+            _, evicted = self._speculations.popitem(last=False)
+            evicted.task.cancel()
+        if not self.conversations.memory.has(conversation_id):
+            self._spawn(self.conversations.warm(conversation_id))
+        return True
+
+    async def run(self, conversation_id: str, message: str) -> str:
+        """Answer a user message and store both sides of the turn."""
+        with stage("message_total"):
+            retrieval = self._spawn(self._retrieve(conversation_id, message))
+            with stage("history_load"):
+                history = await self.conversations.get_context_window(conversation_id)
+            # Started after the history was taken, so the window does not already contain the question
+            user_write = self._spawn(timed(
+                "user_message_insert", self.conversations.add_message(conversation_id, "user", message)
+            ))
+            response = await self.rag.ask_with_context(message, history, await retrieval)
+            await user_write
+            with stage("assistant_message_insert"):
+                await self.conversations.add_message(conversation_id, "assistant", response)
+        return response
+
+    async def stream(self, conversation_id: str, message: str) -> AsyncIterator[str]:
+        """Same as run, but yields the answer in chunks; the assistant message is stored at the end."""
+        retrieval = self._spawn(self._retrieve(conversation_id, message))
+        with stage("history_load"):
+            history = await self.conversations.get_context_window(conversation_id)
+        user_write = self._spawn(timed(
+            "user_message_insert", self.conversations.add_message(conversation_id, "user", message)
+        ))
+        chunks = []
+        async for chunk in self.rag.stream_with_context(message, history, await retrieval):
+            chunks.append(chunk)
+            yield chunk
+        await user_write
+        with stage("assistant_message_insert"):
+            await self.conversations.add_message(conversation_id, "assistant", "".join(chunks))
+
+    async def close(self) -> None:
+        """Wait for message writes and speculative retrievals still running."""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _retrieve(self, conversation_id: str, message: str) -> Retrieved:
+        speculation = self._speculations.pop(conversation_id, None)
+        if speculation is not None:
+            if not speculation.started:
+                # Still waiting out the debounce: the final question is searched instead
+                speculation.task.cancel()
+            elif speculation.expires_at >= time.monotonic() and self._similarity(speculation.words, self._words(message)) >= self.match_threshold:
+                try:
+                    retrieved = await asyncio.shield(speculation.task)
+                    self.stats["speculative_hits"] += 1
+                    return retrieved
+                except Exception as e:
+                    logger.warning("⚠️ Speculative retrieval failed, retrieving again: %s", e)
+            self.stats["speculative_misses"] += 1
+        return await self.rag.retrieve(message)
+
+    async def _speculate(self, speculation: _Speculation, partial: str) -> Retrieved:
+        await asyncio.sleep(self.debounce)
+        speculation.started = True
+        self.stats["speculative_retrievals"] += 1
+        return await self.rag.retrieve(partial)
+
+    def _spawn(self, awaitable: Awaitable[T]) -> "asyncio.Task[T]":
+        # Tasks are kept referenced so that they finish even if the turn that started them is cancelled
+        task = asyncio.ensure_future(awaitable)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    def _words(self, text: str) -> frozenset:
+        return frozenset(normalize_question(text).split())
+
+    def _similarity(self, a: frozenset, b: frozenset) -> float:
+        if not a and not b:
+            return 1.0
+        return len(a & b) / len(a | b)
+
+async def cancel_on_disconnect(
+    awaitable: Awaitable[T],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    interval: float = None
+) -> Optional[T]:
+    """
+    Await a turn while checking every `interval` seconds that the client is still there.
+    If it has gone, the turn is cancelled (which cancels its RunPod job) and None is returned.
+    """
+    interval = interval or settings.DISCONNECT_POLL_INTERVAL
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                logger.info("🔌 Client disconnected, cancelling the turn")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def first_chunk(chunks: AsyncIterator[str]) -> str:
+    """Wait for the first chunk of a stream ("" if it is empty), so its errors surface before a response starts."""
+    async for chunk in chunks:
+        return chunk
+    return ""
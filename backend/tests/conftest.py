@@ -0,0 +1,32 @@
+import httpx
+import pytest
+import benchmarks  # noqa: F401  (dummy credentials, so settings load offline)
+from benchmarks import fake_supabase
+
+# Async tests run through AnyIO's pytest plugin: mark them with @pytest.mark.anyio
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+def asgi_client(app) -> httpx.AsyncClient:
+    """An HTTP client that calls an ASGI app in-process, so the fakes need no server or port."""
+    from src.config.settings import settings
+    return httpx.AsyncClient(app=app, base_url=settings.SUPABASE_URL)
+
+@pytest.fixture
+def supabase_app():
+    return fake_supabase.create_app()
+
+@pytest.fixture
+async def supabase(supabase_app):
+    from src.services.supabase_service import SupabaseService
+    async with asgi_client(supabase_app) as client:
+        yield SupabaseService(http_client=client)
+
+@pytest.fixture
+async def conversations(supabase):
+    from src.services.conversation_service import ConversationService
+    service = ConversationService()
+    service.supabase = supabase
+    yield service
+    await service.close()
@@ -0,0 +1,9 @@
+import pytest
+from src.config.settings import settings
+from src.services.admission_service import AdmissionController
+
+@pytest.mark.parametrize("cap, workers, per_worker", [(5, 4, 1), (8, 4, 2), (9, 4, 2), (2, 4, 1), (0, 4, 0)])
+def test_job_cap_is_split_without_exceeding_it(monkeypatch, cap, workers, per_worker):
+    monkeypatch.setattr(settings, "RUNPOD_MAX_CONCURRENT_JOBS", cap)
+    monkeypatch.setenv("WEB_CONCURRENCY", str(workers))
+    assert AdmissionController().max_concurrent == per_worker
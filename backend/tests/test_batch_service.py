@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from src.services.batch_service import BatchDispatcher
+
+pytestmark = pytest.mark.anyio
+
+class StubLLM:
+    """Answers each prompt of a batch with `answer to <prompt>`; `outputs` overrides what a batch returns."""
+
+    def __init__(self, outputs=None):
+        self.outputs = outputs
+        self.batches = []
+
+    def _format_prompt(self, question, context=None, history=None):
+        return question
+
+    def _process_output(self, output):
+        return output
+
+    async def run_batch_job(self, prompts):
+        self.batches.append(prompts)
+        return str(len(self.batches))
+
+    async def wait_for_output(self, job_id):
+        prompts = self.batches[int(job_id) - 1]
+        if self.outputs is not None:
+            return self.outputs
+        # Like a regular RunPod job, a single prompt comes back as one output rather than a list
+        answers = [f"answer to {prompt}" for prompt in prompts]
+        return answers[0] if len(prompts) == 1 else answers
+
+async def ask(dispatcher, questions):
+    return await asyncio.gather(*(dispatcher.generate(question) for question in questions))
+
+async def test_outputs_go_back_to_their_callers_in_order():
+    dispatcher = BatchDispatcher(StubLLM(), window=0.05, max_batch=8)
+    answers = await ask(dispatcher, [f"question {i}" for i in range(5)])
+    assert answers == [f"answer to question {i}" for i in range(5)]
+    assert dispatcher.llm.batches == [[f"question {i}" for i in range(5)]]
+    assert dispatcher.metrics()["avg_batch_fill"] == 5 / 8
+
+async def test_a_single_prompt_is_sent_on_its_own():
+    dispatcher = BatchDispatcher(StubLLM(), window=0.01, max_batch=8)
+    assert await dispatcher.generate("alone") == "answer to alone"
+    assert dispatcher.llm.batches == [["alone"]]
+
+async def test_an_output_count_mismatch_fails_every_waiter():
+    dispatcher = BatchDispatcher(StubLLM(outputs=["only one", "and two"]), window=0.01, max_batch=8)
+    results = await asyncio.gather(*(dispatcher.generate(f"question {i}") for i in range(3)), return_exceptions=True)
+    assert all(isinstance(result, Exception) and "2 outputs for 3 prompts" in str(result) for result in results)
+
+async def test_a_full_batch_is_sent_without_waiting_for_the_window():
+    dispatcher = BatchDispatcher(StubLLM(), window=10, max_batch=3)
+    answers = await asyncio.wait_for(ask(dispatcher, ["a", "b", "c"]), timeout=1)
+    assert answers == ["answer to a", "answer to b", "answer to c"]
+    assert dispatcher.llm.batches == [["a", "b", "c"]]
+
+async def test_a_partial_batch_is_sent_when_the_window_closes():
+    dispatcher = BatchDispatcher(StubLLM(), window=0.05, max_batch=3)
+    first = asyncio.ensure_future(ask(dispatcher, ["a", "b"]))
+    await asyncio.sleep(0.02)
+    assert dispatcher.llm.batches == []
+    assert await asyncio.wait_for(first, timeout=1) == ["answer to a", "answer to b"]
+    assert dispatcher.llm.batches == [["a", "b"]]
+
+    # Past max_batch, the rest waits for the next batch
+    assert await ask(dispatcher, ["c", "d", "e", "f"]) == ["answer to c", "answer to d", "answer to e", "answer to f"]
+    assert dispatcher.llm.batches[1:] == [["c", "d", "e"], ["f"]]
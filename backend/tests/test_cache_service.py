@@ -0,0 +1,28 @@
+import pytest
+from src.services.cache_service import SQLiteCache
+from src.services.shared_store import SharedStore
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def store(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    yield store
+    await store.close()
+
+async def test_sqlite_cache_keeps_at_most_max_size_entries(store):
+    cache = SQLiteCache(ttl=60, prefix="test:", store=store, max_size=20)
+    for index in range(100):
+        await cache.set(f"key-{index}", index, ttl=60 + index)
+    kept = [index for index in range(100) if await cache.get(f"key-{index}") is not None]
+    assert len(kept) == 20
+    # The entries that expire last survive the trim
+    assert kept == list(range(80, 100))
+
+async def test_sqlite_cache_trim_leaves_other_prefixes_alone(store):
+    other = SQLiteCache(ttl=60, prefix="other:", store=store, max_size=1000)
+    await other.set("kept", "value")
+    cache = SQLiteCache(ttl=60, prefix="test:", store=store, max_size=10)
+    for index in range(50):
+        await cache.set(f"key-{index}", index)
+    assert await other.get("kept") == "value"
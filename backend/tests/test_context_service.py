@@ -0,0 +1,38 @@
+from src.services.context_service import ContextPacker
+from src.services.tokenizer import count_tokens
+
+WALLETS = "Wallets keep one balance per currency. Transfers between wallets settle instantly."
+WEBHOOKS = "Webhooks are retried with exponential backoff. Each delivery carries a signature header."
+PAYMENTS = "Agents pay for API calls with x402. The server answers 402 until the payment clears."
+
+def document(id, content, similarity):
+    return {"id": id, "content": content, "similarity": similarity}
+
+def test_passages_are_ordered_by_similarity():
+    packed = ContextPacker(token_budget=1000, duplicate_threshold=0.8).pack([
+        document(1, WALLETS, 0.2), document(2, WEBHOOKS, 0.9), document(3, PAYMENTS, 0.5)
+    ])
+    assert packed.ids == [2, 3, 1]
+    assert packed.text == "\n\n".join([WEBHOOKS, PAYMENTS, WALLETS])
+
+def test_near_duplicates_and_overlapping_chunks_are_dropped():
+    packed = ContextPacker(token_budget=1000, duplicate_threshold=0.8).pack([
+        document(1, WALLETS, 0.9),
+        document(2, WALLETS.replace("instantly", "instantly!"), 0.8),
+        document(3, "Transfers between wallets settle instantly.", 0.7),
+        document(4, WEBHOOKS, 0.6),
+        document(5, "   ", 0.95)
+    ])
+    assert packed.ids == [1, 4]
+    assert packed.duplicates == 2
+    assert packed.saved_tokens > 0
+
+def test_context_stays_within_the_budget_and_ends_at_a_sentence():
+    long_passage = " ".join(f"Sentence number {i} explains one more detail of the ledger." for i in range(40))
+    packer = ContextPacker(token_budget=120, duplicate_threshold=0.8, min_passage_tokens=16)
+    packed = packer.pack([document(1, WEBHOOKS, 0.9), document(2, long_passage, 0.8), document(3, PAYMENTS, 0.1)])
+    assert packed.tokens <= 120 and count_tokens(packed.text) <= 120
+    assert packed.ids == [1, 2]
+    assert packed.truncated == 1 and packed.dropped == 1
+    cut = packed.text.split("\n\n")[1]
+    assert long_passage.startswith(cut) and cut.endswith("ledger.")
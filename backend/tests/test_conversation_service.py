@@ -0,0 +1,78 @@
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_failed_history_load_is_not_cached(conversations):
+    conversation = await conversations.create_conversation("Wallets")
+    await conversations.add_message(conversation["id"], "user", "How do wallets work?")
+    select = conversations.supabase.select
+
+    async def unavailable(*args, **kwargs):
+        raise httpx.ConnectError("Supabase is unreachable")
+
+    conversations.supabase.select = unavailable
+    assert await conversations.get_context_window(conversation["id"]) == ""
+    assert not conversations.memory.has(conversation["id"])
+
+    conversations.supabase.select = select
+    assert "How do wallets work?" in await conversations.get_context_window(conversation["id"])
+
+@pytest.fixture
+async def workers(supabase):
+    """Two server workers sharing the database and the conversation message count, with write-behind on."""
+    from src.services.cache_service import MemoryCache
+    from src.services.conversation_service import ConversationService
+    versions = MemoryCache()
+    services = []
+    for _ in range(2):
+        service = ConversationService()
+        service.supabase = service.writer.supabase = supabase
+        service.versions = versions
+        service.writer.flush_interval = 0.01
+        service.start()
+        services.append(service)
+    yield services
+    for service in services:
+        await service.close()
+
+async def test_messages_queued_on_another_worker_appear_once_written(workers):
+    a, b = workers
+    conversation_id = (await a.create_conversation("Wallets"))["id"]
+    assert await b.get_context_window(conversation_id) == ""
+
+    await a.add_message(conversation_id, "user", "How do wallets work?")
+    await a.add_message(conversation_id, "assistant", "They keep one balance per currency.")
+    # Still in A's write-behind queue: B cannot see them yet, but must not give up on them
+    await b.get_context_window(conversation_id)
+    await a.writer.flush()
+    window = await b.get_context_window(conversation_id)
+    assert "How do wallets work?" in window and "one balance per currency" in window
+
+    await b.add_message(conversation_id, "user", "And payments?")
+    await b.writer.flush()
+    window = await a.get_context_window(conversation_id)
+    assert window.count("How do wallets work?") == 1
+    assert window.endswith("User: And payments?")
+
+async def test_catching_up_only_reads_new_messages(workers, supabase_app):
+    a, b = workers
+    conversation_id = (await a.create_conversation("Wallets"))["id"]
+    for i in range(10):
+        await a.add_message(conversation_id, "user", f"message {i}")
+    await a.writer.flush()
+    await b.get_context_window(conversation_id)
+
+    await a.add_message(conversation_id, "user", "message 10")
+    await a.writer.flush()
+    selects = []
+    select = b.supabase.select
+
+    async def recorded(table, **kwargs):
+        rows = await select(table, **kwargs)
+        selects.append(len(rows))
+        return rows
+
+    b.supabase.select = recorded
+    assert (await b.get_context_window(conversation_id)).endswith("User: message 10")
+    assert selects == [2]
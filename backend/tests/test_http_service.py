@@ -0,0 +1,85 @@
+import json
+import uuid
+import pytest
+from src.services import http_service
+from src.services.admission_service import Overloaded, RateLimiter
+from tests.conftest import asgi_client
+
+pytestmark = pytest.mark.anyio
+
+class AllowAll:
+    async def check(self, key: str) -> None:
+        pass
+
+class StubTurns:
+    """Stands in for TurnOrchestrator: `stream` yields `chunks`, or raises `error` before the first one."""
+
+    def __init__(self, chunks=(), error=None):
+        self.chunks, self.error = chunks, error
+
+    def prefetch(self, conversation_id: str, partial: str) -> bool:
+        return True
+
+    async def stream(self, conversation_id: str, message: str):
+        if self.error is not None:
+            raise self.error
+        for chunk in self.chunks:
+            yield chunk
+
+@pytest.fixture
+def app():
+    # The in-process client does not run the lifespan, so only what the endpoint uses is set up
+    http_service.app.state.rate_limiter = AllowAll()
+    return http_service.app
+
+async def post_stream(app):
+    async with asgi_client(app) as client:
+        return await client.post("/message/stream", json={"conversation_id": str(uuid.uuid4()), "message": "Hi"})
+
+async def test_stream_sends_tokens_then_the_full_response(app):
+    app.state.turns = StubTurns(["Hello", ", ", "world"])
+    response = await post_stream(app)
+    assert response.status_code == 200
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [json.loads(event).get("token") for event in events[:-1]] == ["Hello", ", ", "world"]
+    assert json.loads(events[-1]) == {"response": "Hello, world"}
+
+async def test_overloaded_stream_answers_503_before_streaming(app):
+    app.state.turns = StubTurns(error=Overloaded("RunPod is at capacity", retry_after=2.5))
+    response = await post_stream(app)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert "event: done" not in response.text
+
+async def test_prefetch_is_rate_limited_per_client(app):
+    app.state.turns = StubTurns()
+    app.state.prefetch_limiter = RateLimiter(per_minute=3, prefix="test:prefetch:")
+    payload = {"conversation_id": str(uuid.uuid4()), "partial": "How do wallets"}
+    async with asgi_client(app) as client:
+        statuses = [(await client.post("/message/prefetch", json=payload)).status_code for _ in range(4)]
+    assert statuses == [202, 202, 202, 429]
+
+async def test_prefetch_rejects_malformed_conversation_ids(app):
+    app.state.turns = StubTurns()
+    app.state.prefetch_limiter = AllowAll()
+    async with asgi_client(app) as client:
+        response = await client.post("/message/prefetch", json={"conversation_id": "not-a-uuid", "partial": "Hi"})
+    assert response.status_code == 422
+
+async def test_metrics_export_cache_and_batch_statistics(app, supabase):
+    from types import SimpleNamespace
+    from src.services.cache_service import ResponseCache
+    cache = ResponseCache()
+    cache.stats["exact_hits"], cache.stats["misses"] = 1, 3
+    supabase.retrieval_stats["hits"] = 2
+    http_service.register_service_stats(SimpleNamespace(supabase=supabase, cache=cache, dispatcher=None))
+    try:
+        async with asgi_client(app) as client:
+            lines = (await client.get("/metrics")).text.splitlines()
+    finally:
+        http_service.unregister_stats()
+    assert "autonoma_retrieval_cache_hits_total 2.0" in lines
+    assert "autonoma_retrieval_cache_hit_rate 1.0" in lines
+    assert "autonoma_response_cache_exact_hits_total 1.0" in lines
+    assert "autonoma_response_cache_hit_rate 0.25" in lines
+    assert not any(line.startswith("autonoma_batch_") for line in lines)
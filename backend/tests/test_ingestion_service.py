@@ -0,0 +1,64 @@
+import json
+import pytest
+from src.services.ingestion_service import IngestionPipeline, content_hash
+from src.services.tokenizer import chunk_by_tokens, count_tokens
+
+pytestmark = pytest.mark.anyio
+
+def pipeline(supabase, tmp_path, **kwargs):
+    options = {"chunk_tokens": 64, "overlap": 8, "embed_batch_size": 1, "workers": 1, "insert_batch_size": 1, "retry_backoff": 0.01}
+    return IngestionPipeline(supabase, checkpoint_path=str(tmp_path / "checkpoint.json"), **{**options, **kwargs})
+
+def write_documents(directory, documents):
+    directory.mkdir(exist_ok=True)
+    for name, content in documents.items():
+        (directory / name).write_text(content)
+
+def stored(supabase_app):
+    return sorted(row["metadata"]["source"] for row in supabase_app.state.tables["documents"])
+
+async def test_an_interrupted_run_resumes_from_its_checkpoint(supabase, supabase_app, tmp_path):
+    source = tmp_path / "docs"
+    write_documents(source, {"a.txt": "Wallets keep one balance.", "b.txt": "Webhooks are retried.", "c.txt": "Agents pay with x402."})
+    insert = supabase.insert
+    calls = []
+
+    async def fails_on_the_third(table, rows, **kwargs):
+        calls.append(rows)
+        if len(calls) == 3:
+            raise RuntimeError("Supabase went away")
+        return await insert(table, rows, **kwargs)
+
+    supabase.insert = fails_on_the_third
+    with pytest.raises(Exception):
+        await pipeline(supabase, tmp_path, max_retries=0).run(str(source))
+    assert json.loads((tmp_path / "checkpoint.json").read_text())["done"] == ["a.txt", "b.txt"]
+
+    supabase.insert = insert
+    stats = await pipeline(supabase, tmp_path).run(str(source))
+    assert (stats.resumed, stats.documents, stats.inserted) == (2, 1, 1)
+    assert stored(supabase_app) == ["a.txt", "b.txt", "c.txt"]
+
+async def test_chunks_already_stored_are_not_inserted_again(supabase, supabase_app, tmp_path):
+    known = "Wallets keep one balance per currency."
+    supabase_app.state.tables["documents"].append({
+        "id": "4f0c1c9e-6d0a-4a53-9a4f-1f3a0c2b7d11",
+        "content": known,
+        "metadata": {"source": "earlier", "content_hash": content_hash(known)}
+    })
+    source = tmp_path / "docs"
+    # Whitespace differences do not change the hash; a repeat within the run is only sent once
+    write_documents(source, {"a.txt": "Wallets keep  one balance\nper currency.", "b.txt": "Webhooks are retried.", "c.txt": "Webhooks are retried."})
+    stats = await pipeline(supabase, tmp_path).run(str(source))
+    assert (stats.existing, stats.duplicates, stats.inserted) == (1, 1, 1)
+    assert stored(supabase_app) == ["b.txt", "earlier"]
+    assert json.loads((tmp_path / "checkpoint.json").read_text())["done"] == ["a.txt", "b.txt", "c.txt"]
+
+def test_chunks_overlap_by_the_requested_tokens():
+    text = " ".join(f"w{i}" for i in range(100))
+    chunks = chunk_by_tokens(text, size=10, overlap=3)
+    assert all(count_tokens(chunk) <= 10 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[:3] == previous.split()[-3:]
+    assert chunks[0].split()[0] == "w0" and chunks[-1].split()[-1] == "w99"
+    assert chunk_by_tokens(text, size=10) == [" ".join(f"w{i}" for i in range(start, start + 10)) for start in range(0, 100, 10)]
@@ -0,0 +1,48 @@
+import asyncio
+import httpx
+import pytest
+from benchmarks import fake_runpod
+from src.services.llm_service import AsyncLLMService
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def runpod_app():
+    return fake_runpod.create_app(queue_delay=0.05, generation_time=5.0)
+
+@pytest.fixture
+async def llm(runpod_app):
+    async with httpx.AsyncClient(app=runpod_app, base_url="http://runpod") as client:
+        service = AsyncLLMService(client=client)
+        service.base_url = "http://runpod/endpoint"
+        yield service
+        await service.close()
+
+async def test_stream_gives_up_at_the_deadline_and_cancels_the_job(llm, runpod_app):
+    job_id = await llm.run_job("How do wallets work?")
+    with pytest.raises(TimeoutError):
+        async for _ in llm.stream_result(job_id, interval=0.02, deadline=0.2):
+            pass
+    await llm.close()
+    assert "cancelled_at" in runpod_app.state.jobs[job_id]
+
+@pytest.mark.parametrize("runpod_app", [fake_runpod.create_app(queue_delay=0.01, generation_time=0.05)])
+async def test_streams_leave_no_submission_behind(llm):
+    for _ in range(2):
+        job_id = await llm.run_job("How do wallets work?")
+        async for _ in llm.stream_result(job_id, interval=0.02, deadline=1):
+            pass
+    # A stream abandoned after its first chunk is cleaned up too
+    job_id = await llm.run_job("How do wallets work?")
+    async for _ in llm.stream_result(job_id, interval=0.02, deadline=1):
+        break
+    assert llm._submitted == {}
+
+async def test_submissions_never_waited_on_expire(llm, monkeypatch):
+    from src.config.settings import settings
+    monkeypatch.setattr(settings, "POLL_DEADLINE", 0.05)
+    abandoned = await llm.run_job("Nobody waits for this")
+    await asyncio.sleep(0.1)
+    current = await llm.run_job("How do wallets work?")
+    assert list(llm._submitted) == [current]
+    assert abandoned != current
@@ -0,0 +1,17 @@
+import pytest
+from src.main import cgroup_cpu_quota
+
+@pytest.mark.parametrize("cpu_max, quota", [("200000 100000\n", 2.0), ("150000 100000\n", 1.5), ("max 100000\n", None)])
+def test_cgroup_v2_quota(tmp_path, cpu_max, quota):
+    (tmp_path / "cpu.max").write_text(cpu_max)
+    assert cgroup_cpu_quota(str(tmp_path)) == quota
+
+@pytest.mark.parametrize("cfs_quota, quota", [("400000", 4.0), ("-1", None)])
+def test_cgroup_v1_quota(tmp_path, cfs_quota, quota):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text(cfs_quota + "\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_quota(str(tmp_path)) == quota
+
+def test_no_cgroup_means_no_quota(tmp_path):
+    assert cgroup_cpu_quota(str(tmp_path)) is None
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import pytest
+from src.services.metrics_service import STAGE_SECONDS, MetricsPublisher, register_stats, render_metrics, unregister_stats
+from src.services.shared_store import SharedStore
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def store(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    yield store
+    await store.close()
+
+async def test_every_worker_reports_the_sum_of_all_workers(store):
+    this_worker = MetricsPublisher(store)
+    other_worker = MetricsPublisher(store)
+    other_worker.key = f"{MetricsPublisher.PREFIX}{os.getpid() + 1}"
+
+    before = STAGE_SECONDS.snapshot().get("test_stage", {}).get("count", 0)
+    STAGE_SECONDS.observe(0.2, "test_stage")
+    await other_worker.publish()
+    STAGE_SECONDS.observe(0.2, "test_stage")
+
+    text = await this_worker.render()
+    assert f'autonoma_stage_seconds_count{{stage="test_stage"}} {2 * (before + 1) + 1}' in text
+    assert f'autonoma_stage_seconds_count{{stage="test_stage"}} {before + 2}' in render_metrics()
+
+async def test_an_exited_worker_stops_counting(store):
+    gone = MetricsPublisher(store, interval=0.01)
+    gone.key = f"{MetricsPublisher.PREFIX}{os.getpid() + 1}"
+    await gone.publish()
+    assert len(await store.values_prefix(MetricsPublisher.PREFIX)) == 1
+    await asyncio.sleep(0.05)
+    assert await store.values_prefix(MetricsPublisher.PREFIX) == []
+
+def test_service_stats_are_exported_as_counters_and_gauges():
+    stats = {"hits": 3, "misses": 1}
+    register_stats("test_cache", lambda: stats, lambda: {**stats, "hit_rate": 0.75})
+    try:
+        lines = render_metrics().splitlines()
+    finally:
+        unregister_stats()
+    assert "# TYPE test_cache_hits_total counter" in lines
+    assert "test_cache_hits_total 3.0" in lines
+    assert "# TYPE test_cache_hit_rate gauge" in lines
+    assert "test_cache_hit_rate 0.75" in lines
+    assert "test_cache_hits" not in [line.split()[0] for line in lines]
+
+async def test_service_stats_of_every_worker_are_labelled(store):
+    register_stats("test_cache", lambda: {"hits": 1}, lambda: {"hit_rate": 0.5})
+    try:
+        this_worker, other_worker = MetricsPublisher(store), MetricsPublisher(store)
+        other_worker.key = f"{MetricsPublisher.PREFIX}{os.getpid() + 1}"
+        await other_worker.publish()
+        lines = (await this_worker.render()).splitlines()
+    finally:
+        unregister_stats()
+    assert f'test_cache_hits_total{{worker="{os.getpid()}"}} 1.0' in lines
+    assert f'test_cache_hit_rate{{worker="{os.getpid() + 1}"}} 0.5' in lines
+    assert lines.count("# TYPE test_cache_hits_total counter") == 1
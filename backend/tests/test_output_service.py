@@ -0,0 +1,73 @@
+import json
+import random
+import pytest
+from src.services.output_service import OutputDecoder, decode_output, extract_text
+
+ANSWER = "## Setup\n\n- Install with `pip install agent`\n- Then:\n\n```python\nprint('a\\nb')\n```\n\nSee C:\\new\\table 🚀"
+
+CASES = [
+    ANSWER,
+    "<think>\nThe user wants setup steps.\n</think>\n\n" + ANSWER,
+    "The user wants setup steps, so list them.</think>\n\n" + ANSWER,
+    "<think>Okay, the user is asking about wallets and I should",
+    "<think>a</think>First</think> second <thi",
+    "  <think>x</think>  \n  padded answer  \n\n",
+    'Quotes "kept", brackets [kept] {kept}, and a tab\\t written as text',
+    "",
+]
+
+def stream(text: str, sizes, reasoning_first: bool = True) -> str:
+    decoder = OutputDecoder(reasoning_first)
+    out, position = [], 0
+    for size in sizes:
+        out.append(decoder.feed(text[position:position + size]))
+        position += size
+    out.append(decoder.feed(text[position:]))
+    return "".join(out) + decoder.flush()
+
+def full(text: str, reasoning_first: bool = True) -> str:
+    decoder = OutputDecoder(reasoning_first)
+    return decoder.feed(text) + decoder.flush()
+
+def test_reasoning_is_removed_and_markdown_kept():
+    assert decode_output("<think>\nplan the answer\n</think>\n\n" + ANSWER) == ANSWER
+
+def test_backslashes_in_plain_text_are_kept():
+    assert decode_output("print('a\\nb') and C:\\new\\table") == "print('a\\nb') and C:\\new\\table"
+
+def test_string_encoded_payload_is_decoded():
+    encoded = json.dumps([{"choices": [{"tokens": [json.dumps("<think>x</think>" + ANSWER)]}]}])
+    assert decode_output(encoded) == ANSWER
+    assert decode_output(json.dumps(ANSWER)) == ANSWER
+
+def test_text_before_a_stray_closing_tag_is_dropped():
+    assert decode_output("leaked reasoning</think>\n\nThe answer.") == "The answer."
+
+def test_stray_closing_tag_is_only_dropped_without_reasoning_first():
+    assert full("kept</think> answer", reasoning_first=False) == "kept answer"
+
+def test_unclosed_reasoning_falls_back_to_the_reasoning_text():
+    assert decode_output("<think>Okay, the user is asking about") == "Okay, the user is asking about"
+
+def test_output_shapes():
+    assert extract_text([{"choices": [{"tokens": ["a", "b"]}]}]) == "ab"
+    assert extract_text({"choices": [{"text": "ab"}]}) == "ab"
+    assert extract_text({"text": "ab"}) == "ab"
+    assert extract_text('[{"choices": [{"tokens": ["a"]}]}]') == "a"
+    assert extract_text("[not json") == "[not json"
+
+@pytest.mark.parametrize("reasoning_first", [True, False])
+@pytest.mark.parametrize("text", CASES)
+def test_streaming_matches_full_decode_at_every_split(text, reasoning_first):
+    expected = full(text, reasoning_first)
+    for split in range(len(text) + 1):
+        assert stream(text, [split], reasoning_first) == expected, split
+
+@pytest.mark.parametrize("reasoning_first", [True, False])
+@pytest.mark.parametrize("text", CASES)
+def test_streaming_matches_full_decode_for_small_chunks(text, reasoning_first):
+    expected = full(text, reasoning_first)
+    assert stream(text, [1] * len(text), reasoning_first) == expected
+    rng = random.Random(0)
+    for _ in range(50):
+        assert stream(text, [rng.randint(1, 9) for _ in range(len(text))], reasoning_first) == expected
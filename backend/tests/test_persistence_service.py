@@ -0,0 +1,121 @@
+import asyncio
+import uuid
+from datetime import datetime
+import httpx
+import pytest
+from benchmarks import fake_supabase
+from src.services.persistence_service import MessageWriter
+
+pytestmark = pytest.mark.anyio
+
+def message(conversation_id: str, content: str) -> dict:
+    return {"conversation_id": conversation_id, "role": "user", "content": content, "created_at": datetime.now().isoformat()}
+
+async def write(writer: MessageWriter, messages) -> None:
+    writer.start()
+    for row in messages:
+        await writer.enqueue(row)
+    await writer.close()
+
+async def test_bad_row_only_loses_itself(supabase, supabase_app):
+    writer = MessageWriter(supabase, flush_interval=0.05, retry_backoff=0.01)
+    conversation_id = str(uuid.uuid4())
+    rows = [message(conversation_id, f"valid {i}") for i in range(3)]
+    await write(writer, rows[:2] + [message("not-a-uuid", "bad")] + rows[2:])
+
+    stored = [row["content"] for row in supabase_app.state.tables["messages"]]
+    assert stored == ["valid 0", "valid 1", "valid 2"]
+    assert writer.stats["failed"] == 1
+    assert writer.stats["retries"] == 0
+
+@pytest.mark.parametrize("supabase_app", [fake_supabase.create_app(foreign_keys=True)])
+async def test_foreign_key_violation_only_loses_its_rows(supabase, supabase_app):
+    conversation = (await supabase.insert("conversations", {"title": "kept"}))[0]
+    writer = MessageWriter(supabase, flush_interval=0.05, retry_backoff=0.01)
+    await write(writer, [message(conversation["id"], "kept"), message(str(uuid.uuid4()), "orphan")])
+
+    assert [row["content"] for row in supabase_app.state.tables["messages"]] == ["kept"]
+    assert writer.stats["failed"] == 1
+    assert writer.stats["retries"] == 0
+
+class FlakySupabase:
+    """Fails the first `failures` inserts with `status`, then accepts everything."""
+
+    def __init__(self, failures: int, status: int):
+        self.failures = failures
+        self.status = status
+        self.rows = []
+
+    async def insert(self, table, rows, returning=True, on_conflict=None):
+        if self.failures:
+            self.failures -= 1
+            request = httpx.Request("POST", f"http://supabase/rest/v1/{table}")
+            raise httpx.HTTPStatusError("error", request=request, response=httpx.Response(self.status, request=request))
+        self.rows.extend(rows)
+        return rows
+
+    async def update(self, table, values, eq):
+        return []
+
+async def test_transient_errors_are_retried():
+    supabase = FlakySupabase(failures=2, status=503)
+    writer = MessageWriter(supabase, flush_interval=0.05, retry_backoff=0.01)
+    await write(writer, [message(str(uuid.uuid4()), "hello")])
+    assert [row["content"] for row in supabase.rows] == ["hello"]
+    assert writer.stats["retries"] == 2
+    assert writer.stats["failed"] == 0
+
+async def test_client_errors_are_not_retried():
+    supabase = FlakySupabase(failures=1, status=400)
+    writer = MessageWriter(supabase, flush_interval=0.05, retry_backoff=0.01)
+    await write(writer, [message(str(uuid.uuid4()), "rejected")])
+    assert supabase.rows == []
+    assert writer.stats["retries"] == 0
+    assert writer.stats["failed"] == 1
+
+async def test_retry_after_a_timeout_does_not_duplicate_messages(supabase, supabase_app):
+    post = supabase.http.post
+    timeouts = []
+
+    async def stored_then_timed_out(url, **kwargs):
+        response = await post(url, **kwargs)
+        if not timeouts:
+            timeouts.append(url)
+            raise httpx.ReadTimeout("Response lost after the rows were stored")
+        return response
+
+    supabase.http.post = stored_then_timed_out
+    writer = MessageWriter(supabase, flush_interval=0.05, retry_backoff=0.01)
+    conversation_id = str(uuid.uuid4())
+    await write(writer, [message(conversation_id, f"message {i}") for i in range(3)])
+
+    assert [row["content"] for row in supabase_app.state.tables["messages"]] == ["message 0", "message 1", "message 2"]
+    assert writer.stats["retries"] == 1
+    assert writer.stats["failed"] == 0
+
+class BlockingSupabase(FlakySupabase):
+    """Holds inserts of `blocked` rows until `release` is set."""
+
+    def __init__(self, blocked: str):
+        super().__init__(failures=0, status=200)
+        self.blocked = blocked
+        self.release = asyncio.Event()
+
+    async def insert(self, table, rows, returning=True, on_conflict=None):
+        if any(row["conversation_id"] == self.blocked for row in rows):
+            await self.release.wait()
+        return await super().insert(table, rows, returning, on_conflict)
+
+async def test_flush_waits_only_for_its_conversation():
+    reader, other = str(uuid.uuid4()), str(uuid.uuid4())
+    supabase = BlockingSupabase(blocked=other)
+    writer = MessageWriter(supabase, batch_size=1, flush_interval=0.01)
+    writer.start()
+    await writer.enqueue(message(reader, "mine"))
+    await writer.enqueue(message(other, "slow"))
+    await asyncio.wait_for(writer.flush(reader), timeout=1)
+    assert [row["content"] for row in supabase.rows] == ["mine"]
+
+    supabase.release.set()
+    await writer.close()
+    assert [row["content"] for row in supabase.rows] == ["mine", "slow"]
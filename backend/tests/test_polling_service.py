@@ -0,0 +1,89 @@
+import asyncio
+import time
+import httpx
+import pytest
+from benchmarks import fake_runpod
+from src.services.llm_service import AsyncLLMService
+from src.services.polling_service import PollingScheduler
+
+pytestmark = pytest.mark.anyio
+
+MIN_INTERVAL, MAX_INTERVAL = 0.01, 0.1
+
+@pytest.fixture
+def runpod_app():
+    return fake_runpod.create_app(generation_time=0.3)
+
+@pytest.fixture
+async def llm(runpod_app):
+    async with httpx.AsyncClient(app=runpod_app, base_url="http://runpod") as client:
+        service = AsyncLLMService(client=client)
+        service.base_url = "http://runpod/endpoint"
+        service.scheduler = PollingScheduler(
+            service.check_status, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, backoff=2.0, jitter=0.1
+        )
+        yield service
+        await service.close()
+
+def record_calls(llm: AsyncLLMService) -> list:
+    """Wrap the scheduler's status calls to record when each one was made."""
+    calls = []
+    check_status = llm.scheduler.check_status
+
+    async def recorded(job_id):
+        calls.append(time.monotonic())
+        return await check_status(job_id)
+
+    llm.scheduler.check_status = recorded
+    return calls
+
+async def test_intervals_never_exceed_the_maximum(llm):
+    calls = record_calls(llm)
+    # A typical execution far above max_interval must not stretch the gap between status calls
+    llm.scheduler.expected_delay, llm.scheduler.expected_execution = 0.0, 30.0
+    job_id = await llm.run_job("ping")
+    assert await llm.wait_for_result(job_id) == "Fake answer."
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    assert gaps and max(gaps) <= MAX_INTERVAL + 0.05
+
+async def test_short_job_after_long_jobs_is_picked_up_quickly(llm, runpod_app):
+    # As after a run of long answers: the moving average expects a 20 s execution
+    llm.scheduler.expected_delay, llm.scheduler.expected_execution = 0.0, 20.0
+    job_id = await llm.run_job("ping")
+    await llm.wait_for_result(job_id)
+    stats = llm.scheduler.stats[-1]
+    assert stats.status == "COMPLETED"
+    assert stats.waited_after_finish <= MAX_INTERVAL + 0.05
+
+async def test_status_calls_are_tracked_per_job(llm):
+    job_ids = [await llm.run_job("ping") for _ in range(3)]
+    await asyncio.gather(*(llm.wait_for_result(job_id) for job_id in job_ids))
+    summary = llm.scheduler.summary()
+    assert summary["jobs"] == 3
+    assert summary["avg_status_calls"] >= 1
+
+async def test_deadline_times_out_and_cancels_the_job(llm, runpod_app):
+    job_id = await llm.run_job("ping")
+    with pytest.raises(TimeoutError):
+        await llm.wait_for_output(job_id, deadline=0.05)
+    await llm.close()
+    assert "cancelled_at" in runpod_app.state.jobs[job_id]
+    assert llm.scheduler.stats[-1].status == "TIMED_OUT"
+
+async def test_cancelled_wait_cancels_the_job(llm, runpod_app):
+    job_id = await llm.run_job("ping")
+    waiter = asyncio.ensure_future(llm.wait_for_result(job_id))
+    await asyncio.sleep(0.05)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await llm.close()
+    assert runpod_app.state.cancelled == 1
+    assert (await llm.check_status(job_id))["status"] == "CANCELLED"
+
+async def test_job_cancelled_on_the_endpoint_fails_the_wait(llm):
+    job_id = await llm.run_job("ping")
+    await llm.cancel_job(job_id)
+    with pytest.raises(Exception, match="Job failed"):
+        await llm.wait_for_result(job_id)
+    assert llm.scheduler.stats[-1].status == "CANCELLED"
@@ -0,0 +1,31 @@
+from src.services.metrics_service import PROMPT_TOKENS, render_metrics
+from src.services.prompt_service import PromptTemplate
+from src.services.tokenizer import count_tokens
+
+REQUESTS = [
+    ("How do wallets work?", None, None),
+    ("And webhooks?", "Webhooks are retried with exponential backoff. " * 40, "User: How do wallets work?\nAssistant: One balance per currency."),
+    ("Tell me everything about x402 payments. " * 30, "Agents pay for API calls with x402.", "User: hi\n" * 200),
+]
+
+def test_prefix_is_byte_identical_across_requests():
+    template = PromptTemplate(personality="Helpful", history_budget=64, context_budget=64, question_budget=32)
+    prompts = [template.assemble(*request).text.encode() for request in REQUESTS]
+    prefix = template.prefix.encode()
+    assert all(prompt.startswith(prefix) for prompt in prompts)
+    assert PromptTemplate(personality="Helpful").prefix.encode() == prefix
+
+def test_each_section_stays_within_its_budget():
+    template = PromptTemplate(personality="Helpful", history_budget=64, context_budget=64, question_budget=32)
+    for request in REQUESTS:
+        assembled = template.assemble(*request)
+        for section, text in assembled.sections.items():
+            assert count_tokens(text) == assembled.section_tokens[section] <= template.budgets[section]
+        assert assembled.section_tokens["prefix"] == count_tokens(template.prefix)
+
+def test_llm_service_records_section_tokens():
+    from src.services.llm_service import AsyncLLMService
+    before = PROMPT_TOKENS.snapshot().get("context", {}).get("count", 0)
+    AsyncLLMService(client=object())._format_prompt("How do wallets work?", context="Wallets keep one balance per currency.")
+    assert PROMPT_TOKENS.snapshot()["context"]["count"] == before + 1
+    assert 'autonoma_prompt_tokens_count{section="question"}' in render_metrics()
@@ -0,0 +1,52 @@
+import httpx
+import pytest
+from benchmarks import fake_runpod, fake_supabase
+from src.services.embedding_service import EmbeddingService
+from src.services.rag_service import RAGService
+
+pytest.importorskip("numpy")
+pytestmark = pytest.mark.anyio
+
+QUESTION = "how do I get my money back"
+DOCUMENTS = [
+    # Shares no word with the question: only the embedding can find it
+    ("Refund policy: purchases are reimbursed within 14 days.", QUESTION),
+    ("Wallets keep one balance per currency.", "wallet balances"),
+    ("Webhooks are retried with exponential backoff.", "webhook retries"),
+]
+
+@pytest.fixture
+def supabase_app():
+    return fake_supabase.create_app(documents=[{"content": "To get your money back, contact support."}])
+
+@pytest.fixture
+async def embedder():
+    async with httpx.AsyncClient(app=fake_runpod.create_app(generation_time=0), base_url="http://runpod") as client:
+        service = EmbeddingService(endpoint_id="embeddings", client=client)
+        service.base_url = "http://runpod/embeddings"
+        yield service
+
+@pytest.fixture
+async def rag(tmp_path, supabase, embedder):
+    from src.services.index_service import LocalHybridIndex
+    service = RAGService()
+    service.supabase = supabase
+    service.index = LocalHybridIndex(str(tmp_path / "index"))
+    service.embedder = embedder
+    vectors = await embedder.embed([text for _, text in DOCUMENTS])
+    service.index.add([
+        {"id": f"doc-{position}", "content": content, "embedding": vector}
+        for position, ((content, _), vector) in enumerate(zip(DOCUMENTS, vectors))
+    ])
+    yield service
+    await service.close()
+
+async def test_local_index_ranks_by_the_query_embedding(rag):
+    context, ids = await rag.retrieve(QUESTION, limit=1)
+    assert ids == ["doc-0"]
+    assert context.startswith("Refund policy")
+
+async def test_failed_query_embedding_falls_back_to_match_documents(rag):
+    rag.embedder.base_url = "http://runpod/missing/route"
+    context, _ = await rag.retrieve(QUESTION, limit=1)
+    assert context == "To get your money back, contact support."
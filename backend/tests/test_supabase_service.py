@@ -0,0 +1,112 @@
+import asyncio
+import uuid
+import httpx
+import pytest
+from benchmarks import fake_supabase
+
+pytestmark = pytest.mark.anyio
+
+DOCUMENTS = [
+    {"content": "Wallets keep one balance per currency."},
+    {"content": "Webhooks are retried with exponential backoff."},
+    {"content": "Agents pay for API calls with x402."},
+]
+
+async def test_insert_returns_the_stored_rows(supabase, supabase_app):
+    conversation = (await supabase.insert("conversations", {"title": "Wallets"}))[0]
+    assert conversation["title"] == "Wallets"
+    assert uuid.UUID(conversation["id"])
+    assert supabase_app.state.tables["conversations"] == [conversation]
+
+async def test_multi_row_insert_is_one_request(supabase, supabase_app):
+    conversation_id = str(uuid.uuid4())
+    requests = supabase_app.state.requests
+    rows = await supabase.insert("messages", [
+        {"conversation_id": conversation_id, "role": "user", "content": f"message {i}"} for i in range(5)
+    ])
+    assert [row["content"] for row in rows] == [f"message {i}" for i in range(5)]
+    assert supabase_app.state.requests == requests + 1
+    assert await supabase.insert("messages", {"conversation_id": conversation_id, "role": "user", "content": "quiet"}, returning=False) == []
+
+async def test_select_filters_orders_and_pages(supabase):
+    conversation_id, other = str(uuid.uuid4()), str(uuid.uuid4())
+    await supabase.insert("messages", [
+        {"conversation_id": conversation_id, "role": "user", "content": f"message {i}", "created_at": f"2024-01-0{i + 1}"}
+        for i in range(5)
+    ] + [{"conversation_id": other, "role": "user", "content": "elsewhere", "created_at": "2024-01-01"}])
+
+    def contents(rows):
+        return [row["content"] for row in rows]
+
+    eq = {"conversation_id": conversation_id}
+    assert contents(await supabase.select("messages", eq=eq, order="created_at")) == [f"message {i}" for i in range(5)]
+    assert contents(await supabase.select("messages", eq=eq, order="created_at", desc=True, limit=2)) == ["message 4", "message 3"]
+    assert contents(await supabase.select("messages", eq=eq, order="created_at", limit=2, offset=2)) == ["message 2", "message 3"]
+    assert contents(await supabase.select("messages", eq=eq, gte={"created_at": "2024-01-04"}, order="created_at")) == ["message 3", "message 4"]
+    assert contents(await supabase.select("messages", in_={"conversation_id": [other]})) == ["elsewhere"]
+    assert await supabase.select("messages", eq=eq, columns="content", order="created_at", limit=1) == [{"content": "message 0"}]
+
+async def test_on_conflict_skips_rows_already_stored(supabase, supabase_app):
+    row = {"id": str(uuid.uuid4()), "conversation_id": str(uuid.uuid4()), "role": "user", "content": "once"}
+    await supabase.insert("messages", row)
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        await supabase.insert("messages", row)
+    assert error.value.response.json()["code"] == "23505"
+    rows = await supabase.insert("messages", [row, {**row, "id": str(uuid.uuid4()), "content": "new"}], on_conflict="id")
+    assert [stored["content"] for stored in rows] == ["new"]
+    assert [stored["content"] for stored in supabase_app.state.tables["messages"]] == ["once", "new"]
+
+async def test_update_changes_only_matching_rows(supabase):
+    kept, changed = await supabase.insert("conversations", [{"title": "kept"}, {"title": "old"}])
+    rows = await supabase.update("conversations", {"title": "new"}, eq={"id": changed["id"]})
+    assert [row["title"] for row in rows] == ["new"]
+    assert [row["title"] for row in await supabase.select("conversations", order="title")] == ["kept", "new"]
+
+@pytest.mark.parametrize("supabase_app", [fake_supabase.create_app(documents=DOCUMENTS)])
+async def test_match_documents_rpc_ranks_by_similarity(supabase):
+    rows = await supabase.rpc("match_documents", {"query_text": "how are webhooks retried", "match_count": 2})
+    assert rows[0]["content"] == "Webhooks are retried with exponential backoff."
+    assert rows[0]["similarity"] >= rows[-1]["similarity"]
+    assert {"id", "content", "similarity"} <= set(rows[0])
+
+@pytest.mark.parametrize("supabase_app", [fake_supabase.create_app(documents=DOCUMENTS)])
+async def test_search_documents_is_cached_and_coalesced(supabase, supabase_app):
+    requests = supabase_app.state.requests
+    first, second = await asyncio.gather(
+        supabase.search_documents("wallet balance per currency", 1),
+        supabase.search_documents("wallet balance per currency", 1)
+    )
+    assert first == second and first[0]["content"] == "Wallets keep one balance per currency."
+    assert await supabase.search_documents("wallet balance per currency", 1) == first
+    assert supabase_app.state.requests == requests + 1
+    assert supabase.retrieval_stats["coalesced"] == 1
+    assert supabase.retrieval_stats["hits"] == 1
+
+    # Storing knowledge clears the cache, so the next search sees the new document
+    await supabase.store_document("Wallets can hold a balance in any currency.", {})
+    await supabase.search_documents("wallet balance per currency", 1)
+    assert supabase_app.state.requests == requests + 3
+
+async def test_rejected_rows_raise_http_status_errors(supabase, supabase_app):
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        await supabase.insert("messages", {"conversation_id": "not-a-uuid", "role": "user", "content": "bad"})
+    assert error.value.response.status_code == 400
+    assert error.value.response.json()["code"] == "22P02"
+    assert supabase_app.state.tables["messages"] == []
+
+@pytest.mark.parametrize("supabase_app", [fake_supabase.create_app(foreign_keys=True)])
+async def test_foreign_key_violations_map_to_409(supabase):
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        await supabase.insert("messages", {"conversation_id": str(uuid.uuid4()), "role": "user", "content": "orphan"})
+    assert error.value.response.status_code == 409
+    assert error.value.response.json()["code"] == "23503"
+
+async def test_read_helpers_return_empty_results_on_errors(supabase):
+    async def unavailable(*args, **kwargs):
+        raise httpx.ConnectError("Supabase is unreachable")
+
+    supabase.http.get = unavailable
+    supabase.http.post = unavailable
+    assert await supabase.search_documents("anything") == []
+    assert await supabase.get_document_by_id(str(uuid.uuid4())) == {}
+    assert await supabase.store_document("lost", {}) == {}
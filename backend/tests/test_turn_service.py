@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from src.services.turn_service import TurnOrchestrator
+
+pytestmark = pytest.mark.anyio
+
+CONVERSATION = "7d3f0c4e-2a55-4c57-9d7e-3f8a2c1b9e01"
+DEBOUNCE = 0.05
+
+class StubRAG:
+    """Records each retrieval; a search takes `latency` seconds."""
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.queries = []
+
+    async def retrieve(self, query: str, limit: int = 3):
+        self.queries.append(query)
+        await asyncio.sleep(self.latency)
+        return f"context for {query}", []
+
+@pytest.fixture
+async def turns(conversations):
+    orchestrator = TurnOrchestrator(StubRAG(), conversations, min_chars=1, debounce=DEBOUNCE)
+    yield orchestrator
+    await orchestrator.close()
+
+async def test_keystrokes_within_the_debounce_cost_one_retrieval(turns):
+    for partial in ["How do", "How do wallets", "How do wallets handle", "How do wallets handle retries"]:
+        turns.prefetch(CONVERSATION, partial)
+        await asyncio.sleep(DEBOUNCE / 5)
+    await asyncio.sleep(DEBOUNCE * 2)
+    assert turns.rag.queries == ["How do wallets handle retries"]
+    assert await turns._retrieve(CONVERSATION, "How do wallets handle retries?") == ("context for How do wallets handle retries", [])
+    assert turns.stats["speculative_hits"] == 1
+
+async def test_a_newer_partial_question_cancels_the_previous_speculation(turns):
+    turns.prefetch(CONVERSATION, "How do wallets")
+    first = turns._speculations[CONVERSATION].task
+    turns.prefetch(CONVERSATION, "How do payments")
+    await asyncio.sleep(0)
+    assert first.cancelled()
+
+async def test_a_turn_during_the_debounce_searches_the_final_question(turns):
+    turns.prefetch(CONVERSATION, "How do wallets")
+    speculation = turns._speculations[CONVERSATION]
+    await turns._retrieve(CONVERSATION, "How do wallets handle retries?")
+    assert turns.rag.queries == ["How do wallets handle retries?"]
+    await asyncio.sleep(0)
+    assert speculation.task.cancelled()
+
+async def test_prefetch_only_warms_existing_conversations(turns, conversations, supabase_app):
+    turns.prefetch(CONVERSATION, "How do wallets")
+    await turns.close()
+    assert not conversations.memory.has(CONVERSATION)
+
+    supabase_app.state.tables["conversations"].append({"id": CONVERSATION, "title": "Wallets"})
+    turns.prefetch(CONVERSATION, "How do wallets work")
+    await turns.close()
+    assert conversations.memory.has(CONVERSATION)